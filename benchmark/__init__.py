@@ -0,0 +1,3 @@
+"""
+    性能测试脚本，运行方式：python -m palp.benchmark.benchmark_xxx
+"""
@@ -0,0 +1,61 @@
+"""
+    布隆过滤器位计算的性能对比：旧的逐字符哈希 vs 双重哈希 vs 双重哈希（numpy 批量）
+
+    python -m palp.benchmark.benchmark_bloom_offsets
+"""
+import time
+import uuid
+import hashlib
+from palp.filter.filter_redis_bloom import RedisBloomFilter, numpy
+
+
+def legacy_offsets(m: int, seeds: range, value: str) -> list:
+    """
+    旧的位计算方式：每个 seed 都逐字符计算一次
+
+    :param m: 位数
+    :param seeds: 种子
+    :param value: 指纹
+    :return:
+    """
+    offsets = []
+    for seed in seeds:
+        ret = 0
+        for i in range(len(value)):
+            ret += seed * ret + ord(value[i])
+        offsets.append((m - 1) & ret)
+
+    return offsets
+
+
+def timeit(name: str, func, count: int) -> None:
+    """
+    计时并输出
+
+    :param name: 名称
+    :param func: 执行的函数
+    :param count: 指纹数量
+    :return:
+    """
+    start = time.perf_counter()
+    func()
+    cost = time.perf_counter() - start
+    print(f'{name:<24}{cost:>10.4f}s{cost / count * 1e6:>12.2f}us/个')
+
+
+def main(count: int = 10000):
+    bloom = RedisBloomFilter()
+    m, k, _ = bloom.layer(0)
+    fingerprints = [hashlib.md5(uuid.uuid4().bytes).hexdigest() for _ in range(count)]
+
+    print(f'指纹数量：{count}，哈希数量：{k}，单个分片位数：{m}')
+    timeit('legacy', lambda: [legacy_offsets(m, range(k), fp) for fp in fingerprints], count)
+    timeit('double hashing', lambda: [bloom.offsets(fp) for fp in fingerprints], count)
+    if numpy is not None:
+        timeit('double hashing (numpy)', lambda: bloom.offsets_many(fingerprints), count)
+    else:
+        print('未安装 numpy，跳过批量计算')
+
+
+if __name__ == '__main__':
+    main()
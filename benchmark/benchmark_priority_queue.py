@@ -0,0 +1,95 @@
+"""
+    优先级队列的性能对比：堆（PriorityQueue）vs 分桶，redis 有序集合 vs 分桶（配置了 REDIS_HOST 时）
+
+    python -m palp.benchmark.benchmark_priority_queue
+"""
+import time
+from palp import settings
+from palp.network.request import Request
+from palp.network.request_method import RequestGet
+from palp.sequence.sequence_memory import PriorityMemorySequence, BucketPriorityMemorySequence
+from palp.sequence.sequence_redis_request import PriorityRequestRedisSequence, BucketPriorityRequestRedisSequence
+
+
+def create_requests(count: int, levels: int = 5) -> list:
+    """
+    构造请求：优先级为 DEFAULT_QUEUE_PRIORITY - 深度（共 levels 种），每 10 个请求有一个与上一个完全相同
+
+    :param count:
+    :param levels: 优先级的种类
+    :return:
+    """
+    requests = []
+    for i in range(count):
+        page = i - 1 if i % 10 == 9 else i
+        requests.append(RequestGet(
+            f'https://www.example.com/list?page={page}', callback='parse',
+            priority=settings.DEFAULT_QUEUE_PRIORITY - page % levels
+        ))
+
+    return requests
+
+
+def benchmark(name: str, queue, requests: list, batch: int = 1) -> None:
+    """
+    放入、取出全部请求并计时
+
+    :param name: 名称
+    :param queue: 队列
+    :param requests: 请求
+    :param batch: 每次批量放入、取出的数量
+    :return:
+    """
+    start = time.perf_counter()
+    if batch > 1:
+        for i in range(0, len(requests), batch):
+            queue.put_many(requests[i:i + batch])
+    else:
+        for request in requests:
+            queue.put(request)
+    put_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = []
+    while True:
+        objs = queue.get_many(batch, block=False) if batch > 1 else [queue.get(block=False)]
+        if not objs or objs[0] is None:
+            break
+        results.extend(objs)
+    get_cost = time.perf_counter() - start
+
+    # 同一优先级内是否保持放入的顺序
+    order = {id(request): i for i, request in enumerate(requests)}
+    fifo = all(
+        a.priority < b.priority or order.get(id(a), 0) <= order.get(id(b), 0)
+        for a, b in zip(results, results[1:])
+    ) if order.get(id(results[0])) is not None else '-'
+
+    print(
+        f'{name:<16}{len(requests) / put_cost:>12.0f}个/s（放入）{len(requests) / get_cost:>12.0f}个/s（取出）'
+        f'{len(results):>10}个（取出）  同优先级先进先出：{fifo}'
+    )
+
+
+def main(count: int = 100000, redis_count: int = 20000, batch: int = 100):
+    Request.from_settings()
+
+    print(f'本地：{count} 个请求')
+    benchmark('heap', PriorityMemorySequence(), create_requests(count))
+    benchmark('bucket', BucketPriorityMemorySequence(), create_requests(count))
+    benchmark('bucket (batch)', BucketPriorityMemorySequence(), create_requests(count), batch=batch)
+
+    from palp.conn import redis_conn
+    if redis_conn is None:
+        print('未配置 REDIS_HOST，跳过 redis')
+        return
+
+    settings.REDIS_KEY_QUEUE_REQUEST = 'palp:benchmark:request'
+    print(f'redis：{redis_count} 个请求，每批 {batch} 个')
+    # 全部取出后队列相关的 key 都会被删除；有序集合会合并相同的请求，取出的数量更少
+    benchmark('zset', PriorityRequestRedisSequence(), create_requests(redis_count), batch=batch)
+    benchmark('bucket', BucketPriorityRequestRedisSequence(), create_requests(redis_count), batch=batch)
+
+
+if __name__ == '__main__':
+    main()
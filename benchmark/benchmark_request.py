@@ -0,0 +1,49 @@
+"""
+    请求对象的性能：每个排队请求占用的内存、每秒构造的请求数
+
+    python -m palp.benchmark.benchmark_request
+"""
+import gc
+import time
+import tracemalloc
+from palp.network.request import Request
+from palp.network.request_method import RequestGet
+from palp.sequence.sequence_memory import PriorityMemorySequence
+
+
+def create_requests(count: int) -> list:
+    """
+    构造请求（常见的参数）
+
+    :param count:
+    :return:
+    """
+    return [
+        RequestGet(f'https://www.example.com/list?page={i}', callback='parse', meta={'page': i}, filter_repeat=True)
+        for i in range(count)
+    ]
+
+
+def main(count: int = 100000):
+    Request.from_settings()
+    create_requests(10)
+
+    # 构造速度
+    start = time.perf_counter()
+    create_requests(count)
+    cost = time.perf_counter() - start
+    print(f'构造速度：{count / cost:.0f} 个/s')
+
+    # 排队时占用的内存
+    gc.collect()
+    tracemalloc.start()
+    queue = PriorityMemorySequence()
+    for request in create_requests(count):
+        queue.put(request)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'排队内存：{size / count:.0f} B/个（{count} 个，包括 url、meta 等参数本身）')
+
+
+if __name__ == '__main__':
+    main()
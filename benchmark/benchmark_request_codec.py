@@ -0,0 +1,71 @@
+"""
+    请求编码的性能对比：每个请求的字节数、编码/解码速度
+
+    python -m palp.benchmark.benchmark_request_codec
+"""
+import time
+from requests.cookies import RequestsCookieJar
+from palp.network.request import Request
+from palp.network.request_codec import JsonRequestCodec, MsgpackRequestCodec, msgpack
+
+
+def create_request(index: int) -> Request:
+    """
+    构造一个常见的请求：带 meta、cookie_jar、headers
+
+    :param index:
+    :return:
+    """
+    cookie_jar = RequestsCookieJar()
+    for i in range(5):
+        cookie_jar.set(f'cookie_{i}', f'value_{index}_{i}', domain='.example.com', path='/')
+
+    return Request(
+        url=f'https://www.example.com/list?page={index}',
+        headers={'User-Agent': 'Mozilla/5.0', 'Referer': 'https://www.example.com/'},
+        meta={'page': index, 'category': '新闻', 'tags': ['a', 'b', 'c']},
+        cookie_jar=cookie_jar,
+        callback='parse_list',
+        filter_repeat=True,
+    )
+
+
+def benchmark(name: str, codec, requests: list) -> None:
+    """
+    计时并输出
+
+    :param name: 名称
+    :param codec: 编码器
+    :param requests: 请求
+    :return:
+    """
+    start = time.perf_counter()
+    payloads = [codec.encode(request) for request in requests]
+    encode_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for payload in payloads:
+        codec.decode(payload)
+    decode_cost = time.perf_counter() - start
+
+    size = sum(len(payload) for payload in payloads) / len(payloads)
+    print(
+        f'{name:<10}{size:>10.0f}B/个'
+        f'{len(requests) / encode_cost:>14.0f}个/s（编码）'
+        f'{len(requests) / decode_cost:>14.0f}个/s（解码）'
+    )
+
+
+def main(count: int = 10000):
+    requests = [create_request(i) for i in range(count)]
+
+    print(f'请求数量：{count}')
+    benchmark('json', JsonRequestCodec(), requests)
+    if msgpack is not None:
+        benchmark('msgpack', MsgpackRequestCodec(), requests)
+    else:
+        print('未安装 msgpack，跳过')
+
+
+if __name__ == '__main__':
+    main()
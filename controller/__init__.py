@@ -1,2 +1,4 @@
 from palp.controller.controller_item import ItemController
+from palp.controller.controller_pipeline import PipelineController
 from palp.controller.controller_spider import SpiderController
+from palp.controller.controller_spider_async import AsyncSpiderController
@@ -1,18 +1,28 @@
 """
     item 流程控制器
-"""
 
+    缓存（PIPELINE_ITEM_BUFFER）在以下任一条件满足时入库：
+        达到 PIPELINE_ITEM_BUFFER 个
+        达到 PIPELINE_ITEM_BUFFER_BYTES 字节（item 转为 json 后的长度）
+        第一个 item 进入缓存后超过 PIPELINE_ITEM_LINGER_MS 毫秒
+
+    PIPELINE_WRITER_THREADS 大于 0 时，入库交给每个管道独立的 PipelineController，不在 item 线程中依次入库
+"""
+import time
 from loguru import logger
 from palp import settings
 from threading import Thread
+from collections import deque
 from palp.item.item import Item
 from palp.exception import DropItemException
+from palp.controller.controller_pipeline import PipelineController
 from palp.tool.short_module import import_module, sort_module
 
 
 class ItemController(Thread):
     PIPELINE = []
     PIPELINE_CLOSED = False
+    PIPELINE_CONTROLLER = []  # 每个管道的入库控制器（PIPELINE_WRITER_THREADS 大于 0 时）
 
     def __new__(cls, *args, **kwargs):
         """
@@ -33,6 +43,11 @@ class ItemController(Thread):
 
         self.item_buffer = []
         self.item_buffer_max_size = settings.PIPELINE_ITEM_BUFFER  # item 最大存储数量
+        self.item_buffer_max_bytes = settings.PIPELINE_ITEM_BUFFER_BYTES  # item 最大存储字节数
+        self.item_linger = settings.PIPELINE_ITEM_LINGER_MS / 1000  # item 最长存储时间（秒）
+        self.buffer_bytes = 0  # 缓存的字节数
+        self.buffer_deadline = None  # 缓存需要入库的时间
+        self.item_prefetch = deque()  # 批量从队列获取的 item
 
     @classmethod
     def from_settings(cls):
@@ -51,6 +66,40 @@ class ItemController(Thread):
 
         cls.PIPELINE = import_module(modules)
 
+    @classmethod
+    def start_pipeline_controller(cls, spider) -> None:
+        """
+        启动每个管道的入库控制器
+
+        :param spider:
+        :return:
+        """
+        if settings.PIPELINE_WRITER_THREADS <= 0 or cls.PIPELINE_CONTROLLER:
+            return
+
+        if not cls.PIPELINE:
+            cls.from_settings()
+
+        for pipeline in cls.PIPELINE:
+            controller = PipelineController(pipeline=pipeline, spider=spider)
+            cls.PIPELINE_CONTROLLER.append(controller)
+            controller.start()
+
+    @classmethod
+    def close_pipeline_controller(cls) -> None:
+        """
+        所有 item 线程结束后，等待入库控制器处理完剩余的 item 并执行 pipeline_close，入库中出现错误时抛出
+
+        :return:
+        """
+        exception = None
+        for controller in cls.PIPELINE_CONTROLLER:
+            controller.close()
+            exception = exception or controller.exception
+
+        if exception is not None:
+            raise exception
+
     def run(self) -> None:
         """
         item 处理入口
@@ -60,20 +109,29 @@ class ItemController(Thread):
         try:
             while True:
                 try:
-                    if self.spider.spider_done and self.queue.empty():
+                    if self.spider.spider_done and not self.item_prefetch and self.queue.empty():
                         if self.item_buffer:
                             self.pipeline_save()
                         break
 
-                    task = self.queue.get(timeout=1)
+                    task = self.get_item()
                     if task is None:
+                        # 爬虫结束后获取不到 item（本地时为唤醒用的 None），不会再有新的 item
+                        if self.spider.spider_done and not self.item_prefetch:
+                            if self.item_buffer:
+                                self.pipeline_save()
+                            break
+
+                        # 等待期间超过最长存储时间
+                        if self.item_buffer and self.buffer_ready():
+                            self.pipeline_save()
                         continue
 
                     # 每个 item 都会先走处理
                     self.pipeline_in(item=task)
 
                     # 判断是否需要入库
-                    if self.item_buffer_max_size == 0 or self.buffer_size >= self.item_buffer_max_size:
+                    if self.buffer_ready():
                         self.pipeline_save()
 
                 except DropItemException as e:
@@ -86,10 +144,31 @@ class ItemController(Thread):
                     for middleware in self.spider.SPIDER_MIDDLEWARE:
                         middleware.spider_error(self.spider, e)
         finally:
-            if not self.__class__.PIPELINE_CLOSED:
+            # 使用入库控制器时由其执行 pipeline_close
+            if not self.__class__.PIPELINE_CLOSED and not self.__class__.PIPELINE_CONTROLLER:
                 self.__class__.PIPELINE_CLOSED = True
                 self.pipeline_close()
 
+    def get_item(self):
+        """
+        获取 item：批量从队列获取（最多补满 buffer），redis 队列时减少网络往返
+
+        :return:
+        """
+        if not self.item_prefetch:
+            # 缓存中有 item 时最多等到需要入库的时间
+            timeout = 1
+            if self.buffer_deadline is not None:
+                timeout = min(max(self.buffer_deadline - time.time(), 0), timeout)
+
+            # 已到入库时间时不阻塞（redis 队列 timeout 为 0 会一直阻塞）
+            count = max(self.item_buffer_max_size - self.buffer_size, 1)
+            block = not self.spider.spider_done and timeout > 0
+            self.item_prefetch.extend(self.queue.get_many(count, block=block, timeout=timeout))
+
+        if self.item_prefetch:
+            return self.item_prefetch.popleft()
+
     def pipeline_in(self, item: Item):
         """
         处理清洗等
@@ -102,12 +181,41 @@ class ItemController(Thread):
 
         self.item_buffer.append(item)
 
+        if self.item_buffer_max_bytes:
+            self.buffer_bytes += len(item.to_json(default=str).encode())
+        if self.item_linger and self.buffer_deadline is None:
+            self.buffer_deadline = time.time() + self.item_linger
+
+    def buffer_ready(self) -> bool:
+        """
+        缓存是否需要入库：达到数量、字节数或者最长存储时间（不缓存时每个 item 都入库）
+
+        :return:
+        """
+        if self.item_buffer_max_size == 0 or self.buffer_size >= self.item_buffer_max_size:
+            return True
+        if self.item_buffer_max_bytes and self.buffer_bytes >= self.item_buffer_max_bytes:
+            return True
+
+        return self.buffer_deadline is not None and time.time() >= self.buffer_deadline
+
     def pipeline_save(self):
         """
         处理入库
 
         :return:
         """
+        # 交给每个管道的入库控制器
+        if self.__class__.PIPELINE_CONTROLLER:
+            try:
+                for controller in self.__class__.PIPELINE_CONTROLLER:
+                    controller.put(self.item_buffer.copy())
+            finally:
+                self.item_buffer.clear()
+                self.buffer_bytes = 0
+                self.buffer_deadline = None
+            return
+
         # 禁用的话就单条
         if self.item_buffer_max_size == 0 and len(self.item_buffer) != 0:
             item_buffer = self.item_buffer[0]
@@ -136,6 +244,8 @@ class ItemController(Thread):
                     return
         finally:
             self.item_buffer.clear()
+            self.buffer_bytes = 0
+            self.buffer_deadline = None
 
     def pipeline_close(self):
         """
@@ -0,0 +1,150 @@
+"""
+    管道入库控制器（PIPELINE_WRITER_THREADS 大于 0 时使用）
+
+    每个管道有独立的有界队列、入库线程，分别合并批次、重试：
+        一个管道变慢或者失败不会影响其它管道，整体速度取决于最慢的管道，而不是所有管道的总和
+        重试只会重新发送给失败的管道
+    队列满时 item 线程等待（背压），爬虫结束时处理完队列中剩余的 item 后执行 pipeline_close
+
+    pipeline_error、pipeline_failed 出错时同 item 线程中入库：
+        SPIDER_STOP_ON_ERROR 时记录错误并停止爬虫，之后的 item 不再入库，关闭时抛出
+        否则交给 spider 中间件的 spider_error 处理
+"""
+import queue
+from threading import Thread
+from loguru import logger
+from palp import settings
+from palp.exception import DropItemException
+
+
+class PipelineController:
+    def __init__(self, pipeline, spider):
+        """
+
+        :param pipeline: 管道
+        :param spider:
+        """
+        self.pipeline = pipeline
+        self.spider = spider
+        self.queue = queue.Queue(maxsize=max(settings.PIPELINE_WRITER_QUEUE, 1))  # 待入库的批次
+        self.batch_size = settings.PIPELINE_ITEM_BUFFER  # 合并批次的最大数量，0 为不缓存（逐个入库）
+        self.writers = [
+            Thread(target=self.run, daemon=True) for _ in range(max(settings.PIPELINE_WRITER_THREADS, 1))
+        ]
+        self.exception = None  # 入库中出现的错误（SPIDER_STOP_ON_ERROR 时停止爬虫，关闭时抛出）
+
+    def start(self) -> None:
+        """
+        启动入库线程
+
+        :return:
+        """
+        for writer in self.writers:
+            writer.start()
+
+    def put(self, items: list) -> None:
+        """
+        放入一批 item（队列满时等待）
+
+        :param items:
+        :return:
+        """
+        self.queue.put(items)
+
+    def close(self) -> None:
+        """
+        处理完队列中剩余的 item 后停止入库线程，并执行 pipeline_close
+
+        :return:
+        """
+        for _ in self.writers:
+            self.queue.put(None)
+
+        for writer in self.writers:
+            writer.join()
+
+        try:
+            self.pipeline.pipeline_close(self.spider)
+        except Exception as e:
+            logger.exception(e)
+
+    def run(self) -> None:
+        """
+        入库线程：不缓存时逐个入库，否则合并队列中已有的批次（达到 PIPELINE_ITEM_BUFFER 个后不再合并）后入库
+
+        :return:
+        """
+        while True:
+            items = self.queue.get()
+            if items is None:
+                break
+
+            # 已因错误停止爬虫，继续取出（避免 item 线程等待）但不再入库
+            if self.exception is not None:
+                continue
+
+            if self.batch_size == 0:
+                for item in items:
+                    self.save(item)
+                continue
+
+            while len(items) < self.batch_size:
+                try:
+                    more = self.queue.get(block=False)
+                except queue.Empty:
+                    break
+
+                if more is None:
+                    self.queue.put(None)  # 留给自己下一次获取
+                    break
+                items = items + more
+
+            self.save(items)
+
+    def save(self, item_buffer) -> None:
+        """
+        入库，失败时只重试当前管道
+
+        :param item_buffer: 不缓存时为单个 item
+        :return:
+        """
+        failed_times = 0
+        while failed_times < settings.PIPELINE_RETRY_TIMES:
+            try:
+                self.pipeline.pipeline_save(self.spider, item_buffer)
+                return
+            except DropItemException as e:
+                logger.warning(f"丢弃 item：{e}")
+                return
+            except Exception as e:
+                failed_times += 1
+
+                try:
+                    self.pipeline.pipeline_error(self.spider, item_buffer, e)
+                except Exception as error:
+                    self.error(error)
+                    return
+
+        try:
+            self.pipeline.pipeline_failed(self.spider, item_buffer)
+        except Exception as e:
+            self.error(e)
+
+    def error(self, exception: Exception) -> None:
+        """
+        入库出错：SPIDER_STOP_ON_ERROR 时记录错误并停止爬虫，否则交给 spider_error 处理
+
+        :param exception:
+        :return:
+        """
+        if settings.SPIDER_STOP_ON_ERROR:
+            if self.exception is None:
+                self.exception = exception
+            self.spider.stop_all_spider_controller()
+            return
+
+        for middleware in self.spider.SPIDER_MIDDLEWARE:
+            try:
+                middleware.spider_error(self.spider, exception)
+            except Exception as e:
+                logger.exception(e)
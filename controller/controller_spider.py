@@ -1,9 +1,10 @@
 """
     spider 流程控制器：处理整个爬虫的处理过程流转
 """
-import dill
+import random
 import inspect
 import traceback
+from typing import List
 from loguru import logger
 from palp import settings
 from threading import Thread
@@ -12,6 +13,7 @@ from palp.network.request import Request
 from palp.network.response import Response
 from palp.sequence.sequence import Sequence
 from palp.exception import DropRequestException
+from palp.tool.callback_pool import CallbackPool
 from palp.tool.short_module import import_module, sort_module
 
 
@@ -69,25 +71,43 @@ class SpiderController(Thread):
 
         :return:
         """
-        while not self.stop:
-            task = self.queue.get(timeout=1)
+        try:
+            while not self.stop:
+                task = self.queue.get(timeout=1)
 
-            try:
-                if task is None:
-                    self.waiting = True
-                    continue
-
-                self.waiting = False
-                self.parse_task(task=task)
-            except DropRequestException as e:
-                logger.warning(f"丢弃请求：{e}")
-            except Exception as e:
-                if settings.SPIDER_STOP_ON_ERROR:
-                    raise
+                try:
+                    # 调度器内还有未就绪的请求时不算等待
+                    if task is None:
+                        self.set_waiting(self.queue_empty())
+                        continue
 
-                # spider 报错处理
-                for middleware in self.spider.SPIDER_MIDDLEWARE:
-                    middleware.spider_error(self.spider, e)
+                    self.waiting = False
+                    self.parse_task(task=task)
+                except DropRequestException as e:
+                    logger.warning(f"丢弃请求：{e}")
+                except Exception as e:
+                    if settings.SPIDER_STOP_ON_ERROR:
+                        raise
+
+                    # spider 报错处理
+                    for middleware in self.spider.SPIDER_MIDDLEWARE:
+                        middleware.spider_error(self.spider, e)
+                finally:
+                    if task is not None:
+                        self.queue.release(task)
+        finally:
+            self.spider.notify_state()
+
+    def set_waiting(self, waiting: bool) -> None:
+        """
+        修改等待状态，等待时通知 spider 重新判断是否结束（多进程时其它进程的变化不会通知到本进程）
+
+        :param waiting:
+        :return:
+        """
+        self.waiting = waiting
+        if waiting:
+            self.spider.notify_state()
 
     def parse_task(self, task, request: Request = None, response: Response = None):
         """
@@ -111,13 +131,25 @@ class SpiderController(Thread):
         else:
             logger.warning(f"捕获到非法 yield：{task}")
 
-    def add_new_request(self, new_request: Request, old_request: Request, response: Response):
+    def queue_empty(self) -> bool:
+        """
+        请求队列、延迟队列是否都为空（延迟队列中还有请求时不算等待）
+
+        :return:
+        """
+        if not self.queue.empty():
+            return False
+
+        return self.spider.queue_delay is None or self.spider.queue_delay.empty()
+
+    def add_new_request(self, new_request: Request, old_request: Request, response: Response, delay: float = 0):
         """
         添加新的请求到队列中
 
         :param new_request:
         :param old_request:
         :param response:
+        :param delay: 大于 0 时放入延迟队列
         :return:
         """
         # 自动衔接 meta
@@ -133,11 +165,40 @@ class SpiderController(Thread):
             new_request.cookie_jar = old_request.cookie_jar  # 续上上一个的 cookie_jar
 
         # 修改优先级，深层的函数应该优先处理，避免积压不前（深度爬取）
-        if settings.REQUEST_QUEUE_MODE == 3:
+        if settings.REQUEST_QUEUE_MODE in (3, 5, 6):
             new_request.priority = old_request.priority - 1
 
+        # 入队时去重，重复的请求不再进入队列
+        if settings.FILTER_REQUEST_ON_PUT and not self.filter_requests(self.spider, [new_request]):
+            return
+
+        if delay > 0:
+            self.spider.put_delay(new_request, delay)
+            return
+
+        # 队列达到高水位时暂停回调的生成器
+        self.spider.backpressure.wait(self.queue, controller=self, request=old_request)
+
         self.queue.put(new_request)
 
+    @classmethod
+    def filter_requests(cls, spider, requests: List[Request]) -> List[Request]:
+        """
+        入队时去重：交给请求去重中间件批量去重，返回未被丢弃的请求
+
+        :param spider:
+        :param requests:
+        :return:
+        """
+        if not SpiderController.REQUEST_MIDDLEWARE:
+            SpiderController.from_settings()
+
+        for middleware in SpiderController.REQUEST_MIDDLEWARE:
+            if hasattr(middleware, 'filter_requests'):
+                requests = middleware.filter_requests(spider, requests)
+
+        return requests
+
     def run_requests(self, request: Request):
         """
         处理 yield 的 Request
@@ -145,42 +206,131 @@ class SpiderController(Thread):
         :param request:
         :return:
         """
-        # 判断是否要借 资源
-        if settings.REQUEST_BORROW:
-            self.spider.borrow_request(request=request)
-
-        # 请求发起前的处理
-        for middleware in self.__class__.REQUEST_MIDDLEWARE:
-            middleware.request_in(self.spider, request)
+        # 请求发起前的处理（延迟重试的请求已经处理过）
+        failed_times = self.get_retry_times(request)
+        if not failed_times:
+            self.run_request_in(request)
 
         # 处理请求
         response = None
-        failed_times = 0
         while failed_times < settings.REQUEST_RETRY_TIMES:
             try:
                 response = request.send()
                 break
             except Exception as e:
                 failed_times += 1
-
-                # 出现错误可直接处理，并返回新的请求，同时阻断当前错误请求传播
-                for middleware in self.__class__.REQUEST_MIDDLEWARE:
-                    new_request = middleware.request_error(self.spider, request, e)
-                    if new_request is None:
-                        continue
-                    elif isinstance(new_request, Request):
-                        self.add_new_request(new_request=new_request, old_request=request, response=response)
-                        raise DropRequestException(middleware.__class__.__name__, str(request))
-                    else:
-                        logger.warning("request_error 仅支持 Request 返回值！")
+                self.run_request_error(request, response, e)
 
             # 失败达到最大次数直接丢弃
             if failed_times >= settings.REQUEST_RETRY_TIMES:
-                for middleware in self.__class__.REQUEST_MIDDLEWARE:
-                    middleware.request_failed(self.spider, request)
+                self.run_request_failed(request)
+                return
+
+            # 开启退避重试时放入延迟队列，不占用当前线程
+            if self.retry_later(request, failed_times):
                 return
 
-        # 请求结束的回调（可在此时判断返回值是否合理，不合理可在此重新构造请求，同时阻断当前请求传播）
+        # 请求结束的回调
+        self.run_request_close(request, response)
+
+        # 继续监控下次 yield
+        self.run_callback(request, response)
+
+    def run_request_in(self, request: Request):
+        """
+        请求发起前的处理
+
+        :param request:
+        :return:
+        """
+        # 判断是否要借 资源
+        if settings.REQUEST_BORROW:
+            self.spider.borrow_request(request=request)
+
+        for middleware in self.__class__.REQUEST_MIDDLEWARE:
+            middleware.request_in(self.spider, request)
+
+    @staticmethod
+    def get_retry_times(request: Request) -> int:
+        """
+        请求已经失败的次数（延迟重试的请求记录在 retry_times 中）
+
+        :param request:
+        :return:
+        """
+        return getattr(request, 'retry_times', 0)
+
+    @staticmethod
+    def get_retry_delay(failed_times: int) -> float:
+        """
+        退避重试的等待时间：REQUEST_RETRY_BACKOFF * 2 ^ (失败次数 - 1)，不超过 REQUEST_RETRY_BACKOFF_MAX
+        随机取其一半到全部之间的值（抖动），避免同时失败的请求同时重试
+
+        :param failed_times: 失败次数
+        :return:
+        """
+        delay = min(settings.REQUEST_RETRY_BACKOFF * 2 ** (failed_times - 1), settings.REQUEST_RETRY_BACKOFF_MAX)
+
+        return random.uniform(delay / 2, delay)
+
+    def retry_later(self, request: Request, failed_times: int) -> bool:
+        """
+        退避重试：记录失败次数后放入延迟队列
+
+        :param request:
+        :param failed_times: 失败次数
+        :return: 是否已放入延迟队列（未开启 REQUEST_RETRY_BACKOFF 时为 False，在当前线程立即重试）
+        """
+        if not settings.REQUEST_RETRY_BACKOFF or self.spider.queue_delay is None:
+            return False
+
+        request.retry_times = failed_times
+        self.spider.put_delay(request, self.get_retry_delay(failed_times))
+
+        return True
+
+    def run_request_error(self, request: Request, response: Response, exception: Exception):
+        """
+        请求出错时的处理：出现错误可直接处理，并返回新的请求，同时阻断当前错误请求传播
+
+        :param request:
+        :param response:
+        :param exception:
+        :return:
+        """
+        for middleware in self.__class__.REQUEST_MIDDLEWARE:
+            new_request = middleware.request_error(self.spider, request, exception)
+            if new_request is None:
+                continue
+            elif isinstance(new_request, Request):
+                # 开启退避重试时，重新构造的请求也延迟放入
+                delay = 0
+                if settings.REQUEST_RETRY_BACKOFF:
+                    delay = self.get_retry_delay(self.get_retry_times(request) + 1)
+
+                self.add_new_request(new_request=new_request, old_request=request, response=response, delay=delay)
+                raise DropRequestException(middleware.__class__.__name__, str(request))
+            else:
+                logger.warning("request_error 仅支持 Request 返回值！")
+
+    def run_request_failed(self, request: Request):
+        """
+        失败达到最大次数时的处理
+
+        :param request:
+        :return:
+        """
+        for middleware in self.__class__.REQUEST_MIDDLEWARE:
+            middleware.request_failed(self.spider, request)
+
+    def run_request_close(self, request: Request, response: Response):
+        """
+        请求结束的回调（可在此时判断返回值是否合理，不合理可在此重新构造请求，同时阻断当前请求传播）
+
+        :param request:
+        :param response:
+        :return:
+        """
         for middleware in self.__class__.REQUEST_MIDDLEWARE:
             new_request = middleware.request_close(self.spider, request, response)
             if new_request is None:
@@ -191,7 +341,21 @@ class SpiderController(Thread):
             else:
                 logger.warning("request_close 仅支持 Request 返回值！")
 
-        # 继续监控下次 yield
+    def run_callback(self, request: Request, response: Response):
+        """
+        执行回调，并继续监控下次 yield
+
+        :param request:
+        :param response:
+        :return:
+        """
+        # 在回调进程池中执行
+        if self.spider.callback_pool.offload(request):
+            tasks = self.spider.callback_pool.submit(request, response).result()
+            for task in CallbackPool.loads(tasks):
+                self.parse_task(task=task, request=request, response=response)
+            return
+
         if request.callback and isinstance(request.callback, str) and hasattr(self.spider, request.callback):
             callback = getattr(self.spider, request.callback)
 
@@ -228,7 +392,7 @@ class SpiderController(Thread):
             request.jump_request_middleware = None
 
             # 修改优先级，深层的函数应该优先处理，避免积压不前（深度爬取）
-            if settings.REQUEST_QUEUE_MODE == 3:
+            if settings.REQUEST_QUEUE_MODE in (3, 5, 6):
                 request.priority -= 1
 
             self.queue.put(request)
@@ -0,0 +1,147 @@
+"""
+    asyncio spider 流程控制器：单个线程的事件循环内并发处理大量请求
+
+    注意：
+        请求中间件、回调依然是同步执行的（在事件循环线程内），耗时过长会阻塞其它请求（解析耗时的回调可以使用 ProcessCallbackDecorator 放到进程池执行）
+        从队列获取任务、jump spider、同步的 downloader 都放在线程池内执行，避免阻塞事件循环
+"""
+import asyncio
+import functools
+from loguru import logger
+from palp import settings
+from palp.network.request import Request
+from palp.exception import DropRequestException
+from palp.tool.callback_pool import CallbackPool
+from palp.controller.controller_spider import SpiderController
+from palp.network.downloader_httpx_async import ResponseDownloaderByHttpxAsync
+
+
+class AsyncSpiderController(SpiderController):
+    def __init__(self, q, q_item, spider):
+        """
+
+        :param q: request 队列
+        :param q_item: item 队列
+        :param spider: 运行的爬虫
+        """
+        super().__init__(q=q, q_item=q_item, spider=spider)
+        self.loop = None
+        self.tasks = set()  # 执行中的任务
+        self.exception = None  # 任务中出现的错误（SPIDER_STOP_ON_ERROR 时停止并抛出）
+
+    def run(self):
+        """
+        函数执行入口
+
+        :return:
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        try:
+            self.loop.run_until_complete(self.run_loop())
+        finally:
+            self.loop.run_until_complete(ResponseDownloaderByHttpxAsync.close())
+            self.loop.close()
+            self.spider.notify_state()
+
+        if self.exception is not None:
+            raise self.exception
+
+    async def run_loop(self):
+        """
+        事件循环入口：不断从队列获取任务，最多同时执行 REQUEST_ASYNC_CONCURRENCY 个任务
+
+        :return:
+        """
+        semaphore = asyncio.Semaphore(settings.REQUEST_ASYNC_CONCURRENCY)
+
+        while not self.stop:
+            await semaphore.acquire()
+
+            task = await self.loop.run_in_executor(None, functools.partial(self.queue.get, timeout=1))
+            if task is None:
+                semaphore.release()
+                self.set_waiting(not self.tasks and self.queue_empty())  # 调度器内还有未就绪的请求时不算等待
+                continue
+
+            self.waiting = False
+            future = self.loop.create_task(self.run_task(task=task, semaphore=semaphore))
+            self.tasks.add(future)
+            future.add_done_callback(self.tasks.discard)
+
+        # 等待执行中的任务结束
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def run_task(self, task, semaphore: asyncio.Semaphore):
+        """
+        执行单个任务
+
+        :param task: 任务
+        :param semaphore: 并发控制
+        :return:
+        """
+        try:
+            if not isinstance(task, Request):
+                self.parse_task(task=task)
+            elif task.jump_spider:
+                await self.loop.run_in_executor(None, self.run_jump_spider, task)
+            else:
+                await self.run_requests_async(task)
+        except DropRequestException as e:
+            logger.warning(f"丢弃请求：{e}")
+        except Exception as e:
+            if settings.SPIDER_STOP_ON_ERROR:
+                self.stop = True
+                self.exception = e
+                return
+
+            # spider 报错处理
+            for middleware in self.spider.SPIDER_MIDDLEWARE:
+                middleware.spider_error(self.spider, e)
+        finally:
+            self.queue.release(task)
+            semaphore.release()
+
+    async def run_requests_async(self, request: Request):
+        """
+        处理 yield 的 Request（异步发起请求）
+
+        :param request:
+        :return:
+        """
+        # 请求发起前的处理（延迟重试的请求已经处理过）
+        failed_times = self.get_retry_times(request)
+        if not failed_times:
+            self.run_request_in(request)
+
+        # 处理请求
+        response = None
+        while failed_times < settings.REQUEST_RETRY_TIMES:
+            try:
+                response = await request.send_async()
+                break
+            except Exception as e:
+                failed_times += 1
+                self.run_request_error(request, response, e)
+
+            # 失败达到最大次数直接丢弃
+            if failed_times >= settings.REQUEST_RETRY_TIMES:
+                self.run_request_failed(request)
+                return
+
+            # 开启退避重试时放入延迟队列，不占用并发
+            if self.retry_later(request, failed_times):
+                return
+
+        # 请求结束的回调
+        self.run_request_close(request, response)
+
+        # 继续监控下次 yield（回调进程池中执行时不阻塞事件循环）
+        if self.spider.callback_pool.offload(request):
+            tasks = await asyncio.wrap_future(self.spider.callback_pool.submit(request, response))
+            for task in CallbackPool.loads(tasks):
+                self.parse_task(task=task, request=request, response=response)
+        else:
+            self.run_callback(request, response)
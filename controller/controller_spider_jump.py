@@ -54,12 +54,13 @@ class JumpController:
         request = None
 
         try:
-            while True:
+            # 单线程执行，队列为空即结束（调度器内还有未就绪的请求时继续等待）
+            while not self.queue.empty():
                 task = self.queue.get(timeout=0.5)
 
                 try:
                     if task is None:
-                        break
+                        continue
                     elif not isinstance(task, Request):
                         continue
 
@@ -67,6 +68,9 @@ class JumpController:
                     self.run_requests(request=task)
                 except DropRequestException as e:
                     logger.warning(f"丢弃请求：{e}")
+                finally:
+                    if task is not None:
+                        self.queue.release(task)
         finally:
             self.change_record()
 
@@ -95,7 +99,7 @@ class JumpController:
             new_request.cookie_jar = old_request.cookie_jar  # 续上上一个的 cookie_jar
 
         # 修改优先级，深层的函数应该优先处理，避免积压不前（深度爬取）
-        if settings.REQUEST_QUEUE_MODE == 3:
+        if settings.REQUEST_QUEUE_MODE in (3, 5, 6):
             new_request.priority = old_request.priority - 1
 
         self.queue.put(new_request)
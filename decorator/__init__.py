@@ -1,2 +1,3 @@
 from palp.decorator.decorator_run_func_by_thread import RunByThreadDecorator
 from palp.decorator.decorator_lock import FuncLockDecorator, FuncLockSharedDecorator
+from palp.decorator.decorator_process_callback import ProcessCallbackDecorator
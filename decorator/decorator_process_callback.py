@@ -0,0 +1,20 @@
+"""
+    标记在进程池中执行的回调（CPU 密集的解析）
+"""
+from typing import Callable
+
+
+class ProcessCallbackDecorator:
+    """
+        标记在进程池中执行的回调：子进程解析响应，yield 的 Request、Item 返回主进程后再放入队列
+
+        注意：
+            子进程中的 spider 是启动时的副本，回调中对 spider 属性的修改不会同步到主进程
+            yield 的 Request 使用 settings.REQUEST_CODEC 编码返回，Item 需要可以被 pickle
+            需要支持 fork 的系统，否则依旧在线程中执行
+    """
+
+    def __call__(self, func: Callable):
+        func.run_by_process = True
+
+        return func
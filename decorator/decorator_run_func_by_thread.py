@@ -19,26 +19,35 @@ class RunByThreadDecorator:
         self.callback = callback
         self.kwargs = kwargs
 
-        self.func_args = None
-        self.func_kwargs = None
-
-    def run(self, func: Callable) -> None:
+    def run(self, func: Callable, args: tuple, kwargs: dict) -> None:
         """
 
         :param func: 执行函数
+        :param args: 执行参数
+        :param kwargs: 执行参数
         :return:
         """
-        res = func(*self.func_args, **self.func_kwargs)
+        spider = args[0]
+        try:
+            res = func(*args, **kwargs)
+        finally:
+            # 通知 spider 分发线程已结束（先移出列表，通知时线程还未退出）
+            if hasattr(spider, 'distribute_thread_list'):
+                try:
+                    spider.distribute_thread_list.remove(threading.current_thread())
+                except ValueError:
+                    pass
+            if hasattr(spider, 'notify_state'):
+                spider.notify_state()
+
         if self.callback:
             self.callback(res)
 
     def __call__(self, func: Callable):
         def _wrapper(*args, **kwargs):
-            self.func_args = args
-            self.func_kwargs = kwargs
             spider = args[0]
 
-            thread = threading.Thread(target=self.run, args=(func,), **self.kwargs)
+            thread = threading.Thread(target=self.run, args=(func, args, kwargs), **self.kwargs)
 
             if hasattr(spider, 'distribute_thread_list'):
                 spider.distribute_thread_list.append(thread)  # 将线程存入列表
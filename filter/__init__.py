@@ -2,3 +2,5 @@ from palp.filter.filter_set import SetFilter
 from palp.filter.filter_bloom import BloomFilter
 from palp.filter.filter_redis_set import RedisSetFilter
 from palp.filter.filter_redis_bloom import RedisBloomFilter
+from palp.filter.filter_redis_bloom_native import RedisNativeBloomFilter
+from palp.filter.filter_shared import FilterServer, SharedFilter
@@ -3,7 +3,7 @@
 """
 import hashlib
 import threading
-from typing import Union, Any
+from typing import Union, Any, List
 from abc import abstractmethod
 from palp.item.item import Item
 from urllib.parse import urlencode
@@ -21,6 +21,39 @@ class FilterBase:
         :return:
         """
 
+    def is_repeat_many(self, objs: List[Union[Request, Item]], **kwargs) -> List[bool]:
+        """
+        批量判断是否重复，批量获取指纹后交给 judge_many 处理（同一批中后出现的相同对象视为重复）
+
+        :param objs: request 对象或 item 对象的列表
+        :param kwargs:
+        :return: 与 objs 一一对应的是否重复
+        """
+        result = [False] * len(objs)
+
+        requests = [index for index, obj in enumerate(objs) if isinstance(obj, Request)]
+        items = [index for index, obj in enumerate(objs) if not isinstance(obj, Request)]
+
+        for indexes in [requests, items]:
+            if not indexes:
+                continue
+
+            f = self.get_filter(objs[indexes[0]])
+            fingerprints = [self.fingerprint(objs[index]) for index in indexes]
+            for index, is_repeat in zip(indexes, self.judge_many(f, fingerprints)):
+                result[index] = is_repeat
+
+        return result
+
+    @abstractmethod
+    def get_filter(self, obj: Union[Request, Item]) -> Any:
+        """
+        获取对象对应的判断条件（request、item 分开过滤）
+
+        :param obj: request 对象或 item 对象
+        :return:
+        """
+
     @abstractmethod
     def judge(self, f: Any, fingerprint: str) -> bool:
         """
@@ -31,6 +64,34 @@ class FilterBase:
         :return:
         """
 
+    def judge_many(self, f: Any, fingerprints: List[str]) -> List[bool]:
+        """
+        批量进行判断，默认逐个判断，子类可以实现一次完成
+
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        return [self.judge(f, fingerprint) for fingerprint in fingerprints]
+
+    def dump(self, path: str) -> bool:
+        """
+        保存过滤器的状态（本地检查点使用，只有本地过滤器需要实现）
+
+        :param path: 文件路径前缀
+        :return: 是否保存
+        """
+        return False
+
+    def load(self, path: str) -> bool:
+        """
+        加载 dump 保存的状态
+
+        :param path: 文件路径前缀
+        :return: 是否加载
+        """
+        return False
+
     @staticmethod
     def fingerprint(obj: Union[Request, Item]) -> str:
         """
@@ -4,6 +4,7 @@
     print(BloomFilter.is_repeat(request=RequestGet(url='https://www.baidu.com')))
     print(BloomFilter.is_repeat(request=RequestGet(url='https://www.baidu.com')))
 """
+import os
 from palp import settings
 from palp.network.request import Request
 from pybloom_live import ScalableBloomFilter
@@ -24,17 +25,39 @@ class BloomFilter(FilterBase):
         :return:
         """
         fingerprint = self.fingerprint(obj=obj)
+        bloom_filter = self.get_filter(obj)
 
+        if settings.STRICT_FILTER:
+            with FilterLock():
+                return self.judge(bloom_filter, fingerprint)
+        else:
+            return self.judge(bloom_filter, fingerprint)
+
+    def get_filter(self, obj):
+        """
+        获取对象对应的布隆过滤器
+
+        :param obj:
+        :return:
+        """
         if isinstance(obj, Request):
-            bloom_filter = self.bloom_filter_request
+            return self.bloom_filter_request
         else:
-            bloom_filter = self.bloom_filter_item
+            return self.bloom_filter_item
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断（严格去重时整批只加一次锁）
 
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
         if settings.STRICT_FILTER:
             with FilterLock():
-                return self.judge(bloom_filter, fingerprint)
+                return super().judge_many(f, fingerprints)
         else:
-            return self.judge(bloom_filter, fingerprint)
+            return super().judge_many(f, fingerprints)
 
     def judge(self, f, fingerprint):
         """
@@ -45,3 +68,35 @@ class BloomFilter(FilterBase):
         :return:
         """
         return f.add(fingerprint)
+
+    def dump(self, path):
+        """
+        保存两个布隆过滤器的位数组（各自一个文件，写入临时文件后替换）
+
+        :param path: 文件路径前缀
+        :return:
+        """
+        for name, bloom_filter in [('request', self.bloom_filter_request), ('item', self.bloom_filter_item)]:
+            with FilterLock():
+                with open(f'{path}.{name}.bloom.tmp', 'wb') as f:
+                    bloom_filter.tofile(f)
+            os.replace(f'{path}.{name}.bloom.tmp', f'{path}.{name}.bloom')
+
+        return True
+
+    def load(self, path):
+        """
+        加载两个布隆过滤器（直接读取位数组，无需重新计算）
+
+        :param path: 文件路径前缀
+        :return:
+        """
+        if not os.path.exists(f'{path}.request.bloom'):
+            return False
+
+        with open(f'{path}.request.bloom', 'rb') as f:
+            self.bloom_filter_request = ScalableBloomFilter.fromfile(f)
+        with open(f'{path}.item.bloom', 'rb') as f:
+            self.bloom_filter_item = ScalableBloomFilter.fromfile(f)
+
+        return True
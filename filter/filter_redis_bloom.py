@@ -2,21 +2,99 @@
     redis 上才布隆过滤器
 
     学习链接：https://cuiqingcai.com/8472.html
+
+    判断与添加通过 lua 脚本在 redis 内一次完成，每次判断只有一次网络往返，且是原子的
+
+    位的计算使用 Kirsch–Mitzenmacher 双重哈希：g_i(x) = h1(x) + i * h2(x)，h1、h2 取自指纹（md5）的前后 64 位
+    批量计算时如果安装了 numpy 则向量化计算
+
+    容量、分片：
+        根据 BLOOMFILTER_CAPACITY、BLOOMFILTER_ERROR_RATE 计算位数、哈希数量，并拆分为 BLOOMFILTER_SHARDS 个分片
+        每个指纹只落在一个分片上，分片的 key 使用 hash tag：{过滤 key:分片}:层，同一分片的所有层、计数在同一个 slot
+        分片满了会自动增加一层（容量翻倍、误判率减半，同本地的 ScalableBloomFilter），判断时会检查所有层
+        单个分片超过 redis 单个 key 的上限（512M）时位数不再增加，误判率会高于设置的值（会有警告，需要增加 BLOOMFILTER_SHARDS）
+
+    旧版过滤器（单个 key，BLOOMFILTER_BIT、BLOOMFILTER_HASH_NUMBER）：
+        持久化（PERSISTENCE_REQUEST_FILTER、PERSISTENCE_ITEM_FILTER）的旧版过滤器 key 存在时，作为只读的一层继续判断
+        判断的指纹同时写入新的过滤器，旧版 key 在不再持久化（爬虫结束时删除过滤队列）后随之删除
 """
+import math
+from loguru import logger
 from palp import settings
-from quickdb import RedisLock
 from palp.network.request import Request
 from palp.filter.filter import FilterBase
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 检查之前所有层，并对最后一层设置所有位，新增时计数，达到容量则增加一层
+# KEYS：分片信息（hash）、各层的 key
+# ARGV：客户端已知的层数、最后一层的容量、每一层的哈希数量及位
+# 返回：{是否重复（-1 为层数不一致，需要更新后重试）, 层数}
+BLOOM_CHECK_AND_SET_SCRIPT = """
+local layers = tonumber(redis.call('HGET', KEYS[1], 'layers') or 1)
+if layers ~= tonumber(ARGV[1]) then
+    return {-1, layers}
+end
+
+local index = 3
+for layer = 1, layers do
+    local k = tonumber(ARGV[index])
+    local key = KEYS[layer + 1]
+    local exist = 1
+
+    if layer < layers then
+        for i = index + 1, index + k do
+            if redis.call('GETBIT', key, ARGV[i]) == 0 then
+                exist = 0
+                break
+            end
+        end
+    else
+        for i = index + 1, index + k do
+            if redis.call('SETBIT', key, ARGV[i], 1) == 0 then
+                exist = 0
+            end
+        end
+
+        if exist == 0 then
+            local count = redis.call('HINCRBY', KEYS[1], 'count:' .. (layer - 1), 1)
+            if count >= tonumber(ARGV[2]) then
+                redis.call('HSET', KEYS[1], 'layers', layers + 1)
+            end
+        end
+    end
+
+    if exist == 1 then
+        return {1, layers}
+    end
+
+    index = index + k + 1
+end
+
+return {0, layers}
+"""
+
 
 class RedisBloomFilter(FilterBase):
+    GROWTH = 2  # 每增加一层容量的倍数
+    TIGHTENING_RATIO = 0.5  # 每增加一层误判率的倍数（总误判率不超过 BLOOMFILTER_ERROR_RATE 的 2 倍）
+    MAX_BITS = 1 << 32  # redis 单个 key 最大 512M
+    LEGACY_BIT = 6  # 旧版过滤器默认的位数
+    LEGACY_HASH_NUMBER = 30  # 旧版过滤器默认的哈希数量
+
     def __init__(self):
         """
         Initialize BloomFilter
 
         """
-        self.m = 1 << settings.BLOOMFILTER_BIT
-        self.seeds = range(settings.BLOOMFILTER_HASH_NUMBER)
+        self.shards = max(settings.BLOOMFILTER_SHARDS, 1)
+        self.params = {}  # 每一层的参数 {层: (位数, 哈希数量, 单个分片的容量)}
+        self.layers = {}  # 已知的分片层数 {分片信息 key: 层数}
+        self.legacy = {}  # 是否存在旧版过滤器 {过滤 key: bool}
+        self.script = None
 
     def is_repeat(self, obj, **kwargs):
         """
@@ -26,71 +104,273 @@ class RedisBloomFilter(FilterBase):
         :param kwargs:
         :return:
         """
-        from palp.conn import redis_conn
-
         fingerprint = self.fingerprint(obj)
+        redis_key_filter = self.get_filter(obj)
+
+        # 脚本在 redis 内原子执行，STRICT_FILTER 无需再加锁
+        return self.judge(redis_key_filter, fingerprint) or self.legacy_exists(redis_key_filter, [fingerprint])[0]
+
+    def get_filter(self, obj):
+        """
+        获取对象对应的过滤 key
 
+        :param obj:
+        :return:
+        """
         if isinstance(obj, Request):
-            redis_key_filter = settings.REDIS_KEY_QUEUE_FILTER_REQUEST
+            return settings.REDIS_KEY_QUEUE_FILTER_REQUEST
         else:
-            redis_key_filter = settings.REDIS_KEY_QUEUE_FILTER_ITEM
+            return settings.REDIS_KEY_QUEUE_FILTER_ITEM
 
-        if settings.STRICT_FILTER:
-            with RedisLock(conn=redis_conn, lock_name=settings.REDIS_KEY_LOCK + 'Request'):
-                return self.judge(redis_key_filter, fingerprint)
-        else:
-            return self.judge(redis_key_filter, fingerprint)
+    def layer(self, layer: int) -> tuple:
+        """
+        计算某一层的参数
+
+        :param layer: 层
+        :return: (单个分片的位数（2 的幂）, 哈希数量, 单个分片的容量)
+        """
+        if layer not in self.params:
+            capacity = settings.BLOOMFILTER_CAPACITY * self.GROWTH ** layer
+            error_rate = settings.BLOOMFILTER_ERROR_RATE * self.TIGHTENING_RATIO ** layer
+
+            bits = math.ceil(capacity * math.log(1 / error_rate) / math.log(2) ** 2 / self.shards)
+            m = min(1 << max(bits - 1, 1).bit_length(), self.MAX_BITS)
+            k = math.ceil(math.log2(1 / error_rate))
+
+            if bits > self.MAX_BITS:
+                logger.warning(
+                    f"redis 布隆过滤器第 {layer + 1} 层单个分片需要 {bits} 位，超过单个 key 的上限 {self.MAX_BITS}，"
+                    f"误判率将高于 {error_rate}，请增加 BLOOMFILTER_SHARDS"
+                )
+
+            self.params[layer] = (m, k, math.ceil(capacity / self.shards))
+
+        return self.params[layer]
+
+    def shard(self, fingerprint: str) -> int:
+        """
+        指纹所在的分片（使用 h1 的高 32 位，与位的计算无关）
+
+        :param fingerprint: 指纹（md5）
+        :return:
+        """
+        return int(fingerprint[:8], 16) % self.shards
+
+    def offsets(self, fingerprint: str, layer: int = 0) -> list:
+        """
+        获取指纹对应的所有位（双重哈希）
+
+        :param fingerprint: 指纹（md5）
+        :param layer: 层
+        :return:
+        """
+        m, k, _ = self.layer(layer)
+        h1, h2 = self.split(fingerprint)
+
+        return [(h1 + seed * h2) & (m - 1) for seed in range(k)]
+
+    def offsets_many(self, fingerprints: list, layer: int = 0) -> list:
+        """
+        批量获取指纹对应的所有位，安装了 numpy 时向量化计算
+
+        :param fingerprints: 指纹列表
+        :param layer: 层
+        :return: 与指纹一一对应的位列表
+        """
+        if numpy is None or not fingerprints:
+            return [self.offsets(fingerprint, layer) for fingerprint in fingerprints]
+
+        m, k, _ = self.layer(layer)
+        h = numpy.array([self.split(fingerprint) for fingerprint in fingerprints], dtype=numpy.uint64)
+        seeds = numpy.arange(k, dtype=numpy.uint64)
+
+        # uint64 溢出即对 2^64 取模，m 是 2 的幂，结果与 offsets 一致
+        with numpy.errstate(over='ignore'):
+            offsets = (h[:, :1] + seeds * h[:, 1:]) & numpy.uint64(m - 1)
+
+        return offsets.tolist()
 
-    def exists(self, fingerprint: str, redis_key_filter: str):
+    @staticmethod
+    def split(fingerprint: str) -> tuple:
         """
-        判断值是否存在
+        将指纹拆分为两个 64 位的哈希值，h2 取奇数保证 m 为 2 的幂时各个位不重复
 
+        :param fingerprint: 指纹（md5）
+        :return:
+        """
+        return int(fingerprint[:16], 16), int(fingerprint[16:32], 16) | 1
+
+    @staticmethod
+    def shard_key(redis_key_filter: str, shard: int) -> str:
+        """
+        分片的 key 前缀（hash tag）
+
+        :param redis_key_filter: 过滤 key
+        :param shard: 分片
+        :return:
+        """
+        return '{%s:%s}' % (redis_key_filter, shard)
+
+    @staticmethod
+    def keys_pattern(redis_key_filter: str) -> str:
+        """
+        过滤 key 对应的所有分片 key 的匹配规则（用于删除）
+
+        :param redis_key_filter: 过滤 key
+        :return:
+        """
+        return '{%s:*' % redis_key_filter
+
+    def has_legacy(self, redis_key_filter: str) -> bool:
+        """
+        是否存在旧版过滤器（过滤 key 本身为位图）
+
+        :param redis_key_filter: 过滤 key
         :return:
         """
         from palp.conn import redis_conn
 
-        if not fingerprint:
-            return False
-        exist = 1
-        for seed in self.seeds:
-            offset = self.hash(seed, fingerprint)
-            exist = exist & redis_conn.getbit(redis_key_filter, offset)
-        return exist
+        if redis_key_filter not in self.legacy:
+            key_type = redis_conn.type(redis_key_filter)
+            self.legacy[redis_key_filter] = key_type in (b'string', 'string')
 
-    def insert(self, fingerprint: str, redis_key_filter: str):
+            if self.legacy[redis_key_filter]:
+                logger.warning(f"存在旧版的 redis 布隆过滤器，作为只读的一层继续判断：{redis_key_filter}")
+
+        return self.legacy[redis_key_filter]
+
+    @classmethod
+    def legacy_offsets(cls, fingerprint: str) -> list:
         """
-        把值加入到 bloom
+        旧版过滤器中指纹对应的所有位
 
+        :param fingerprint: 指纹
         :return:
         """
+        m = 1 << (settings.BLOOMFILTER_BIT or cls.LEGACY_BIT)
+
+        offsets = []
+        for seed in range(settings.BLOOMFILTER_HASH_NUMBER or cls.LEGACY_HASH_NUMBER):
+            ret = 0
+            for char in fingerprint:
+                ret += seed * ret + ord(char)
+            offsets.append((m - 1) & ret)
+
+        return offsets
+
+    def legacy_exists(self, redis_key_filter: str, fingerprints: list) -> list:
+        """
+        批量判断指纹是否在旧版过滤器中（只读）
+
+        :param redis_key_filter: 过滤 key
+        :param fingerprints: 指纹列表
+        :return: 与指纹一一对应的是否存在
+        """
         from palp.conn import redis_conn
 
-        for seed in self.seeds:
-            offset = self.hash(seed, fingerprint)
-            redis_conn.setbit(redis_key_filter, offset, 1)
+        if not fingerprints or not self.has_legacy(redis_key_filter):
+            return [False] * len(fingerprints)
 
-    def hash(self, seed: int, value: str):
+        offsets = [self.legacy_offsets(fingerprint) for fingerprint in fingerprints]
+        pipe = redis_conn.pipeline(transaction=False)
+        for fingerprint_offsets in offsets:
+            for offset in fingerprint_offsets:
+                pipe.getbit(redis_key_filter, offset)
+
+        bits = iter(pipe.execute())
+        return [all([next(bits) for _ in fingerprint_offsets]) for fingerprint_offsets in offsets]
+
+    def get_script(self):
         """
-        Hash
+        获取注册的 lua 脚本
 
         :return:
         """
-        ret = 0
-        for i in range(len(value)):
-            ret += seed * ret + ord(value[i])
-        return (self.m - 1) & ret
+        from palp.conn import redis_conn
+
+        if self.script is None:
+            self.script = redis_conn.register_script(BLOOM_CHECK_AND_SET_SCRIPT)
+
+        return self.script
+
+    def script_params(self, shard_key: str, offsets: list) -> tuple:
+        """
+        构建脚本的参数
+
+        :param shard_key: 分片的 key 前缀
+        :param offsets: 每一层的位
+        :return: (keys, args)
+        """
+        layers = len(offsets)
+        keys = [shard_key + ':meta']
+        args = [layers, self.layer(layers - 1)[2]]
+        for layer, layer_offsets in enumerate(offsets):
+            keys.append(f'{shard_key}:{layer}')
+            args.append(len(layer_offsets))
+            args.extend(layer_offsets)
+
+        return keys, args
 
     def judge(self, f, fingerprint):
         """
-        进行判断
+        进行判断：通过 lua 脚本一次完成判断与添加（原子操作，无需加锁）
 
         :param f: 判断条件或方法之类
         :param fingerprint: 指纹
         :return:
         """
-        if self.exists(fingerprint=fingerprint, redis_key_filter=f):
-            return True
+        script = self.get_script()
+        shard_key = self.shard_key(f, self.shard(fingerprint))
+        meta_key = shard_key + ':meta'
+
+        while True:
+            layers = self.layers.get(meta_key, 1)
+            offsets = [self.offsets(fingerprint, layer) for layer in range(layers)]
+
+            keys, args = self.script_params(shard_key, offsets)
+            exist, layers = script(keys=keys, args=args)
+            self.layers[meta_key] = int(layers)
+
+            # 其它机器增加了层，更新后重试
+            if exist != -1:
+                return bool(exist)
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断：批量计算位，通过 pipeline 一次发送所有脚本调用
+        集群的 pipeline 不支持脚本（evalsha），集群时逐个调用
+
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        script = self.get_script()
+        shard_keys = [self.shard_key(f, self.shard(fingerprint)) for fingerprint in fingerprints]
+        layers = [self.layers.get(shard_key + ':meta', 1) for shard_key in shard_keys]
+        offsets = [self.offsets_many(fingerprints, layer) for layer in range(max(layers))]
+        params = [
+            self.script_params(shard_key, [offsets[layer][index] for layer in range(layers[index])])
+            for index, shard_key in enumerate(shard_keys)
+        ]
+
+        if settings.REDIS_CLUSTER_NODES:
+            results = [script(keys=keys, args=args) for keys, args in params]
+        else:
+            pipe = redis_conn.pipeline(transaction=False)
+            for keys, args in params:
+                script(keys=keys, args=args, client=pipe)
+            results = pipe.execute()
+
+        result = []
+        for shard_key, fingerprint, (exist, layers) in zip(shard_keys, fingerprints, results):
+            self.layers[shard_key + ':meta'] = int(layers)
 
-        self.insert(fingerprint=fingerprint, redis_key_filter=f)
+            # 其它机器增加了层，单独重试
+            if exist == -1:
+                result.append(self.judge(f, fingerprint))
+            else:
+                result.append(bool(exist))
 
-        return False
+        return [a or b for a, b in zip(result, self.legacy_exists(f, fingerprints))]
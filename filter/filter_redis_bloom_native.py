@@ -0,0 +1,110 @@
+"""
+    redis 原生布隆过滤器（需要 redis 加载 RedisBloom 模块，即 BF.* 命令）
+
+    判断与添加通过 BF.ADD 在 redis 内一次完成（C 实现），分片规则同 RedisBloomFilter：{过滤 key:分片}:bf
+    启动时检测是否支持 BF.* 命令，不支持（未知命令）则使用 lua 实现的 RedisBloomFilter，连接、认证等其它错误直接抛出
+"""
+import math
+from loguru import logger
+from redis.exceptions import ResponseError
+from palp import settings
+from palp.filter.filter_redis_bloom import RedisBloomFilter
+
+
+class RedisNativeBloomFilter(RedisBloomFilter):
+    def __init__(self):
+        super().__init__()
+        self.native = self.check_native()  # 是否支持 BF.* 命令
+        self.reserved = set()  # 已经创建的 key
+
+    @staticmethod
+    def check_native() -> bool:
+        """
+        检测 redis 是否加载了 RedisBloom 模块（只有未知命令时回退，否则两种实现的 key 不同，会导致去重失效）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        try:
+            redis_conn.execute_command('BF.EXISTS', settings.REDIS_KEY_LOCK + 'BloomCheck', 'palp')
+        except ResponseError as e:
+            if 'unknown command' not in str(e).lower():
+                raise
+
+            logger.warning(f'redis 不支持 BF.* 命令，使用 lua 实现的布隆过滤器：{e}')
+            return False
+
+        return True
+
+    def reserve(self, key: str) -> None:
+        """
+        按照容量、误判率创建过滤器（BF.ADD 自动创建的容量、误判率为 redis 默认值）
+
+        :param key:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if key in self.reserved:
+            return
+
+        try:
+            redis_conn.execute_command(
+                'BF.RESERVE', key, settings.BLOOMFILTER_ERROR_RATE,
+                math.ceil(settings.BLOOMFILTER_CAPACITY / self.shards), 'EXPANSION', self.GROWTH
+            )
+        except Exception as e:
+            # 已经存在
+            if 'exists' not in str(e).lower():
+                raise
+
+        self.reserved.add(key)
+
+    def judge(self, f, fingerprint):
+        """
+        进行判断：BF.ADD 返回 0 即已存在
+
+        :param f: 判断条件或方法之类
+        :param fingerprint: 指纹
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if not self.native:
+            return super().judge(f, fingerprint)
+
+        key = self.shard_key(f, self.shard(fingerprint)) + ':bf'
+        self.reserve(key)
+
+        return not redis_conn.execute_command('BF.ADD', key, fingerprint)
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断：按分片分组，通过 pipeline 一次发送所有 BF.MADD
+
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if not self.native:
+            return super().judge_many(f, fingerprints)
+
+        shards = {}
+        for index, fingerprint in enumerate(fingerprints):
+            key = self.shard_key(f, self.shard(fingerprint)) + ':bf'
+            shards.setdefault(key, []).append(index)
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for key, indexes in shards.items():
+            self.reserve(key)
+            pipe.execute_command('BF.MADD', key, *[fingerprints[index] for index in indexes])
+
+        result = [False] * len(fingerprints)
+        for indexes, added in zip(shards.values(), pipe.execute()):
+            for index, is_added in zip(indexes, added):
+                result[index] = not is_added
+
+        return [a or b for a, b in zip(result, self.legacy_exists(f, fingerprints))]
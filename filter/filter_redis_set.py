@@ -24,11 +24,7 @@ class RedisSetFilter(FilterBase):
         from palp.conn import redis_conn
 
         fingerprint = self.fingerprint(obj=obj)
-
-        if isinstance(obj, Request):
-            redis_key_filter = settings.REDIS_KEY_QUEUE_FILTER_REQUEST
-        else:
-            redis_key_filter = settings.REDIS_KEY_QUEUE_FILTER_ITEM
+        redis_key_filter = self.get_filter(obj)
 
         if settings.STRICT_FILTER:
             with RedisLock(conn=redis_conn, lock_name=settings.REDIS_KEY_LOCK + 'Request'):
@@ -36,6 +32,34 @@ class RedisSetFilter(FilterBase):
         else:
             return self.judge(redis_key_filter, fingerprint)
 
+    def get_filter(self, obj):
+        """
+        获取对象对应的过滤 key
+
+        :param obj:
+        :return:
+        """
+        if isinstance(obj, Request):
+            return settings.REDIS_KEY_QUEUE_FILTER_REQUEST
+        else:
+            return settings.REDIS_KEY_QUEUE_FILTER_ITEM
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断：通过 pipeline 一次发送所有 sadd，sadd 返回 0 即已存在（sadd 本身是原子的，无需加锁）
+
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for fingerprint in fingerprints:
+            pipe.sadd(f, fingerprint)
+
+        return [not added for added in pipe.execute()]
+
     def judge(self, f, fingerprint):
         """
         进行判断
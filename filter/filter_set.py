@@ -4,6 +4,8 @@
     print(MemoryFilter.is_repeat(request=RequestGet(url='https://www.baidu.com')))
     print(MemoryFilter.is_repeat(request=RequestGet(url='https://www.baidu.com')))
 """
+import os
+import pickle
 from palp import settings
 from palp.network.request import Request
 from palp.filter.filter import FilterBase, FilterLock
@@ -23,17 +25,39 @@ class SetFilter(FilterBase):
         :return:
         """
         fingerprint = self.fingerprint(obj=obj)
+        memory_filter = self.get_filter(obj)
 
+        if settings.STRICT_FILTER:
+            with FilterLock():
+                return self.judge(memory_filter, fingerprint)
+        else:
+            return self.judge(memory_filter, fingerprint)
+
+    def get_filter(self, obj):
+        """
+        获取对象对应的 set
+
+        :param obj:
+        :return:
+        """
         if isinstance(obj, Request):
-            memory_filter = self.memory_filter_request
+            return self.memory_filter_request
         else:
-            memory_filter = self.memory_filter_item
+            return self.memory_filter_item
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断（严格去重时整批只加一次锁）
 
+        :param f: 判断条件或方法之类
+        :param fingerprints: 指纹列表
+        :return:
+        """
         if settings.STRICT_FILTER:
             with FilterLock():
-                return self.judge(memory_filter, fingerprint)
+                return super().judge_many(f, fingerprints)
         else:
-            return self.judge(memory_filter, fingerprint)
+            return super().judge_many(f, fingerprints)
 
     def judge(self, f, fingerprint):
         """
@@ -49,3 +73,38 @@ class SetFilter(FilterBase):
         f.add(fingerprint)
 
         return False
+
+    def dump(self, path):
+        """
+        保存两个 set（写入临时文件后替换，避免中途结束导致文件损坏）
+
+        :param path: 文件路径前缀
+        :return:
+        """
+        with FilterLock():
+            # set.copy 在 GIL 下一次完成，不会遇到其它线程同时添加
+            state = [self.memory_filter_request.copy(), self.memory_filter_item.copy()]
+
+        with open(path + '.set.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.set.tmp', path + '.set')
+
+        return True
+
+    def load(self, path):
+        """
+        加载两个 set
+
+        :param path: 文件路径前缀
+        :return:
+        """
+        if not os.path.exists(path + '.set'):
+            return False
+
+        with open(path + '.set', 'rb') as f:
+            request, item = pickle.load(f)
+
+        self.memory_filter_request.update(request)
+        self.memory_filter_item.update(item)
+
+        return True
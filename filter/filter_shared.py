@@ -0,0 +1,91 @@
+"""
+    多进程共享的过滤器（本地爬虫开启 SPIDER_PROCESSES 时使用）
+
+    FilterServer：运行在协调进程中，持有真正的本地过滤器（SetFilter、BloomFilter）
+    SharedFilter：工作进程中的过滤器，在本进程计算指纹，每批只需要一次进程间通信
+"""
+import threading
+from palp.item.item import Item
+from palp.network.request import Request
+from palp.filter.filter import FilterBase
+
+
+class FilterServer:
+    """
+        多进程共享的过滤器（运行在协调进程中）
+    """
+
+    def __init__(self, filter_cls: type):
+        """
+
+        :param filter_cls: 本地过滤器
+        """
+        self.filter = filter_cls()
+        self.filters = {
+            'request': self.filter.get_filter(Request.__new__(Request)),
+            'item': self.filter.get_filter(Item())
+        }
+        self.mutex = threading.Lock()
+
+    def judge_many(self, kind: str, fingerprints: list) -> list:
+        """
+        批量进行判断
+
+        :param kind: request、item
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        with self.mutex:
+            return self.filter.judge_many(self.filters[kind], fingerprints)
+
+
+class SharedFilter(FilterBase):
+    """
+        工作进程中的过滤器（转发给 FilterServer 的代理）
+    """
+
+    def __init__(self, server):
+        """
+
+        :param server: FilterServer 的代理
+        """
+        self.server = server
+
+    def is_repeat(self, obj, **kwargs):
+        """
+        判断是否重复
+
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        return self.is_repeat_many([obj])[0]
+
+    def get_filter(self, obj):
+        """
+        获取对象对应的过滤器类型
+
+        :param obj:
+        :return:
+        """
+        return 'request' if isinstance(obj, Request) else 'item'
+
+    def judge(self, f, fingerprint):
+        """
+        进行判断
+
+        :param f: 过滤器类型
+        :param fingerprint: 指纹
+        :return:
+        """
+        return self.judge_many(f, [fingerprint])[0]
+
+    def judge_many(self, f, fingerprints):
+        """
+        批量进行判断（一次进程间通信）
+
+        :param f: 过滤器类型
+        :param fingerprints: 指纹列表
+        :return:
+        """
+        return self.server.judge_many(f, fingerprints)
@@ -6,5 +6,5 @@ from palp.middleware.middleware_request_record import RequestRecordMiddleware
 from palp.middleware.middleware_cycle_spider_record import CycleSpiderRecordMiddleware
 from palp.middleware.middleware_spider import SpiderMiddleware
 from palp.middleware.middleware_request import RequestMiddleware
-from palp.middleware.middleware_request_filter import RedisSetFilter, RedisBloomFilter, RedisSetFilterMiddleware, \
-    RedisBloomFilterMiddleware
+from palp.middleware.middleware_request_filter import RedisSetFilter, RedisBloomFilter, RequestFilterMiddleware, \
+    RedisSetFilterMiddleware, RedisBloomFilterMiddleware, RedisNativeBloomFilterMiddleware
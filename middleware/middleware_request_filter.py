@@ -4,75 +4,92 @@
     注意：
         setting 启用才会去重
         只有设置 filter_repeat 才会对请求做 阻拦 操作
+        大量请求同时入队时可以使用 filter_requests 批量去重（一次批量调用过滤器）
+        开启 FILTER_REQUEST_ON_PUT 时在入队时去重（filter_requests），出队时不再去重
+        从检查点恢复的请求（checkpoint_restored）不会被丢弃：保存检查点时已经取出还未处理完毕的请求已经记录在过滤器中
 """
+from typing import List
+from loguru import logger
 from palp import settings
 from palp.filter.filter_bloom import BloomFilter
 from palp.filter.filter_redis_set import RedisSetFilter
 from palp.filter.filter_set import SetFilter
+from palp.network.request import Request
 from palp.exception import DropRequestException
 from palp.filter.filter_redis_bloom import RedisBloomFilter
+from palp.filter.filter_redis_bloom_native import RedisNativeBloomFilter
 from palp.middleware.middleware_request import RequestMiddleware
 
 
-class SetFilterMiddleware(RequestMiddleware):
+class RequestFilterMiddleware(RequestMiddleware):
     """
-        基于内存的 set 的去重
+        请求去重中间件基类
     """
+    FILTER_CLASS = None  # 使用的过滤器
 
     def __init__(self):
-        self.request_memory_filter = SetFilter()
+        self.request_filter = self.FILTER_CLASS()
 
     def request_in(self, spider, request):
-        if settings.FILTER_REQUEST:
-            is_repeat = self.request_memory_filter.is_repeat(obj=request)
+        # 入队时已经去重
+        if settings.FILTER_REQUEST and not settings.FILTER_REQUEST_ON_PUT:
+            is_repeat = self.request_filter.is_repeat(obj=request)
 
-            if request.filter_repeat and is_repeat:
+            if request.filter_repeat and is_repeat and not getattr(request, 'checkpoint_restored', False):
                 raise DropRequestException(f"丢弃重复请求：{request}")
 
+    def filter_requests(self, spider, requests: List[Request]) -> List[Request]:
+        """
+        批量去重，返回未被丢弃的请求
 
-class BloomFilterMiddleware(RequestMiddleware):
-    """
-        基于内存的 bloom 的去重
-    """
+        :param spider:
+        :param requests:
+        :return:
+        """
+        if not settings.FILTER_REQUEST or not requests:
+            return requests
 
-    def __init__(self):
-        self.request_bloom_filter = BloomFilter()
+        result = []
+        for request, is_repeat in zip(requests, self.request_filter.is_repeat_many(objs=requests)):
+            if request.filter_repeat and is_repeat:
+                logger.warning(f"丢弃重复请求：{request}")
+                continue
 
-    def request_in(self, spider, request):
-        if settings.FILTER_REQUEST:
-            is_repeat = self.request_bloom_filter.is_repeat(obj=request)
+            result.append(request)
 
-            if request.filter_repeat and is_repeat:
-                raise DropRequestException(f"丢弃重复请求：{request}")
+        return result
 
 
-class RedisSetFilterMiddleware(RequestMiddleware):
+class SetFilterMiddleware(RequestFilterMiddleware):
     """
-        基于 redis 的 set 的去重
+        基于内存的 set 的去重
     """
+    FILTER_CLASS = SetFilter
 
-    def __init__(self):
-        self.request_redis_filter = RedisSetFilter()
 
-    def request_in(self, spider, request):
-        if settings.FILTER_REQUEST:
-            is_repeat = self.request_redis_filter.is_repeat(obj=request)
+class BloomFilterMiddleware(RequestFilterMiddleware):
+    """
+        基于内存的 bloom 的去重
+    """
+    FILTER_CLASS = BloomFilter
 
-            if request.filter_repeat and is_repeat:
-                raise DropRequestException(f"丢弃重复请求：{request}")
+
+class RedisSetFilterMiddleware(RequestFilterMiddleware):
+    """
+        基于 redis 的 set 的去重
+    """
+    FILTER_CLASS = RedisSetFilter
 
 
-class RedisBloomFilterMiddleware(RequestMiddleware):
+class RedisBloomFilterMiddleware(RequestFilterMiddleware):
     """
         基于 redis 的 bloom 去重
     """
+    FILTER_CLASS = RedisBloomFilter
 
-    def __init__(self):
-        self.request_redis_bloom_filter = RedisBloomFilter()
-
-    def request_in(self, spider, request):
-        if settings.FILTER_REQUEST:
-            is_repeat = self.request_redis_bloom_filter.is_repeat(obj=request)
 
-            if request.filter_repeat and is_repeat:
-                raise DropRequestException(f"丢弃重复请求：{request}")
+class RedisNativeBloomFilterMiddleware(RequestFilterMiddleware):
+    """
+        基于 redis 原生 bloom（RedisBloom 模块）的去重
+    """
+    FILTER_CLASS = RedisNativeBloomFilter
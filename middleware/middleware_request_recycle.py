@@ -25,4 +25,4 @@ class RequestRecycleMiddleware(RequestMiddleware):
         if redis_conn is None or settings.SPIDER_TYPE == 1:
             return
 
-        redis_conn.sadd(settings.REDIS_KEY_QUEUE_BAD_REQUEST, request.to_json())
+        redis_conn.sadd(settings.REDIS_KEY_QUEUE_BAD_REQUEST, request.dumps())
@@ -3,7 +3,9 @@ from palp.network.request_method import RequestGet, RequestPost, RequestDelete,
     RequestPatch
 from palp.network.downloader import ResponseDownloader
 from palp.network.downloader_httpx import ResponseDownloaderByHttpx
+from palp.network.downloader_httpx_async import ResponseDownloaderByHttpxAsync
 from palp.network.downloader_requests import ResponseDownloaderByRequests
 from palp.network.response import Response
 from palp.network.response_httpx import HttpxResponse
 from palp.network.response_requests import RequestsResponse
+from palp.network.response_process import ProcessResponse
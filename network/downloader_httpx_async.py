@@ -0,0 +1,115 @@
+"""
+    httpx 异步请求器（asyncio 引擎使用）
+
+    注意：
+        httpx.AsyncClient 绑定事件循环，所以只能在同一个事件循环内使用（AsyncSpiderController 会在结束时关闭）
+        不保持 session 的请求使用的是不保存 cookie 的共享连接池，避免每次请求都重新建立连接
+"""
+import httpx
+from loguru import logger
+from palp import settings
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from palp.network.downloader import ResponseDownloader
+
+
+class ResponseDownloaderByHttpxAsync(ResponseDownloader):
+    """
+        适用于 httpx 的异步请求器
+    """
+    SESSION = None  # 保持 session 时使用
+    CLIENT = None  # 不保持 session 时使用（不保存 cookie）
+
+    def __new__(cls, *args, **kwargs):
+        """
+        httpx 设置 session
+
+        注意：
+            httpx 的 session 比较麻烦。设置代理必须设置时就加上，建议自定义
+            http2 的话也得在这里设置，建议自定义
+
+        :param args:
+        :param kwargs:
+        """
+        if cls.SESSION is None:
+            cls.SESSION = cls.create_client()
+            cls.CLIENT = cls.create_client(cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])))
+
+        return object.__new__(cls)
+
+    @classmethod
+    def create_client(cls, **kwargs) -> httpx.AsyncClient:
+        """
+        创建异步连接池
+
+        :param kwargs: AsyncClient 参数
+        :return:
+        """
+        if settings.REQUEST_PROXIES_TUNNEL_URL:
+            proxies = {"all://": settings.REQUEST_PROXIES_TUNNEL_URL}
+        else:
+            proxies = None
+
+        return httpx.AsyncClient(
+            proxies=proxies,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=settings.REQUEST_ASYNC_CONCURRENCY,
+                max_keepalive_connections=settings.REQUEST_ASYNC_CONCURRENCY
+            ),
+            **kwargs
+        )
+
+    @classmethod
+    async def close(cls) -> None:
+        """
+        关闭连接池
+
+        :return:
+        """
+        for client in [cls.SESSION, cls.CLIENT]:
+            if client is not None:
+                await client.aclose()
+
+        cls.SESSION = None
+        cls.CLIENT = None
+
+    async def response(self):
+        """
+        处理响应并返回
+
+        :return:
+        """
+        # 获取请求器
+        if self.keep_session:
+            request = self.session
+        else:
+            request = self.__class__.CLIENT
+
+        # 是否保持 cookie
+        if not self.keep_session and self.keep_cookie:
+            self.cookies = self.cookie_jar
+
+        # 构建请求参数
+        httpx_kwargs = dict(
+            url=self.url,
+            method=self.method,
+            params=self.params,
+            data=self.data,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=self.timeout,
+            json=self.json,
+        )
+
+        httpx_kwargs.update(self.kwargs)
+
+        # verify 只能在创建连接池时设置
+        httpx_kwargs.pop('verify', None)
+
+        # 请求参数判断
+        if self.proxies:
+            logger.warning(
+                'httpx 不支持在请求时使用 proxies 参数，仅支持预设，请自定义：palp.network.downloader_httpx_async.ResponseDownloaderByHttpxAsync'
+            )
+
+        return await request.request(**httpx_kwargs)
@@ -2,15 +2,16 @@
     请求的处理
 """
 import json
-import time
 import dill
 import base64
-import random
+import asyncio
+import inspect
 import urllib3
 from palp import settings
 from typing import Callable
 from urllib.parse import urlparse
 from palp.network.response import Response
+from palp.network.downloader import ResponseDownloader
 from palp.tool.user_agent import random_ua
 from requests.cookies import RequestsCookieJar
 from palp.tool.short_module import import_module
@@ -28,6 +29,18 @@ pickle_attr = [
 
 
 class Request:
+    """
+        请求
+
+        使用 __slots__ 减少内存占用（大量请求排队时），不在 __slots__ 中的参数存放在 _kwargs 中
+        cookie_jar、meta 使用时才创建，requests 参数在发送请求时构建
+    """
+    __slots__ = (
+        'url', 'method', 'params', 'data', 'headers', 'cookies', 'timeout', 'proxies', 'json',
+        'downloader', 'downloader_parser', 'filter_repeat', 'keep_session', 'keep_cookie', 'priority', 'command',
+        'jump_spider', 'jump_spider_kwargs', 'jump_request_middleware', '_callback', '_cookie_jar', '_meta', '_kwargs',
+    )
+
     # requests 模块所需的
     __REQUEST_ATTRS__ = [
         'url',
@@ -69,6 +82,9 @@ class Request:
     DOWNLOADER = None
     DOWNLOADER_PARSER = None
 
+    # 编码器
+    CODEC = None
+
     def __new__(cls, *args, **kwargs):
         """
         导入下载器
@@ -92,6 +108,7 @@ class Request:
         """
         Request.DOWNLOADER = import_module(settings.RESPONSE_DOWNLOADER, instantiate=False)[0]
         Request.DOWNLOADER_PARSER = import_module(settings.RESPONSE_DOWNLOADER_PARSER, instantiate=False)[0]
+        Request.CODEC = import_module(settings.REQUEST_CODEC)[0]
 
     def __init__(
             self,
@@ -152,7 +169,7 @@ class Request:
         """
 
         # Request 所需字段
-        self._requests_params = {}  # request 参数
+        self._kwargs = {}  # 其余参数
         self.meta = meta
         self.command = command
         self.callback = callback
@@ -182,33 +199,138 @@ class Request:
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    @property
+    def callback(self) -> str:
+        """
+        回调函数名
+
+        :return:
+        """
+        return self._callback
+
+    @callback.setter
+    def callback(self, value):
+        # 保证不论怎么样都是字符串
+        if value and not isinstance(value, str):
+            value = value.__name__
+
+        self._callback = value
+
+    @property
+    def meta(self) -> dict:
+        """
+        自动向下传递的参数（使用时才创建）
+
+        :return:
+        """
+        if self._meta is None:
+            self._meta = {}
+
+        return self._meta
+
+    @meta.setter
+    def meta(self, value):
+        self._meta = value
+
+    @property
+    def cookie_jar(self) -> RequestsCookieJar:
+        """
+        cookie_jar（使用时才创建）
+
+        :return:
+        """
+        if self._cookie_jar is None:
+            self._cookie_jar = RequestsCookieJar()
+
+        return self._cookie_jar
+
+    @cookie_jar.setter
+    def cookie_jar(self, value):
+        self._cookie_jar = value
+
+    @property
+    def requests_params(self) -> dict:
+        """
+        requests 参数（发送请求时构建）
+
+        :return:
+        """
+        params = {
+            'url': self.url,
+            'method': self.method,
+            'params': self.params,
+            'data': self.data,
+            'headers': self.headers,
+            'cookies': self.cookies,
+            'timeout': self.timeout,
+            'proxies': self.proxies,
+            'json': self.json,
+        }
+
+        for key in self.__class__.__REQUEST_ATTRS__:
+            if key in self._kwargs:
+                params[key] = self._kwargs[key]
+
+        return params
+
     def send(self) -> Response:
         """
         获取响应
 
         :return: ResponseParser 的解析器
         """
+        downloader = self.before_send()
+
+        # 获取响应（请求间隔由调度器控制：palp.scheduler.scheduler_domain.DomainScheduler）
+        response = downloader.response()
+
+        return self.after_send(response)
+
+    async def send_async(self) -> Response:
+        """
+        获取响应（asyncio 引擎使用）
+
+        注意：同步的 downloader 会放到线程池内执行
+
+        :return: ResponseParser 的解析器
+        """
+        downloader = self.before_send()
+
+        # 获取响应
+        if inspect.iscoroutinefunction(downloader.response):
+            response = await downloader.response()
+        else:
+            response = await asyncio.get_running_loop().run_in_executor(None, downloader.response)
+
+        return self.after_send(response)
+
+    def before_send(self) -> ResponseDownloader:
+        """
+        请求发起前的处理：加载默认值，并返回 downloader
+
+        :return:
+        """
         # 加载默认值
         self.set_default()
 
-        # 判断是否等待
-        if isinstance(settings.REQUEST_DELAY, int) or isinstance(settings.REQUEST_DELAY, float):
-            time.sleep(settings.REQUEST_DELAY)
-        elif isinstance(settings.REQUEST_DELAY, list):
-            time.sleep(random.choice([i for i in range(settings.REQUEST_DELAY[0], settings.REQUEST_DELAY[1] + 1)]))
-
         # cookie_jar 更新传入的 cookie
         self.cookie_jar.update(self.cookies)
 
-        # 获取响应
-        response = self.downloader(
-            **self._requests_params,
+        return self.downloader(
+            **self.requests_params,
             keep_session=self.keep_session,
             keep_cookie=self.keep_cookie,
             cookie_jar=self.cookie_jar,
             command=self.command
-        ).response()
+        )
+
+    def after_send(self, response) -> Response:
+        """
+        请求结束后的处理：解析响应，并合并 cookie
 
+        :param response: downloader 返回的响应
+        :return:
+        """
         response_parser = self.downloader_parser(response)  # 解析器解析响应
         if response_parser.cookies:
             # 使用 requests 时，会根据域名重新构造 cookieJar 并合并
@@ -253,7 +375,7 @@ class Request:
             self.cookies = dict(self.cookies)
         if self.timeout is None:
             self.timeout = settings.REQUEST_TIMEOUT or 60
-        self._requests_params.setdefault('verify', False)
+        self._kwargs.setdefault('verify', False)
 
         # 添加 ua（模块在使用 ua 的时候可能访问降速）
         if settings.RANDOM_USERAGENT:
@@ -266,7 +388,7 @@ class Request:
         elif not self.headers.get('User-Agent') and not self.headers.get('user-agent'):
             self.headers.update({'User-Agent': ua})
 
-    def to_dict(self) -> dict:
+    def to_dict(self, pickle: bool = True) -> dict:
         """
         获取字典形式
 
@@ -277,14 +399,16 @@ class Request:
             request_dict[xxx] = xxx # 修改
 
             yield palp.Request(**request_dict)
+
+        :param pickle: 是否序列化 pickle_attr 中的属性（交给编码器处理时不需要）
         :return:
         """
         request_dict = {}
 
         # 提取其它参数
-        for key, value in self.__dict__.items():
-            # _打头的名字 和 无值的忽略
-            if key.startswith('_') or not value:
+        for key, value in self.items():
+            # 无值的忽略
+            if not value:
                 continue
 
             # downloader 为默认的，直接忽略
@@ -296,7 +420,7 @@ class Request:
                 continue
 
             # 序列化对象
-            elif key in pickle_attr:
+            elif pickle and key in pickle_attr:
                 request_dict[key] = base64.b64encode(dill.dumps(value)).decode()
 
             # 其余直接赋值
@@ -317,6 +441,32 @@ class Request:
 
         return json.dumps(self.to_dict(), **kwargs)
 
+    def dumps(self) -> bytes:
+        """
+        使用 settings.REQUEST_CODEC 编码（redis 队列等使用）
+
+        :return:
+        """
+        if Request.CODEC is None:
+            Request.from_settings()
+
+        return Request.CODEC.encode(self)
+
+    def items(self):
+        """
+        遍历所有参数（包括 _kwargs 中的参数）
+
+        :return:
+        """
+        for slot in Request.__slots__:
+            if slot != '_kwargs':
+                yield slot.lstrip('_'), getattr(self, slot, None)
+
+        yield from self._kwargs.items()
+
+        # 子类未定义 __slots__ 时，参数在 __dict__ 中
+        yield from getattr(self, '__dict__', {}).items()
+
     @property
     def domain(self) -> str:
         """
@@ -333,33 +483,23 @@ class Request:
         :param item:
         :return:
         """
-        if item in self.__dict__:
-            return self.__dict__[item]
+        if item != '_kwargs' and item in self._kwargs:
+            return self._kwargs[item]
 
         raise AttributeError(f'未定义的属性：{item}')
 
     def __setattr__(self, key, value):
         """
-        实现 requests.xxx 设置参数（只有 self.xxx 才会进入该函数）
+        实现 requests.xxx 设置参数，不在 __slots__ 中的参数存放在 _kwargs 中
 
         @param key:
         @param value:
         @return:
         """
-        # 判断 callback 保证不论怎么样都是字符串
-        if key == 'callback' and value and not isinstance(value, str):
-            value = value.__name__
-        # 保证 meta 是个字典
-        elif key == 'meta' and value is None:
-            value = {}
-        # 保证获取到 jar
-        elif key == 'cookie_jar' and value is None:
-            value = RequestsCookieJar()
-
-        self.__dict__[key] = value
-
-        if key in self.__class__.__REQUEST_ATTRS__:
-            self._requests_params[key] = value
+        try:
+            object.__setattr__(self, key, value)
+        except AttributeError:
+            self._kwargs[key] = value
 
     def __lt__(self, other):
         """
@@ -401,3 +541,16 @@ class LoadRequest:
         """
 
         return cls.load_from_dict(**json.loads(data))
+
+    @classmethod
+    def loads(cls, data: bytes) -> Request:
+        """
+        使用 settings.REQUEST_CODEC 解码（自动识别 json、二进制格式）
+
+        :param data:
+        :return:
+        """
+        if Request.CODEC is None:
+            Request.from_settings()
+
+        return Request.CODEC.decode(data)
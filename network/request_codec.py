@@ -0,0 +1,169 @@
+"""
+    请求的编码、解码（redis 队列、失败请求等需要序列化请求的地方使用）
+
+    JsonRequestCodec：json 格式，需要 pickle 的属性使用 base64(dill) 存储（默认，兼容旧版本）
+    MsgpackRequestCodec：msgpack 二进制格式，体积更小、速度更快（需要安装 msgpack）
+        第一个字节为版本号，cookie_jar、类（downloader 等）使用扩展类型单独编码，其余无法编码的使用 dill
+
+    解码时根据数据自动判断格式，两种格式可以混用（切换编码时队列内的旧数据依然可以解码）
+"""
+import dill
+import importlib
+from typing import Union
+from abc import abstractmethod
+from http.cookiejar import Cookie
+from requests.cookies import RequestsCookieJar
+from palp.network.request import Request, LoadRequest
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class RequestCodec:
+    """
+        编码器基类
+    """
+
+    @abstractmethod
+    def encode(self, request: Request) -> bytes:
+        """
+        编码
+
+        :param request:
+        :return:
+        """
+
+    @abstractmethod
+    def decode(self, data: Union[bytes, str]) -> Request:
+        """
+        解码
+
+        :param data:
+        :return:
+        """
+
+    @staticmethod
+    def is_json(data: Union[bytes, str]) -> bool:
+        """
+        是否为 json 格式的数据
+
+        :param data:
+        :return:
+        """
+        return isinstance(data, str) or data[:1] == b'{'
+
+
+class JsonRequestCodec(RequestCodec):
+    """
+        json 编码
+    """
+
+    def encode(self, request: Request) -> bytes:
+        return request.to_json().encode()
+
+    def decode(self, data: Union[bytes, str]) -> Request:
+        if not self.is_json(data):
+            return MsgpackRequestCodec().decode(data)
+
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        return LoadRequest.load_from_json(data)
+
+
+class MsgpackRequestCodec(RequestCodec):
+    """
+        msgpack 编码
+    """
+    VERSION = b'\x01'  # 版本号
+
+    # 扩展类型
+    EXT_DILL = 1  # dill 序列化的对象
+    EXT_COOKIE_JAR = 2  # cookie_jar
+    EXT_CLASS = 3  # 类（按路径导入）
+    EXT_TUPLE = 4  # 元组（msgpack 默认会转为列表）
+
+    # Cookie 的属性（按照 Cookie 初始化参数的顺序）
+    COOKIE_ATTRS = [
+        'version', 'name', 'value', 'port', 'port_specified', 'domain', 'domain_specified', 'domain_initial_dot',
+        'path', 'path_specified', 'secure', 'expires', 'discard', 'comment', 'comment_url', '_rest', 'rfc2109'
+    ]
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('使用 MsgpackRequestCodec 需要安装 msgpack：pip install msgpack')
+
+    def encode(self, request: Request) -> bytes:
+        return self.VERSION + self.pack(request.to_dict(pickle=False))
+
+    def decode(self, data: Union[bytes, str]) -> Request:
+        if self.is_json(data):
+            return JsonRequestCodec().decode(data)
+
+        if data[:1] != self.VERSION:
+            raise ValueError(f'不支持的请求编码版本：{data[:1]}')
+
+        return Request(**self.unpack(data[1:]))
+
+    def pack(self, obj) -> bytes:
+        """
+        msgpack 编码（strict_types：元组、dict 的子类等也交给 default 处理，保证解码后类型不变）
+
+        :param obj:
+        :return:
+        """
+        return msgpack.packb(obj, default=self.default, use_bin_type=True, strict_types=True)
+
+    def unpack(self, data: bytes):
+        """
+        msgpack 解码
+
+        :param data:
+        :return:
+        """
+        return msgpack.unpackb(data, ext_hook=self.ext_hook, raw=False, strict_map_key=False)
+
+    def default(self, obj):
+        """
+        msgpack 无法直接编码的对象
+
+        :param obj:
+        :return:
+        """
+        if isinstance(obj, RequestsCookieJar):
+            cookies = [[getattr(cookie, attr) for attr in self.COOKIE_ATTRS] for cookie in obj]
+            return msgpack.ExtType(self.EXT_COOKIE_JAR, self.pack(cookies))
+        elif isinstance(obj, type) and obj.__module__ != '__main__' and '<' not in obj.__qualname__:
+            return msgpack.ExtType(self.EXT_CLASS, f'{obj.__module__}:{obj.__qualname__}'.encode())
+        elif type(obj) is tuple:
+            return msgpack.ExtType(self.EXT_TUPLE, self.pack(list(obj)))
+
+        return msgpack.ExtType(self.EXT_DILL, dill.dumps(obj))
+
+    def ext_hook(self, code: int, data: bytes):
+        """
+        解码扩展类型
+
+        :param code:
+        :param data:
+        :return:
+        """
+        if code == self.EXT_COOKIE_JAR:
+            cookie_jar = RequestsCookieJar()
+            for cookie in self.unpack(data):
+                cookie_jar.set_cookie(Cookie(*cookie))
+            return cookie_jar
+        elif code == self.EXT_CLASS:
+            module, name = data.decode().split(':', 1)
+            obj = importlib.import_module(module)
+            for attr in name.split('.'):
+                obj = getattr(obj, attr)
+            return obj
+        elif code == self.EXT_TUPLE:
+            return tuple(self.unpack(data))
+        elif code == self.EXT_DILL:
+            return dill.loads(data)
+
+        return msgpack.ExtType(code, data)
@@ -186,7 +186,7 @@ class Response:
 
         :return:
         """
-        return urljoin(self.response.url, url)
+        return urljoin(self.url, url)
 
     def __setattr__(self, key, value):
         self.__dict__[key] = value
@@ -0,0 +1,69 @@
+"""
+    传递给回调进程池的响应：只保留响应内容，可以被 pickle
+"""
+import json
+from palp.network.response import Response
+
+
+class ProcessResponse(Response):
+    """
+        传递给回调进程池的响应
+    """
+
+    def __init__(self, url: str, status_code: int, headers: dict, cookies: dict, content: bytes):
+        super().__init__(None)
+        self._url = url
+        self._status_code = status_code
+        self._headers = headers
+        self._cookies = cookies
+        self._content = content
+
+    @classmethod
+    def from_response(cls, response: Response) -> "ProcessResponse":
+        """
+        从下载的响应创建（不解码，编码检测、解析都在子进程中执行）
+
+        :param response:
+        :return:
+        """
+        return cls(
+            url=response.url,
+            status_code=response.status_code,
+            headers=response.headers,
+            cookies=response.cookies,
+            content=response.content
+        )
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding)
+
+    @property
+    def content(self) -> bytes:
+        return self._content or b''
+
+    def json(self, **kwargs) -> dict:
+        return json.loads(self.text, **kwargs)
+
+    @property
+    def status_code(self) -> int:
+        return self._status_code
+
+    @property
+    def cookies(self) -> dict:
+        return self._cookies
+
+    @property
+    def headers(self) -> dict:
+        return self._headers
+
+    @property
+    def url(self) -> str:
+        return self._url
+
+    def __reduce__(self):
+        # Response.__getattr__ 对不存在的属性返回 None，pickle 时只传递构造参数（不包含解析器）
+        return self.__class__, (self._url, self._status_code, self._headers, self._cookies, self._content)
+
+    def __str__(self):
+        return f'<Response [{self.status_code}]>'
@@ -1,4 +1,4 @@
 from palp.pipeline.pipeline import Pipeline
 from palp.pipeline.pipeline_recycle import RedisRecyclePipeline
 from palp.pipeline.pipeline_filter import SetFilterPipeline, BloomFilterPipeline, RedisSetFilterPipeline, \
-    RedisBloomFilterPipeline
+    RedisBloomFilterPipeline, RedisNativeBloomFilterPipeline
@@ -11,6 +11,7 @@ from palp.filter.filter_redis_set import RedisSetFilter
 from palp.filter.filter_set import SetFilter
 from palp.exception import DropItemException
 from palp.filter.filter_redis_bloom import RedisBloomFilter
+from palp.filter.filter_redis_bloom_native import RedisNativeBloomFilter
 
 
 class SetFilterPipeline(Pipeline):
@@ -75,3 +76,19 @@ class RedisBloomFilterPipeline(Pipeline):
 
             if is_repeat:
                 raise DropItemException(f"丢弃重复 item：{item}")
+
+
+class RedisNativeBloomFilterPipeline(Pipeline):
+    """
+        基于 redis 原生 bloom（RedisBloom 模块）的去重
+    """
+
+    def __init__(self):
+        self.item_redis_bloom_filter = RedisNativeBloomFilter()
+
+    def pipeline_in(self, spider, item):
+        if settings.FILTER_ITEM:
+            is_repeat = self.item_redis_bloom_filter.is_repeat(spider=spider, obj=item)
+
+            if is_repeat:
+                raise DropItemException(f"丢弃重复 item：{item}")
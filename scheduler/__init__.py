@@ -0,0 +1,2 @@
+from palp.scheduler.scheduler import Scheduler
+from palp.scheduler.scheduler_domain import DomainScheduler
@@ -0,0 +1,69 @@
+"""
+    基于 redis 的令牌桶限速器（分布式时所有机器共享同一个域名的请求速率）
+
+    每个域名一个 hash：{REDIS_KEY_RATE_LIMIT}:{domain}，记录剩余令牌数与上次更新时间
+    取令牌通过 lua 脚本在 redis 内原子执行，时间也取 redis 的时间，避免各机器时钟不一致
+"""
+from palp import settings
+
+# 令牌桶脚本：有令牌则取走一个并返回 0，否则返回需要等待的秒数（字符串，lua 数字返回时会被截断为整数）
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+
+if redis.replicate_commands then
+    pcall(redis.replicate_commands)
+end
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """
+        redis 令牌桶限速器
+    """
+
+    def __init__(self):
+        self.script = None
+
+    def acquire(self, domain: str, rate: float, burst: int = 1) -> float:
+        """
+        获取一个令牌
+
+        :param domain: 域名
+        :param rate: 每秒产生的令牌数（即每秒请求数）
+        :param burst: 桶容量（允许的突发请求数）
+        :return: 0 代表获取成功，否则为需要等待的秒数
+        """
+        from palp.conn import redis_conn
+
+        if not rate or rate <= 0:
+            return 0
+
+        if self.script is None:
+            self.script = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+
+        key = f'{settings.REDIS_KEY_RATE_LIMIT}:{domain}'
+        wait = self.script(keys=[key], args=[rate, max(burst, 1)])
+
+        return float(wait)
@@ -0,0 +1,309 @@
+"""
+    调度器：位于请求队列与 SpiderController 之间，决定何时将队列中的请求交给 controller
+
+    调度器本身也是一个队列（包装了真正的请求队列），所以 spider、controller 无需区分
+    调度器每次从请求队列批量获取 REQUEST_PREFETCH 个请求暂存在本地，redis 队列时减少网络往返
+    分布式且不是可靠队列时，暂存的请求在机器异常关闭时会丢失，默认只预取 1 个（REQUEST_PREFETCH_UNRELIABLE 开启预取）
+
+    调度器记录已放入还未处理完毕（release）的任务数量 outstanding，降为 0 时通知 idle（本地时即为全部任务处理完毕）
+    本地时所有的放入都经过调度器，获取时不在请求队列上阻塞，而是等待调度器的放入通知，关闭（close）时可以立即唤醒
+"""
+import time
+import threading
+from loguru import logger
+from collections import deque
+from palp import settings
+from palp.sequence.sequence import Sequence
+from palp.tool.short_module import import_module
+
+
+class Scheduler(Sequence):
+    """
+        调度器基类：直接转发给请求队列
+    """
+
+    def __init__(self, q: Sequence, local: bool = None):
+        """
+
+        :param q: 请求队列
+        :param local: 是否所有的放入都经过调度器（本地），None 为 SPIDER_TYPE == 1
+        """
+        self.queue = q
+        self.local = settings.SPIDER_TYPE == 1 if local is None else local
+        self.unreliable = settings.SPIDER_TYPE == 2 and not q.reliable  # 取出的请求只保存在本地（异常关闭时丢失）
+        self.prefetch = max(settings.REQUEST_PREFETCH, 1)  # 每次从请求队列获取的数量
+        self.parked_max = settings.REQUEST_SCHEDULER_PARKED  # 本地暂存的最大数量
+        self.buffer = deque()  # 预取的请求
+
+        if self.unreliable:
+            if settings.REQUEST_PREFETCH_UNRELIABLE:
+                logger.warning(
+                    f"请求队列不是可靠队列，机器异常关闭时最多丢失 {self.prefetch + self.parked_max} 个已取出的请求"
+                    f"（可以开启 REQUEST_QUEUE_RELIABLE）"
+                )
+            else:
+                self.prefetch = 1
+                self.parked_max = min(self.parked_max, max(settings.REQUEST_THREADS, 1))
+
+        self.state = threading.Lock()
+        self.not_empty = threading.Condition(self.state)  # 有新的任务放入、有任务处理完毕、关闭
+        self.idle = threading.Condition(self.state)  # 没有未处理完毕的任务，也用于通知 spider 的其它状态变化
+        self.outstanding = 0  # 已放入还未处理完毕的任务数量
+        self.version = 0  # 放入、处理完毕的次数（等待放入通知时判断是否有变化）
+        self.closed = False
+
+    @classmethod
+    def from_settings(cls, q: Sequence, local: bool = None) -> "Scheduler":
+        """
+        根据 settings.REQUEST_SCHEDULER 创建调度器
+
+        :param q: 请求队列
+        :param local: 是否所有的放入都经过调度器（本地），None 为 SPIDER_TYPE == 1
+        :return:
+        """
+        scheduler = import_module(settings.REQUEST_SCHEDULER, instantiate=False)[0]
+
+        return scheduler(q, local=local)
+
+    def track(self, count: int) -> None:
+        """
+        修改未处理完毕的任务数量：增加时通知等待放入的线程，降为 0 时通知 idle
+
+        :param count: 增加的数量（处理完毕时为负数）
+        :return:
+        """
+        with self.state:
+            self.outstanding += count
+            self.version += 1
+            self.not_empty.notify(max(count, 1))
+
+            if self.outstanding <= 0:
+                self.idle.notify_all()
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        self.put_many([obj], block=block, timeout=timeout)
+
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务（先记录再放入，期间不会出现没有未处理完毕任务的间隙）
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        if not objs:
+            return
+
+        with self.state:
+            self.outstanding += len(objs)
+
+        try:
+            if len(objs) == 1:
+                self.queue.put(objs[0], block=block, timeout=timeout)
+            else:
+                self.queue.put_many(objs, block=block, timeout=timeout)
+        except Exception:
+            self.track(-len(objs))
+            raise
+
+        self.track(0)
+
+    def restore(self, obj) -> None:
+        """
+        放入从检查点恢复的任务
+
+        :param obj:
+        :return:
+        """
+        with self.state:
+            self.outstanding += 1
+
+        self.queue.restore(obj)
+        self.track(0)
+
+    def get_from_queue(self, count: int, block=True, timeout=None) -> list:
+        """
+        从请求队列批量获取：本地时不在请求队列上阻塞，而是等待调度器的放入通知
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        if not self.local:
+            return self.queue.get_many(count, block=block, timeout=timeout)
+
+        end_time = time.time() + timeout if timeout is not None else None
+        while True:
+            version = self.version
+            objs = self.queue.get_many(count, block=False)
+            if objs or not block or self.closed:
+                return objs
+
+            with self.state:
+                remain = None if end_time is None else end_time - time.time()
+                if remain is not None and remain <= 0:
+                    return []
+
+                self.not_empty.wait_for(lambda: self.version != version or self.closed, remain)
+
+    def notify(self) -> None:
+        """
+        通知等待 idle 的线程（spider 的状态发生变化）
+
+        :return:
+        """
+        with self.state:
+            self.version += 1
+            self.idle.notify_all()
+
+    def wait(self, predicate, timeout=None) -> bool:
+        """
+        等待直到 predicate 成立：任务处理完毕、调用 notify 时才重新判断（timeout 为兜底的最长等待时间）
+
+        predicate 在锁外执行，期间有变化时 version 改变，不会错过通知
+
+        :param predicate:
+        :param timeout:
+        :return: predicate 是否成立
+        """
+        version = self.version
+        if predicate():
+            return True
+
+        with self.state:
+            self.idle.wait_for(lambda: self.version != version or self.closed, timeout)
+
+        return predicate()
+
+    def close(self) -> None:
+        """
+        关闭：唤醒所有等待的线程，之后获取不再阻塞
+
+        :return:
+        """
+        with self.state:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.idle.notify_all()
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务：优先从预取的请求中获取
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        try:
+            return self.buffer.popleft()
+        except IndexError:
+            pass
+
+        objs = self.get_from_queue(self.prefetch, block=block, timeout=timeout)
+        if not objs:
+            return
+
+        self.buffer.extend(objs[1:])
+
+        return objs[0]
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：先取预取的请求，不够再从请求队列获取
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        objs = []
+        while self.buffer and len(objs) < count:
+            try:
+                objs.append(self.buffer.popleft())
+            except IndexError:
+                break
+
+        if len(objs) < count:
+            objs.extend(self.get_from_queue(count - len(objs), block=block and not objs, timeout=timeout))
+
+        return objs
+
+    def empty(self):
+        """
+        判断队列是否为空（包括预取的请求）
+
+        :return:
+        """
+        return not self.buffer and self.queue.empty()
+
+    def qsize(self):
+        """
+        返回队列大小（包括预取的请求）
+
+        :return:
+        """
+        return len(self.buffer) + self.queue.qsize()
+
+    def release(self, obj):
+        """
+        任务处理完毕
+
+        :param obj:
+        :return:
+        """
+        self.queue.release(obj)
+        self.track(-1)
+
+    def release_slot(self, obj) -> None:
+        """
+        释放任务占用的调度资源（任务还未处理完毕，如回调中因背压暂停时），基类没有需要释放的
+
+        :param obj:
+        :return:
+        """
+
+    def keep_alive(self):
+        """
+        续约处理中的任务
+
+        :return:
+        """
+        self.queue.keep_alive()
+
+    def recover(self):
+        """
+        放回租约过期的处理中任务
+
+        :return:
+        """
+        return self.queue.recover()
+
+    def unacked(self):
+        """
+        已取出但还未处理完毕的任务数量
+
+        :return:
+        """
+        return self.queue.unacked()
+
+    def __getattr__(self, item):
+        """
+        其余属性直接访问请求队列
+
+        :param item:
+        :return:
+        """
+        if item == 'queue':
+            raise AttributeError(item)
+
+        return getattr(self.queue, item)
@@ -0,0 +1,382 @@
+"""
+    按域名调度的调度器
+
+    记录每个域名（Request.domain）下次允许发送请求的时间、正在执行的请求数，只分发已就绪域名的请求
+    未就绪的请求暂存在本地，就绪后再分发，等待某个域名时不会占用线程，线程可以继续处理其它域名的请求
+
+    相关设置：
+        REQUEST_DELAY：默认的请求间隔
+        REQUEST_DOMAIN_CONCURRENCY：默认的单个域名最大并发
+        REQUEST_DOMAIN_SETTINGS：单独指定域名的请求间隔、并发、限速，如：{'www.baidu.com': {'delay': 1, 'concurrency': 2, 'rate': 5}}
+        REQUEST_SCHEDULER_PARKED：本地暂存的最大请求数量，达到后不再从队列获取新请求
+        REQUEST_PREFETCH：每次从队列批量获取的请求数量，多余的请求同样暂存
+        REQUEST_PREFETCH_UNRELIABLE：分布式且不是可靠队列时是否依然预取、暂存，否则预取 1 个、最多暂存 REQUEST_THREADS 个
+        REQUEST_RATE_LIMIT：分布式时所有机器共享的单个域名每秒请求数（redis 令牌桶），0 为不限制
+        REQUEST_RATE_LIMIT_BURST：令牌桶容量，即允许的突发请求数
+
+    本地多进程（SPIDER_PROCESSES）时，分发前还需从协调进程获取许可，请求间隔、并发对所有进程生效
+"""
+import time
+import random
+import threading
+from collections import deque
+from palp import settings
+from palp.network.request import Request
+from palp.scheduler.scheduler import Scheduler
+from palp.scheduler.rate_limiter import RedisRateLimiter
+from palp.sequence.sequence_shared import SharedRequestSequence
+
+
+class DomainScheduler(Scheduler):
+    """
+        按域名控制请求间隔、并发的调度器
+    """
+
+    def __init__(self, q, local: bool = None):
+        """
+
+        :param q: 请求队列
+        :param local: 是否所有的放入都经过调度器（本地）
+        """
+        super().__init__(q, local=local)
+        self.mutex = threading.RLock()
+        self.parked = {}  # 未就绪的请求 {domain: deque}
+        self.parked_size = 0  # 未就绪的请求数量
+        self.next_time = {}  # 域名下次允许发送请求的时间 {domain: timestamp}
+        self.running = {}  # 域名正在执行的请求数 {domain: count}
+        self.handed = {}  # 已分发的请求对应的域名 {id(request): domain}
+        self.rate_limiter = RedisRateLimiter() if settings.SPIDER_TYPE == 2 else None  # 分布式时的全局限速
+        self.shared = isinstance(q, SharedRequestSequence)  # 本地多进程时所有进程共享请求间隔、并发
+
+    def get(self, block=True, timeout=None):
+        """
+        获取已就绪的任务
+
+        :param block: 为 False 时不阻塞
+        :param timeout: 最长等待时间，None 为一直等待
+        :return:
+        """
+        end_time = time.time() + timeout if timeout is not None else None
+
+        while not self.closed:
+            with self.mutex:
+                obj, wait = self.pop_ready()
+
+            if obj is not None:
+                if not self.throttle(obj):
+                    return obj
+
+                continue
+
+            # 计算本次等待时间：不超过剩余时间，也不超过暂存请求的就绪时间
+            remain = None if end_time is None else max(end_time - time.time(), 0)
+            if remain is not None:
+                wait = remain if wait is None else min(wait, remain)
+
+            # 暂存已满则不再从队列获取，等待暂存的请求就绪
+            if self.parked_size >= self.parked_max:
+                if not block:
+                    return
+                time.sleep(wait if wait is not None else 0.1)
+            else:
+                obj, fetched = self.fetch(block=block and wait != 0, timeout=wait)
+                if obj is not None and not self.throttle(obj):
+                    return obj
+
+                if fetched:
+                    continue
+
+                # 队列中没有请求（已等待或队列提前返回），也没有暂存的请求
+                if not self.parked_size:
+                    return
+
+            if not block or (end_time is not None and time.time() >= end_time):
+                return
+
+    def fetch(self, block=True, timeout=None):
+        """
+        从请求队列批量获取请求（最多 REQUEST_PREFETCH 个）：第一个可以直接分发的请求返回，其余暂存
+
+        :param block:
+        :param timeout:
+        :return: (可以直接分发的请求, 获取到的数量)
+        """
+        count = min(self.prefetch, self.parked_max - self.parked_size)
+        objs = self.get_from_queue(max(count, 1), block=block, timeout=timeout)
+
+        ready = None
+        with self.mutex:
+            for obj in objs:
+                if ready is None and self.acquire(obj):
+                    ready = obj
+                else:
+                    self.park(obj)
+
+        return ready, len(objs)
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取已就绪的任务（逐个获取，保证每个请求都经过域名的调度）
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        obj = self.get(block=block, timeout=timeout)
+        if obj is None:
+            return []
+
+        objs = [obj]
+        while len(objs) < count:
+            obj = self.get(block=False)
+            if obj is None:
+                break
+            objs.append(obj)
+
+        return objs
+
+    def pop_ready(self) -> tuple:
+        """
+        获取暂存中已就绪的请求（需要加锁调用）
+
+        :return: (请求, 最近的请求就绪还需等待的时间)
+        """
+        now = time.time()
+        wait = None
+
+        for domain in list(self.parked.keys()):
+            ready_time = self.next_time.get(domain, 0)
+            if ready_time > now:
+                wait = ready_time - now if wait is None else min(wait, ready_time - now)
+                continue
+
+            # 达到并发上限，等待其它请求释放
+            if self.concurrency_full(domain):
+                wait = 0.1 if wait is None else min(wait, 0.1)
+                continue
+
+            parked = self.parked[domain]
+            obj = parked.popleft()
+            self.parked_size -= 1
+            if not parked:
+                del self.parked[domain]
+
+            # 非请求的任务（domain 为 None）无需记录
+            if domain is not None:
+                self.mark(obj, domain, now)
+
+            return obj, None
+
+        return None, wait
+
+    def acquire(self, obj) -> bool:
+        """
+        判断请求是否可以直接分发，可以则记录（需要加锁调用）
+
+        :param obj:
+        :return:
+        """
+        if not isinstance(obj, Request):
+            return True
+
+        domain = obj.domain
+
+        # 已有暂存的请求则排在后面，保证同域名的顺序
+        if domain in self.parked:
+            return False
+        if self.next_time.get(domain, 0) > time.time() or self.concurrency_full(domain):
+            return False
+
+        self.mark(obj, domain, time.time())
+
+        return True
+
+    def throttle(self, obj) -> bool:
+        """
+        全局限速：分布式时从 redis 令牌桶获取令牌，本地多进程时从协调进程获取许可，获取不到则撤销分发并放回暂存的最前面
+
+        :param obj: 已分发的任务
+        :return: 是否被限速
+        """
+        if not isinstance(obj, Request):
+            return False
+
+        domain = obj.domain
+        if self.shared:
+            wait = self.shared_wait(obj, domain)
+        elif self.rate_limiter is not None:
+            wait = self.rate_wait(domain)
+        else:
+            return False
+
+        if wait <= 0:
+            return False
+
+        with self.mutex:
+            self.unmark(obj)
+            # 本地多进程时分发时记录的请求间隔无效，以协调进程的为准
+            if self.shared:
+                self.next_time[domain] = time.time() + wait
+            else:
+                self.next_time[domain] = max(self.next_time.get(domain, 0), time.time() + wait)
+            self.park(obj, first=True)
+
+        return True
+
+    def rate_wait(self, domain: str) -> float:
+        """
+        从 redis 令牌桶获取令牌
+
+        :param domain:
+        :return: 获取成功（或不限速）为 0，否则为还需等待的时间
+        """
+        rate = self.get_domain_setting(domain, 'rate', settings.REQUEST_RATE_LIMIT)
+        if not rate:
+            return 0
+
+        burst = self.get_domain_setting(domain, 'burst', settings.REQUEST_RATE_LIMIT_BURST)
+
+        return self.rate_limiter.acquire(domain, rate, burst)
+
+    def shared_wait(self, obj: Request, domain: str) -> float:
+        """
+        从协调进程获取域名的请求许可（没有设置请求间隔、并发时无需获取）
+
+        :param obj:
+        :param domain:
+        :return: 获取成功为 0，否则为还需等待的时间
+        """
+        delay = self.get_delay(domain)
+        concurrency = self.get_domain_setting(domain, 'concurrency', settings.REQUEST_DOMAIN_CONCURRENCY)
+        if not delay and not concurrency:
+            return 0
+
+        return self.queue.acquire(obj, domain, delay, concurrency)
+
+    def park(self, obj, first: bool = False) -> None:
+        """
+        暂存未就绪的请求（需要加锁调用）
+
+        :param obj:
+        :param first: 放到最前面
+        :return:
+        """
+        domain = obj.domain if isinstance(obj, Request) else None
+        parked = self.parked.setdefault(domain, deque())
+        if first:
+            parked.appendleft(obj)
+        else:
+            parked.append(obj)
+
+        self.parked_size += 1
+
+    def mark(self, obj: Request, domain: str, now: float) -> None:
+        """
+        记录分发的请求：更新下次允许请求的时间、并发数（需要加锁调用）
+
+        :param obj:
+        :param domain:
+        :param now:
+        :return:
+        """
+        self.next_time[domain] = now + self.get_delay(domain)
+        self.running[domain] = self.running.get(domain, 0) + 1
+        self.handed[id(obj)] = domain
+
+    def unmark(self, obj) -> None:
+        """
+        撤销分发记录：释放并发数（需要加锁调用）
+
+        :param obj:
+        :return:
+        """
+        domain = self.handed.pop(id(obj), None)
+        if domain is not None:
+            self.running[domain] -= 1
+            if self.running[domain] <= 0:
+                del self.running[domain]
+
+    def release(self, obj):
+        """
+        请求处理完毕，释放并发
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            self.unmark(obj)
+
+        super().release(obj)
+
+    def release_slot(self, obj) -> None:
+        """
+        提前释放请求占用的域名并发（请求已下载完毕，回调中因背压暂停时调用），之后 release 不会重复释放
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            self.unmark(obj)
+
+        if self.shared:
+            self.queue.release_slot(obj)
+
+    def concurrency_full(self, domain: str) -> bool:
+        """
+        域名是否达到并发上限
+
+        :param domain:
+        :return:
+        """
+        concurrency = self.get_domain_setting(domain, 'concurrency', settings.REQUEST_DOMAIN_CONCURRENCY)
+
+        return bool(concurrency) and self.running.get(domain, 0) >= concurrency
+
+    def get_delay(self, domain: str) -> float:
+        """
+        获取域名的请求间隔
+
+        :param domain:
+        :return:
+        """
+        delay = self.get_domain_setting(domain, 'delay', settings.REQUEST_DELAY)
+
+        if isinstance(delay, int) or isinstance(delay, float):
+            return delay
+        elif isinstance(delay, list):
+            return random.choice([i for i in range(delay[0], delay[1] + 1)])
+
+        return 0
+
+    @staticmethod
+    def get_domain_setting(domain: str, key: str, default):
+        """
+        获取域名单独的设置
+
+        :param domain: 域名
+        :param key: 设置名
+        :param default: 默认值
+        :return:
+        """
+        domain_settings = settings.REQUEST_DOMAIN_SETTINGS.get(domain)
+        if domain_settings and key in domain_settings:
+            return domain_settings[key]
+
+        return default
+
+    def empty(self):
+        """
+        判断队列是否为空（包括暂存的请求）
+
+        :return:
+        """
+        return self.parked_size == 0 and self.queue.empty()
+
+    def qsize(self):
+        """
+        返回队列大小（包括暂存的请求）
+
+        :return:
+        """
+        return self.parked_size + self.queue.qsize()
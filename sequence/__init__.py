@@ -1,5 +1,11 @@
 from palp.sequence.sequence_redis_item import FIFOItemRedisSequence
-from palp.sequence.sequence_memory import FIFOMemorySequence, LIFOMemorySequence, PriorityMemorySequence
+from palp.sequence.sequence_memory import FIFOMemorySequence, LIFOMemorySequence, PriorityMemorySequence, \
+    BucketPriorityMemorySequence, FairMemorySequence
 from palp.sequence.sequence_redis_request import FIFORequestRedisSequence, LIFORequestRedisSequence, \
-    PriorityRequestRedisSequence
+    PriorityRequestRedisSequence, BucketPriorityRequestRedisSequence, FairRequestRedisSequence
 from palp.sequence.sequence_redis_borrow import FIFORequestBorrowRedisSequence
+from palp.sequence.sequence_redis_stream import FIFORequestStreamRedisSequence
+from palp.sequence.sequence_disk import FIFODiskSequence, LIFODiskSequence, PriorityDiskSequence
+from palp.sequence.sequence_checkpoint import CheckpointSequence
+from palp.sequence.sequence_delay import DelayMemorySequence, DelayRedisSequence
+from palp.sequence.sequence_shared import SharedSequence, SharedDelaySequence
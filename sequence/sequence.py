@@ -1,14 +1,35 @@
 """
     消息队列
 """
-from typing import Any
+from typing import Any, List
 from abc import abstractmethod
 
+# 从列表左侧（或右侧）批量弹出最多 ARGV[2] 个元素（LPOP key count 需要 redis 6.2，这里用 lua 保证原子）
+# KEYS：列表
+# ARGV：方向（0 左侧，1 右侧）、数量
+LIST_POP_MANY_SCRIPT = """
+local count = tonumber(ARGV[2])
+local result
+if ARGV[1] == '0' then
+    result = redis.call('LRANGE', KEYS[1], 0, count - 1)
+    if #result > 0 then
+        redis.call('LTRIM', KEYS[1], #result, -1)
+    end
+else
+    result = redis.call('LRANGE', KEYS[1], -count, -1)
+    if #result > 0 then
+        redis.call('LTRIM', KEYS[1], 0, -#result - 1)
+    end
+end
+return result
+"""
+
 
 class SequenceBase:
     """
         队列的基类
     """
+    reliable = False  # 取出的任务处理完毕前是否保留在队列中（机器异常关闭后可以恢复）
 
     @abstractmethod
     def put(self, obj: Any, timeout: float = None, **kwargs) -> None:
@@ -45,6 +66,70 @@ class SequenceBase:
         :return:
         """
 
+    def put_many(self, objs: List[Any], timeout: float = None, **kwargs) -> None:
+        """
+        批量添加任务（默认逐个添加，redis 队列会通过一次网络往返完成）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        for obj in objs:
+            self.put(obj, timeout=timeout, **kwargs)
+
+    def get_many(self, count: int, block: bool = True, timeout: float = None) -> List[Any]:
+        """
+        批量获取任务：阻塞等待第一个，其余不阻塞，最多获取 count 个
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 等待第一个任务的时间
+        :return:
+        """
+        obj = self.get(block=block, timeout=timeout)
+        if obj is None:
+            return []
+
+        objs = [obj]
+        while len(objs) < count:
+            obj = self.get(block=False)
+            if obj is None:
+                break
+            objs.append(obj)
+
+        return objs
+
+    def release(self, obj: Any) -> None:
+        """
+        任务处理完毕（get 获取到的任务处理结束后调用）
+
+        :param obj:
+        :return:
+        """
+
+    def keep_alive(self) -> None:
+        """
+        续约处理中的任务（分布式时由心跳调用，仅可靠队列需要实现）
+
+        :return:
+        """
+
+    def recover(self) -> int:
+        """
+        将租约过期（机器异常关闭）的处理中任务放回队列（分布式时由心跳检查调用，仅可靠队列需要实现）
+
+        :return: 放回的任务数量
+        """
+        return 0
+
+    def unacked(self) -> int:
+        """
+        已取出但还未处理完毕的任务数量（仅可靠队列需要实现）
+
+        :return:
+        """
+        return 0
+
 
 class Sequence(SequenceBase):
     """
@@ -70,6 +155,18 @@ class Sequence(SequenceBase):
         :return:
         """
 
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        for obj in objs:
+            self.put(obj, block=block, timeout=timeout)
+
     def empty(self):
         """
         判断队列是否为空
@@ -84,6 +181,14 @@ class Sequence(SequenceBase):
         :return:
         """
 
+    def release(self, obj):
+        """
+        任务处理完毕（get 获取到的任务处理结束后调用）
+
+        :param obj:
+        :return:
+        """
+
 
 class RedisSequence(Sequence):
     """
@@ -109,3 +214,26 @@ class RedisSequence(Sequence):
 
         :return:
         """
+
+    @classmethod
+    def list_pop_many(cls, count: int, right: bool = False) -> List[bytes]:
+        """
+        从列表批量弹出元素（一次网络往返）
+
+        :param count: 最大数量
+        :param right: 从右侧弹出（结果按弹出顺序排列）
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if count <= 0:
+            return []
+
+        if getattr(cls, 'list_pop_many_script', None) is None:
+            cls.list_pop_many_script = redis_conn.register_script(LIST_POP_MANY_SCRIPT)
+
+        result = cls.list_pop_many_script(keys=[cls.redis_key], args=[int(right), count])
+        if right:
+            result.reverse()
+
+        return result
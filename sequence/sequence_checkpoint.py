@@ -0,0 +1,140 @@
+"""
+    记录检查点的队列（本地爬虫开启 SPIDER_CHECKPOINT_PATH 时包装请求队列）
+
+    放入队列的请求都会记录到检查点（分配 checkpoint_id），处理完毕（release）后从检查点删除
+    检查点中剩余的即为未处理完毕的请求，恢复时重新放入队列
+
+    同一个请求对象重新放入（如 jump spider 执行后、request_error 返回原请求）时沿用原来的 checkpoint_id，
+    并记录放入的次数，所有的放入都处理完毕后才从检查点删除
+"""
+import itertools
+import threading
+from palp.sequence.sequence import Sequence
+
+
+class CheckpointSequence(Sequence):
+    """
+        记录检查点的队列
+    """
+
+    def __init__(self, q: Sequence, checkpoint):
+        """
+
+        :param q: 请求队列
+        :param checkpoint: palp.tool.checkpoint.Checkpoint
+        """
+        self.queue = q
+        self.checkpoint = checkpoint
+        self.counter = itertools.count(checkpoint.next_id())  # checkpoint_id
+        self.mutex = threading.Lock()
+        self.refs = {}  # 请求放入还未处理完毕的次数 {checkpoint_id: count}
+
+    def track(self, obj) -> None:
+        """
+        记录放入的请求：没有 checkpoint_id 时分配，已有时沿用并增加未处理完毕的次数
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            if getattr(obj, 'checkpoint_id', None) is None:
+                obj.checkpoint_id = next(self.counter)
+            self.refs[obj.checkpoint_id] = self.refs.get(obj.checkpoint_id, 0) + 1
+
+        self.checkpoint.add(obj)
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务并记录
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        self.track(obj)
+        self.queue.put(obj, block=block, timeout=timeout)
+
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务并记录
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        for obj in objs:
+            self.track(obj)
+
+        self.queue.put_many(objs, block=block, timeout=timeout)
+
+    def restore(self, obj) -> None:
+        """
+        放入从检查点恢复的请求（已有 checkpoint_id，已在检查点中，只记录未处理完毕的次数）
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            self.refs[obj.checkpoint_id] = self.refs.get(obj.checkpoint_id, 0) + 1
+
+        self.queue.put(obj)
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        return self.queue.get(block=block, timeout=timeout)
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        return self.queue.get_many(count, block=block, timeout=timeout)
+
+    def release(self, obj):
+        """
+        任务处理完毕，所有的放入都处理完毕后从检查点删除
+
+        :param obj:
+        :return:
+        """
+        checkpoint_id = getattr(obj, 'checkpoint_id', None)
+        if checkpoint_id is not None:
+            with self.mutex:
+                count = self.refs.get(checkpoint_id, 1) - 1
+                if count > 0:
+                    self.refs[checkpoint_id] = count
+                else:
+                    self.refs.pop(checkpoint_id, None)
+
+            if count <= 0:
+                self.checkpoint.done(checkpoint_id)
+
+        self.queue.release(obj)
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.queue.empty()
+
+    def qsize(self):
+        """
+        返回队列大小
+
+        :return:
+        """
+        return self.queue.qsize()
@@ -0,0 +1,242 @@
+"""
+    延迟队列：请求到期后才会被搬运到请求队列（失败请求的退避重试、定时重新抓取）
+
+    DelayMemorySequence：本地，按到期时间排序的小顶堆
+    DelayRedisSequence：分布式，有序集合（分数为到期时间），多台机器同时搬运时通过 lua 脚本保证每个请求只被取出一次
+
+    由 palp.tool.delay_mover.DelayMover 线程搬运：move 将到期的请求批量放入请求队列
+
+    注意：
+        检查点（SPIDER_CHECKPOINT_PATH）不保存延迟队列中的请求
+        DelayRedisSequence 搬运时先通过 lua 脚本从延迟队列取出（ZREM），再放入请求队列，两步之间机器异常关闭会丢失这批请求
+        （最多 DelayMover.BATCH 个，开启 REQUEST_QUEUE_RELIABLE 也不能避免）
+        两个队列的 key 不在同一个 slot，集群时无法在一个脚本中完成
+"""
+import time
+import uuid
+import heapq
+import itertools
+import threading
+from palp import settings
+from palp.network.request import LoadRequest
+from palp.sequence.sequence import Sequence, RedisSequence
+
+# 取出到期的请求
+# KEYS：延迟队列
+# ARGV：当前时间、最大数量
+DELAY_POP_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #items > 0 then
+    redis.call('ZREM', KEYS[1], unpack(items))
+end
+
+return items
+"""
+
+
+class DelayMemorySequence(Sequence):
+    """
+        本地延迟队列
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.heap = []  # [(到期时间, 序号, 请求)]
+        self.counter = itertools.count()  # 到期时间相同时先进先出
+
+    def put(self, obj, delay: float = 0, **kwargs):
+        """
+        添加任务
+
+        :param obj:
+        :param delay: 延迟时间（秒）
+        :return:
+        """
+        with self.not_empty:
+            heapq.heappush(self.heap, (time.time() + delay, next(self.counter), obj))
+            self.not_empty.notify()
+
+    def get(self, block=False, timeout=None):
+        """
+        获取一个到期的任务（不阻塞）
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        objs = self.get_many(1)
+        if objs:
+            return objs[0]
+
+    def get_many(self, count, block=False, timeout=None):
+        """
+        批量获取到期的任务（不阻塞）
+
+        :param count: 最大数量
+        :param block:
+        :param timeout:
+        :return:
+        """
+        with self.mutex:
+            return self.pop_due(count)
+
+    def pop_due(self, count) -> list:
+        """
+        取出到期的任务（需要加锁调用）
+
+        :param count: 最大数量
+        :return:
+        """
+        objs = []
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now and len(objs) < count:
+            objs.append(heapq.heappop(self.heap)[-1])
+
+        return objs
+
+    def move(self, q, count) -> int:
+        """
+        将到期的任务放入请求队列（加锁期间放入，判断是否为空时不会出现两个队列都为空的间隙）
+
+        :param q: 请求队列
+        :param count: 最大数量
+        :return: 放入的数量
+        """
+        with self.mutex:
+            objs = self.pop_due(count)
+            if objs:
+                q.put_many(objs)
+
+        return len(objs)
+
+    def wait(self, timeout) -> None:
+        """
+        等待下一个任务到期（有新任务放入时提前返回）
+
+        :param timeout: 最长等待时间
+        :return:
+        """
+        with self.not_empty:
+            if self.heap:
+                timeout = min(timeout, max(self.heap[0][0] - time.time(), 0))
+            self.not_empty.wait(timeout)
+
+    def empty(self):
+        """
+        判断队列是否为空（包括未到期的）
+
+        :return:
+        """
+        with self.mutex:
+            return not self.heap
+
+    def qsize(self):
+        """
+        返回队列大小（包括未到期的）
+
+        :return:
+        """
+        return len(self.heap)
+
+
+class DelayRedisSequence(RedisSequence):
+    """
+        redis 延迟队列：成员为 uuid + 编码后的请求（相同的请求也可以同时延迟）
+    """
+    ID_LENGTH = 32  # uuid 的长度
+
+    def __init__(self):
+        self.script = None
+
+    @classmethod
+    def get_redis_key(cls):
+        """
+        获取 redis 的键
+
+        :return:
+        """
+        return settings.REDIS_KEY_QUEUE_DELAY
+
+    def put(self, obj, delay: float = 0, **kwargs):
+        """
+        添加任务
+
+        :param obj:
+        :param delay: 延迟时间（秒）
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        redis_conn.zadd(self.redis_key, {uuid.uuid1().hex.encode() + obj.dumps(): time.time() + delay})
+
+    def get(self, block=False, timeout=None):
+        """
+        获取一个到期的任务（不阻塞）
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        objs = self.get_many(1)
+        if objs:
+            return objs[0]
+
+    def get_many(self, count, block=False, timeout=None):
+        """
+        批量获取到期的任务（不阻塞）
+
+        :param count: 最大数量
+        :param block:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if self.script is None:
+            self.script = redis_conn.register_script(DELAY_POP_SCRIPT)
+
+        results = self.script(keys=[self.redis_key], args=[time.time(), count])
+
+        return [LoadRequest.loads(result[self.ID_LENGTH:]) for result in results]
+
+    def move(self, q, count) -> int:
+        """
+        将到期的任务放入请求队列（取出、放入不是原子的，见模块说明）
+
+        :param q: 请求队列
+        :param count: 最大数量
+        :return: 放入的数量
+        """
+        objs = self.get_many(count)
+        if objs:
+            q.put_many(objs)
+
+        return len(objs)
+
+    def wait(self, timeout) -> None:
+        """
+        等待下一次搬运
+
+        :param timeout:
+        :return:
+        """
+        time.sleep(timeout)
+
+    def empty(self):
+        """
+        判断队列是否为空（包括未到期的）
+
+        :return:
+        """
+        return self.qsize() == 0
+
+    def qsize(self):
+        """
+        返回队列大小（包括未到期的）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        return redis_conn.zcard(self.redis_key)
@@ -0,0 +1,350 @@
+"""
+    溢出到磁盘的内存队列（本地时使用，开启 REQUEST_QUEUE_SPILL）
+
+    内存中最多保存 REQUEST_QUEUE_MEMORY_MAX 个（或 REQUEST_QUEUE_MEMORY_BYTES 字节）请求，超出的部分编码后写入本地 sqlite
+    取出时内存中的请求用完了再按顺序批量读回，内存占用保持平稳
+
+    保证顺序的方式：
+        先进先出、优先级：每个优先级一个先进先出队列，某个优先级在磁盘上有请求时，新请求也写入磁盘（内存中的都比磁盘上的早）
+        后进先出：新请求总是放入内存，内存满了把最早的一半写入磁盘（磁盘上的都比内存中的早）
+
+    注意：请求使用 settings.REQUEST_CODEC 编码，溢出文件在程序退出时删除
+"""
+import os
+import uuid
+import heapq
+import atexit
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from palp import settings
+from palp.network.request import LoadRequest
+from palp.sequence.sequence import Sequence
+
+
+class DiskSpillStorage:
+    """
+        溢出文件（sqlite）
+    """
+    BATCH = 1000  # 批量写入、读取的数量
+
+    def __init__(self):
+        self.path = os.path.join(
+            settings.REQUEST_QUEUE_SPILL_PATH or tempfile.gettempdir(), f'palp_queue_{uuid.uuid1().hex}.sqlite3'
+        )
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('CREATE TABLE queue (id INTEGER PRIMARY KEY AUTOINCREMENT, priority, data BLOB)')
+        self.conn.execute('CREATE INDEX queue_priority ON queue (priority, id)')
+        self.buffer = []  # 待写入的请求 [(优先级, 数据)]
+
+        atexit.register(self.close)
+
+    def write(self, priority, data: bytes) -> None:
+        """
+        写入（攒够一批再写）
+
+        :param priority:
+        :param data:
+        :return:
+        """
+        self.buffer.append((priority, data))
+        if len(self.buffer) >= self.BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        写入缓冲区中的请求
+
+        :return:
+        """
+        if self.buffer:
+            self.conn.executemany('INSERT INTO queue (priority, data) VALUES (?, ?)', self.buffer)
+            self.buffer.clear()
+
+    def read(self, priority=None, count: int = BATCH, newest: bool = False) -> list:
+        """
+        按写入顺序读取并删除
+
+        :param priority: 只读取该优先级的
+        :param count: 最大数量
+        :param newest: 从最新写入的开始读取
+        :return: [数据, ...]（读取的顺序）
+        """
+        self.flush()
+
+        where = '' if priority is None else 'WHERE priority = ?'
+        params = () if priority is None else (priority,)
+        rows = self.conn.execute(
+            f'SELECT id, data FROM queue {where} ORDER BY id {"DESC" if newest else ""} LIMIT ?', params + (count,)
+        ).fetchall()
+
+        if rows:
+            self.conn.executemany('DELETE FROM queue WHERE id = ?', [(row[0],) for row in rows])
+
+        return [row[1] for row in rows]
+
+    def close(self) -> None:
+        """
+        关闭并删除溢出文件
+
+        :return:
+        """
+        try:
+            self.conn.close()
+            os.remove(self.path)
+        except (OSError, sqlite3.Error):
+            pass
+
+
+class FIFODiskSequence(Sequence):
+    """
+        先进先出队列
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.memory = {}  # 内存中的请求 {优先级: deque([(请求, 大小)])}
+        self.memory_size = 0  # 内存中的请求数量
+        self.memory_bytes = 0  # 内存中的请求大小
+        self.disk = None  # 溢出文件，第一次溢出时创建
+        self.disk_size = {}  # 磁盘上的请求数量 {优先级: 数量}
+        self.priorities = []  # 有请求的优先级（小顶堆）
+
+    def get_priority(self, obj):
+        """
+        请求的优先级（先进先出时只有一个优先级）
+
+        :param obj:
+        :return:
+        """
+        return 0
+
+    def memory_full(self, size: int) -> bool:
+        """
+        内存是否已满
+
+        :param size: 将要放入的请求大小
+        :return:
+        """
+        if self.memory_size >= settings.REQUEST_QUEUE_MEMORY_MAX:
+            return True
+
+        return bool(settings.REQUEST_QUEUE_MEMORY_BYTES) and \
+            self.memory_bytes + size > settings.REQUEST_QUEUE_MEMORY_BYTES
+
+    @staticmethod
+    def get_size(obj) -> int:
+        """
+        请求编码后的大小（只有限制了字节数时才计算）
+
+        :param obj:
+        :return:
+        """
+        if settings.REQUEST_QUEUE_MEMORY_BYTES:
+            return len(obj.dumps())
+
+        return 0
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务：该优先级在磁盘上有请求或者内存已满则写入磁盘
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        priority = self.get_priority(obj)
+        size = self.get_size(obj)
+
+        with self.not_empty:
+            if priority not in self.memory and priority not in self.disk_size:
+                heapq.heappush(self.priorities, priority)
+
+            if self.disk_size.get(priority) or self.memory_full(size):
+                if self.disk is None:
+                    self.disk = DiskSpillStorage()
+                self.disk.write(priority, obj.dumps())
+                self.disk_size[priority] = self.disk_size.get(priority, 0) + 1
+            else:
+                self.memory.setdefault(priority, deque()).append((obj, size))
+                self.memory_size += 1
+                self.memory_bytes += size
+
+            self.not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务：取优先级最高的，内存中没有则从磁盘读回
+
+        :param block: 为 False 时不阻塞
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(self.priorities.__len__, timeout=timeout if block else 0):
+                return
+
+            priority = self.priorities[0]
+            if priority not in self.memory:
+                self.load(priority)
+
+            memory = self.memory[priority]
+            obj, size = memory.popleft()
+            self.memory_size -= 1
+            self.memory_bytes -= size
+
+            if not memory:
+                del self.memory[priority]
+                if priority not in self.disk_size:
+                    heapq.heappop(self.priorities)
+
+            return obj
+
+    def load(self, priority) -> None:
+        """
+        从磁盘读回一批请求（需要加锁调用）
+
+        :param priority:
+        :return:
+        """
+        memory = self.memory.setdefault(priority, deque())
+        for data in self.disk.read(priority):
+            obj = LoadRequest.loads(data)
+            size = len(data) if settings.REQUEST_QUEUE_MEMORY_BYTES else 0
+            memory.append((obj, size))
+            self.memory_size += 1
+            self.memory_bytes += size
+
+        self.disk_size[priority] -= len(memory)
+        if self.disk_size[priority] <= 0:
+            del self.disk_size[priority]
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return not self.priorities
+
+    def qsize(self):
+        """
+        返回队列大小（包括磁盘上的）
+
+        :return:
+        """
+        return self.memory_size + sum(self.disk_size.values())
+
+
+class PriorityDiskSequence(FIFODiskSequence):
+    """
+        优先级队列（同一优先级先进先出）
+    """
+
+    def get_priority(self, obj):
+        """
+        请求的优先级
+
+        :param obj:
+        :return:
+        """
+        if hasattr(obj, 'priority'):
+            return obj.priority
+
+        return settings.DEFAULT_QUEUE_PRIORITY
+
+
+class LIFODiskSequence(Sequence):
+    """
+        后进先出队列
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.memory = deque()  # 内存中的请求 [(请求, 大小)]
+        self.memory_bytes = 0  # 内存中的请求大小
+        self.disk = None  # 溢出文件，第一次溢出时创建
+        self.disk_size = 0  # 磁盘上的请求数量
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务：内存满了则将最早的一半写入磁盘
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        size = FIFODiskSequence.get_size(obj)
+
+        with self.not_empty:
+            self.memory.append((obj, size))
+            self.memory_bytes += size
+
+            if len(self.memory) > settings.REQUEST_QUEUE_MEMORY_MAX or (
+                    settings.REQUEST_QUEUE_MEMORY_BYTES and self.memory_bytes > settings.REQUEST_QUEUE_MEMORY_BYTES
+            ):
+                self.spill()
+
+            self.not_empty.notify()
+
+    def spill(self) -> None:
+        """
+        将内存中最早的一半写入磁盘（需要加锁调用）
+
+        :return:
+        """
+        if self.disk is None:
+            self.disk = DiskSpillStorage()
+
+        for _ in range(max(len(self.memory) // 2, 1)):
+            obj, size = self.memory.popleft()
+            self.memory_bytes -= size
+            self.disk.write(0, obj.dumps())
+            self.disk_size += 1
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务：内存中没有则从磁盘读回最新的一批
+
+        :param block: 为 False 时不阻塞
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(self.qsize, timeout=timeout if block else 0):
+                return
+
+            if not self.memory:
+                for data in self.disk.read(newest=True):
+                    size = len(data) if settings.REQUEST_QUEUE_MEMORY_BYTES else 0
+                    self.memory.appendleft((LoadRequest.loads(data), size))
+                    self.memory_bytes += size
+                    self.disk_size -= 1
+
+            obj, size = self.memory.pop()
+            self.memory_bytes -= size
+
+            return obj
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.qsize() == 0
+
+    def qsize(self):
+        """
+        返回队列大小（包括磁盘上的）
+
+        :return:
+        """
+        return len(self.memory) + self.disk_size
@@ -1,11 +1,16 @@
 """
-    三种内存队列
+    内存队列：先进先出、后进先出、优先级（堆、分桶）、按域名公平轮询
 
     注意：
         python 队列中的 PriorityQueue 需要对比的类实现 __lt__ 方法（小于）不然可能会报错
 """
+import heapq
 import queue
+import itertools
+import threading
+from collections import deque
 from palp import settings
+from palp.network.request import Request
 from palp.sequence.sequence import Sequence
 
 
@@ -105,3 +110,226 @@ class PriorityMemorySequence(FIFOMemorySequence):
             return item[-1]
         except queue.Empty:
             return
+
+
+class BucketPriorityMemorySequence(Sequence):
+    """
+        分桶的优先级队列：每个优先级一个 deque（同一优先级先进先出），加上非空优先级的索引（小顶堆）
+        优先级的种类很少（DEFAULT_QUEUE_PRIORITY - 深度），放入、取出都是 O(1)，不需要对比请求
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.buckets = {}  # {优先级: deque([请求])}
+        self.levels = []  # 非空的优先级（小顶堆）
+        self.size = 0
+
+    @staticmethod
+    def get_priority(obj):
+        """
+        任务的优先级
+
+        :param obj:
+        :return:
+        """
+        if hasattr(obj, 'priority'):
+            return obj.priority
+
+        return settings.DEFAULT_QUEUE_PRIORITY
+
+    def push(self, obj) -> None:
+        """
+        放入对应优先级的桶（需要加锁调用）
+
+        :param obj:
+        :return:
+        """
+        priority = self.get_priority(obj)
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = deque()
+            heapq.heappush(self.levels, priority)
+
+        bucket.append(obj)
+        self.size += 1
+
+    def pop(self):
+        """
+        从优先级最高的桶中取出（需要加锁调用）
+
+        :return:
+        """
+        priority = self.levels[0]
+        bucket = self.buckets[priority]
+        obj = bucket.popleft()
+        self.size -= 1
+
+        if not bucket:
+            del self.buckets[priority]
+            heapq.heappop(self.levels)
+
+        return obj
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            self.push(obj)
+            self.not_empty.notify()
+
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务（只加一次锁）
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            for obj in objs:
+                self.push(obj)
+            self.not_empty.notify(len(objs))
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务
+
+        :param block: 为 false 就是 nowait
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(lambda: self.size, timeout=timeout if block else 0):
+                return
+
+            return self.pop()
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务（只加一次锁）
+
+        :param count: 最大数量
+        :param block: 为 false 就是 nowait
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            if count <= 0 or not self.not_empty.wait_for(lambda: self.size, timeout=timeout if block else 0):
+                return []
+
+            return [self.pop() for _ in range(min(count, self.size))]
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.size == 0
+
+    def qsize(self):
+        """
+        返回队列大小
+
+        :return:
+        """
+        return self.size
+
+
+class FairMemorySequence(Sequence):
+    """
+        按域名公平轮询的队列：每个域名一个优先级队列，轮流从各个域名中获取
+        REQUEST_DOMAIN_SETTINGS 中的 weight 为域名每轮可以连续获取的数量（加权轮询），默认 1
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.queues = {}  # 每个域名的队列 {domain: [(优先级, 序号, 请求)]}
+        self.ring = deque()  # 有请求的域名（轮询顺序）
+        self.served = 0  # 当前域名本轮已获取的数量
+        self.size = 0
+        self.counter = itertools.count()  # 同一优先级先进先出
+
+    @staticmethod
+    def get_weight(domain) -> int:
+        """
+        域名的权重
+
+        :param domain:
+        :return:
+        """
+        return max(int(settings.REQUEST_DOMAIN_SETTINGS.get(domain, {}).get('weight', 1)), 1)
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        domain = obj.domain if isinstance(obj, Request) else None
+        priority = obj.priority if hasattr(obj, 'priority') else settings.DEFAULT_QUEUE_PRIORITY
+
+        with self.not_empty:
+            if domain not in self.queues:
+                self.queues[domain] = []
+                self.ring.append(domain)
+
+            heapq.heappush(self.queues[domain], (priority, next(self.counter), obj))
+            self.size += 1
+            self.not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务：从当前域名获取，达到权重后轮到下一个域名
+
+        :param block: 为 false 就是 nowait
+        :param timeout:
+        :return:
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(lambda: self.size, timeout=timeout if block else 0):
+                return
+
+            domain = self.ring[0]
+            domain_queue = self.queues[domain]
+            obj = heapq.heappop(domain_queue)[-1]
+            self.size -= 1
+            self.served += 1
+
+            if not domain_queue:
+                del self.queues[domain]
+                self.ring.popleft()
+                self.served = 0
+            elif self.served >= self.get_weight(domain):
+                self.ring.rotate(-1)
+                self.served = 0
+
+            return obj
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.size == 0
+
+    def qsize(self):
+        """
+        返回队列大小
+
+        :return:
+        """
+        return self.size
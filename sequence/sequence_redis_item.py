@@ -2,6 +2,7 @@
     redis item 队列
     使用了 pickle 并使用 zlib 压缩
 """
+import math
 import zlib
 import pickle
 from palp import settings
@@ -34,17 +35,57 @@ class FIFOItemRedisSequence(RedisSequence):
 
         redis_conn.rpush(self.redis_key, zlib.compress(pickle.dumps(obj)))
 
-    def get(self, timeout=None, **kwargs):
+    def get(self, block=True, timeout=None, **kwargs):
         """
         获取任务（这里是返回的对象）
 
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间（redis 6 以下仅支持整数，这里向上取整），None 为一直阻塞，小于等于 0 时不阻塞
         :return:
         """
         from palp.conn import redis_conn
 
-        result = redis_conn.blpop(self.redis_key, timeout=timeout)
+        # BLPOP 的 timeout 为 0 时会一直阻塞
+        if not block or (timeout is not None and timeout <= 0):
+            result = redis_conn.lpop(self.redis_key)
+        else:
+            result = redis_conn.blpop(self.redis_key, timeout=math.ceil(timeout or 0))
+            result = result[-1] if result else None
+
         if result:
-            return pickle.loads(zlib.decompress(result[-1]))
+            return pickle.loads(zlib.decompress(result))
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（一条 RPUSH）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if objs:
+            redis_conn.rpush(self.redis_key, *[zlib.compress(pickle.dumps(obj)) for obj in objs])
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：队列为空时阻塞等待第一个，其余一次弹出
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间
+        :return:
+        """
+        results = self.list_pop_many(count)
+        if not results and block:
+            obj = self.get(block=True, timeout=timeout)
+            if obj is None:
+                return []
+
+            return [obj] + self.get_many(count - 1, block=False)
+
+        return [pickle.loads(zlib.decompress(result)) for result in results]
 
     def empty(self):
         """
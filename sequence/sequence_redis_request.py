@@ -1,15 +1,112 @@
 """
     redis request 队列
+
+    可靠队列（REQUEST_QUEUE_RELIABLE）：
+        取出请求时通过 lua 脚本原子的将其移入本机的处理中 hash，并设置本机的租约（心跳时续约），请求处理完毕（release）后才删除
+        处理中 hash 的字段为 本次取出的 uuid + 序号 + 编码后的请求，相同的请求同时处理时互不影响
+        机器异常关闭后租约过期，心跳检查时由其它机器将其处理中的请求放回队列
+        相关的 key 都使用请求队列的 key 作为 hash tag，保证集群时在同一个 slot：
+            {请求队列}:processing:机器：处理中的请求（hash，uuid + 序号 + 请求: 优先级）
+            {请求队列}:lease:机器：租约（str）
+            {请求队列}:workers：取过请求的机器（set）
+
+    分桶的优先级队列（BucketPriorityRequestRedisSequence）、按域名公平轮询的队列（FairRequestRedisSequence）：见类的说明
 """
+import math
+import time
+import uuid
+from abc import abstractmethod
+from loguru import logger
 from palp import settings
 from palp.network.request import LoadRequest
 from palp.sequence.sequence import RedisSequence
+from palp.sequence.sequence_memory import FairMemorySequence
+
+# 批量取出请求并移入处理中，设置租约
+# KEYS：请求队列、处理中、租约、机器集合
+# ARGV：队列类型（0 列表左侧，1 列表右侧，2 有序集合）、数量、租约（毫秒）、机器、本次取出的 uuid
+# 返回：处理中的字段（uuid + 8 位十六进制序号 + 请求）
+RELIABLE_POP_SCRIPT = """
+local count = tonumber(ARGV[2])
+local result = {}
+
+if ARGV[1] == '2' then
+    local popped = redis.call('ZPOPMIN', KEYS[1], count)
+    for i = 1, #popped, 2 do
+        local field = ARGV[5] .. string.format('%08x', #result) .. popped[i]
+        result[#result + 1] = field
+        redis.call('HSET', KEYS[2], field, popped[i + 1])
+    end
+else
+    if ARGV[1] == '0' then
+        result = redis.call('LRANGE', KEYS[1], 0, count - 1)
+        if #result > 0 then
+            redis.call('LTRIM', KEYS[1], #result, -1)
+        end
+    else
+        result = redis.call('LRANGE', KEYS[1], -count, -1)
+        if #result > 0 then
+            redis.call('LTRIM', KEYS[1], 0, -#result - 1)
+        end
+    end
+
+    for i = 1, #result do
+        result[i] = ARGV[5] .. string.format('%08x', i - 1) .. result[i]
+        redis.call('HSET', KEYS[2], result[i], 0)
+    end
+end
+
+if #result > 0 then
+    redis.call('SET', KEYS[3], 1, 'PX', ARGV[3])
+    redis.call('SADD', KEYS[4], ARGV[4])
+end
+
+return result
+"""
+
+# 租约过期则将处理中的请求（去掉字段的 uuid、序号）放回队列的最前面
+# KEYS：请求队列、处理中、租约、机器集合
+# ARGV：队列类型、机器、字段中请求的起始位置
+# 返回：放回的数量（-1 为租约未过期）
+RELIABLE_RECOVER_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return -1
+end
+
+local start = tonumber(ARGV[3])
+local processing = redis.call('HGETALL', KEYS[2])
+for i = 1, #processing, 2 do
+    local request = string.sub(processing[i], start)
+    if ARGV[1] == '2' then
+        redis.call('ZADD', KEYS[1], processing[i + 1], request)
+    elseif ARGV[1] == '0' then
+        redis.call('LPUSH', KEYS[1], request)
+    else
+        redis.call('RPUSH', KEYS[1], request)
+    end
+end
+
+redis.call('DEL', KEYS[2])
+redis.call('SREM', KEYS[4], ARGV[2])
+
+return #processing / 2
+"""
 
 
 class FIFORequestRedisSequence(RedisSequence):
     """
         先进先出队列
     """
+    POP_RIGHT = False  # 批量获取时从右侧弹出
+    POP_TYPE = 0  # 可靠队列脚本的队列类型
+    POLL_INTERVAL = 0.1  # 可靠队列阻塞获取时的轮询间隔
+    ID_LENGTH = 40  # 可靠队列处理中字段的前缀长度（uuid + 8 位序号）
+
+    def __init__(self):
+        self.reliable = settings.REQUEST_QUEUE_RELIABLE  # 是否为可靠队列
+        self.worker = uuid.uuid1().hex  # 本机标识
+        self.processing = {}  # 处理中的请求 {id(request): 处理中的字段}
+        self.scripts = {}
 
     @classmethod
     def get_redis_key(cls):
@@ -20,6 +117,158 @@ class FIFORequestRedisSequence(RedisSequence):
         """
         return settings.REDIS_KEY_QUEUE_REQUEST
 
+    def reliable_key(self, name: str, worker: str = None) -> str:
+        """
+        可靠队列相关的 key（使用请求队列的 key 作为 hash tag）
+
+        :param name: processing、lease、workers
+        :param worker: 机器
+        :return:
+        """
+        key = '{%s}:%s' % (self.redis_key, name)
+
+        return f'{key}:{worker}' if worker else key
+
+    def get_script(self, script: str):
+        """
+        获取注册的 lua 脚本
+
+        :param script:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if script not in self.scripts:
+            self.scripts[script] = redis_conn.register_script(script)
+
+        return self.scripts[script]
+
+    def reliable_get_many(self, count, block=True, timeout=None):
+        """
+        可靠队列批量获取：原子的取出并移入处理中，阻塞时轮询
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间，None 为一直等待
+        :return:
+        """
+        script = self.get_script(RELIABLE_POP_SCRIPT)
+        keys = [
+            self.redis_key,
+            self.reliable_key('processing', self.worker),
+            self.reliable_key('lease', self.worker),
+            self.reliable_key('workers')
+        ]
+        end_time = time.time() + timeout if timeout is not None else None
+
+        while True:
+            args = [self.POP_TYPE, count, int(settings.REQUEST_QUEUE_LEASE * 1000), self.worker, uuid.uuid1().hex]
+            results = script(keys=keys, args=args) if count > 0 else []
+            if results or not block:
+                break
+
+            remain = None if end_time is None else end_time - time.time()
+            if remain is not None and remain <= 0:
+                break
+
+            time.sleep(self.POLL_INTERVAL if remain is None else min(self.POLL_INTERVAL, remain))
+
+        if self.POP_RIGHT:
+            results.reverse()
+
+        objs = []
+        for result in results:
+            obj = LoadRequest.loads(result[self.ID_LENGTH:])
+            self.processing[id(obj)] = result
+            objs.append(obj)
+
+        return objs
+
+    def reliable_get(self, block=True, timeout=None):
+        """
+        可靠队列获取
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        objs = self.reliable_get_many(1, block=block, timeout=timeout)
+        if objs:
+            return objs[0]
+
+    def release(self, obj):
+        """
+        请求处理完毕：可靠队列时从处理中删除（确认）
+
+        :param obj:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        result = self.processing.pop(id(obj), None)
+        if result is not None:
+            redis_conn.hdel(self.reliable_key('processing', self.worker), result)
+
+    def keep_alive(self):
+        """
+        续约：可靠队列时延长本机的租约
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if self.reliable:
+            redis_conn.set(self.reliable_key('lease', self.worker), 1, px=int(settings.REQUEST_QUEUE_LEASE * 1000))
+
+    def recover(self):
+        """
+        将租约过期的机器处理中的请求放回队列
+
+        :return: 放回的数量
+        """
+        from palp.conn import redis_conn
+
+        if not self.reliable:
+            return 0
+
+        script = self.get_script(RELIABLE_RECOVER_SCRIPT)
+        recovered = 0
+        for worker in redis_conn.smembers(self.reliable_key('workers')):
+            worker = worker.decode()
+            keys = [
+                self.redis_key,
+                self.reliable_key('processing', worker),
+                self.reliable_key('lease', worker),
+                self.reliable_key('workers')
+            ]
+            count = script(keys=keys, args=[self.POP_TYPE, worker, self.ID_LENGTH + 1])
+            if count > 0:
+                logger.warning(f"机器租约过期，放回其处理中的请求：{worker} -> {count}")
+                recovered += count
+
+        return recovered
+
+    def unacked(self):
+        """
+        所有机器已取出但还未确认的请求数量
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if not self.reliable:
+            return 0
+
+        workers = [worker.decode() for worker in redis_conn.smembers(self.reliable_key('workers'))]
+        if not workers:
+            return 0
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for worker in workers:
+            pipe.hlen(self.reliable_key('processing', worker))
+
+        return sum(pipe.execute())
+
     def put(self, obj, timeout=None, **kwargs):
         """
         添加任务
@@ -30,19 +279,64 @@ class FIFORequestRedisSequence(RedisSequence):
         """
         from palp.conn import redis_conn
 
-        redis_conn.rpush(self.redis_key, obj.to_json())
+        redis_conn.rpush(self.redis_key, obj.dumps())
 
-    def get(self, timeout=None, **kwargs):
+    def get(self, block=True, timeout=None, **kwargs):
         """
         获取任务（这里是返回的对象）
 
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间（redis 6 以下仅支持整数，这里向上取整）
         :return:
         """
         from palp.conn import redis_conn
 
-        result = redis_conn.blpop(self.redis_key, timeout=timeout)
+        if self.reliable:
+            return self.reliable_get(block=block, timeout=timeout)
+
+        if not block:
+            result = redis_conn.lpop(self.redis_key)
+        else:
+            result = redis_conn.blpop(self.redis_key, timeout=math.ceil(timeout or 0))
+            result = result[-1] if result else None
+
         if result:
-            return LoadRequest.load_from_json(result[-1].decode())
+            return LoadRequest.loads(result)
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（一条 RPUSH）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if objs:
+            redis_conn.rpush(self.redis_key, *[obj.dumps() for obj in objs])
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：队列为空时阻塞等待第一个，其余一次弹出
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间
+        :return:
+        """
+        if self.reliable:
+            return self.reliable_get_many(count, block=block, timeout=timeout)
+
+        results = self.list_pop_many(count, right=self.POP_RIGHT)
+        if not results and block:
+            obj = self.get(block=True, timeout=timeout)
+            if obj is None:
+                return []
+
+            return [obj] + self.get_many(count - 1, block=False)
+
+        return [LoadRequest.loads(result) for result in results]
 
     def empty(self):
         """
@@ -69,23 +363,37 @@ class LIFORequestRedisSequence(FIFORequestRedisSequence):
     """
         后进先出队列
     """
+    POP_RIGHT = True
+    POP_TYPE = 1
 
-    def get(self, timeout=None, **kwargs):
+    def get(self, block=True, timeout=None, **kwargs):
         """
         获取任务
+
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间（redis 6 以下仅支持整数，这里向上取整）
         :return:
         """
         from palp.conn import redis_conn
 
-        result = redis_conn.brpop(self.redis_key, timeout=timeout)
+        if self.reliable:
+            return self.reliable_get(block=block, timeout=timeout)
+
+        if not block:
+            result = redis_conn.rpop(self.redis_key)
+        else:
+            result = redis_conn.brpop(self.redis_key, timeout=math.ceil(timeout or 0))
+            result = result[-1] if result else None
+
         if result:
-            return LoadRequest.load_from_json(result[-1].decode())
+            return LoadRequest.loads(result)
 
 
 class PriorityRequestRedisSequence(FIFORequestRedisSequence):
     """
         优先级队列
     """
+    POP_TYPE = 2
 
     def put(self, obj, timeout=None, **kwargs):
         """
@@ -97,19 +405,67 @@ class PriorityRequestRedisSequence(FIFORequestRedisSequence):
         """
         from palp.conn import redis_conn
 
-        redis_conn.zadd(self.redis_key, {obj.to_json(): obj.priority})
+        redis_conn.zadd(self.redis_key, {obj.dumps(): obj.priority})
 
-    def get(self, timeout=None, **kwargs):
+    def get(self, block=True, timeout=None, **kwargs):
         """
         获取任务（这里是返回的对象）
 
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间（redis 6 以下仅支持整数，这里向上取整）
         :return:
         """
         from palp.conn import redis_conn
 
-        result = redis_conn.bzpopmin(self.redis_key, timeout=timeout)
+        if self.reliable:
+            return self.reliable_get(block=block, timeout=timeout)
+
+        if not block:
+            result = redis_conn.zpopmin(self.redis_key)
+            result = result[0][0] if result else None
+        else:
+            result = redis_conn.bzpopmin(self.redis_key, timeout=math.ceil(timeout or 0))
+            result = result[1] if result else None
+
         if result:
-            return LoadRequest.load_from_json(result[1].decode())
+            return LoadRequest.loads(result)
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（一条 ZADD）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if objs:
+            redis_conn.zadd(self.redis_key, {obj.dumps(): obj.priority for obj in objs})
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：队列为空时阻塞等待第一个，其余通过 ZPOPMIN key count 一次弹出
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if self.reliable:
+            return self.reliable_get_many(count, block=block, timeout=timeout)
+
+        results = redis_conn.zpopmin(self.redis_key, count) if count > 0 else []
+        if not results and block:
+            obj = self.get(block=True, timeout=timeout)
+            if obj is None:
+                return []
+
+            return [obj] + self.get_many(count - 1, block=False)
+
+        return [LoadRequest.loads(result[0]) for result in results]
 
     def empty(self):
         """
@@ -130,3 +486,350 @@ class PriorityRequestRedisSequence(FIFORequestRedisSequence):
         from palp.conn import redis_conn
 
         return redis_conn.zcard(self.redis_key)
+
+
+class ScriptRequestRedisSequence(RedisSequence):
+    """
+        由多个 key 组成、通过 lua 脚本放入、取出的队列（不支持可靠队列）
+        相关的 key 使用请求队列的 key 作为 hash tag（集群时在同一个 slot），阻塞获取时轮询
+    """
+
+    def __init__(self):
+        self.scripts = {}
+
+        if settings.REQUEST_QUEUE_RELIABLE:
+            logger.warning(
+                f"{self.__class__.__name__}（REQUEST_QUEUE_MODE={settings.REQUEST_QUEUE_MODE}）不支持可靠队列，"
+                f"REQUEST_QUEUE_RELIABLE 不生效，机器异常关闭时已取出的请求会丢失"
+            )
+
+    @classmethod
+    def get_redis_key(cls):
+        """
+        获取 redis 的键
+
+        :return:
+        """
+        return settings.REDIS_KEY_QUEUE_REQUEST
+
+    def sub_key(self, name: str) -> str:
+        """
+        队列相关的 key
+
+        :param name:
+        :return:
+        """
+        return '{%s}:%s' % (self.redis_key, name)
+
+    def get_script(self, script: str):
+        """
+        获取注册的 lua 脚本
+
+        :param script:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if script not in self.scripts:
+            self.scripts[script] = redis_conn.register_script(script)
+
+        return self.scripts[script]
+
+    def put(self, obj, timeout=None, **kwargs):
+        """
+        添加任务
+
+        :param obj:
+        :param timeout:
+        :return:
+        """
+        self.put_many([obj])
+
+    @abstractmethod
+    def pop(self, count: int) -> list:
+        """
+        取出最多 count 个请求（不阻塞）
+
+        :param count:
+        :return: 编码后的请求
+        """
+
+    def get(self, block=True, timeout=None, **kwargs):
+        """
+        获取任务
+
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间，None 为一直等待
+        :return:
+        """
+        objs = self.get_many(1, block=block, timeout=timeout)
+        if objs:
+            return objs[0]
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：阻塞时轮询等待
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间，None 为一直等待
+        :return:
+        """
+        end_time = time.time() + timeout if timeout is not None else None
+
+        while True:
+            results = self.pop(count) if count > 0 else []
+            if results or not block:
+                break
+
+            remain = None if end_time is None else end_time - time.time()
+            if remain is not None and remain <= 0:
+                break
+
+            time.sleep(FIFORequestRedisSequence.POLL_INTERVAL if remain is None else
+                       min(FIFORequestRedisSequence.POLL_INTERVAL, remain))
+
+        return [LoadRequest.loads(result) for result in results]
+
+
+# 放入请求：每个优先级一个列表，列表由空变为非空时将优先级加入索引（有序集合）
+# KEYS：优先级索引、然后每个请求对应的优先级列表
+# ARGV：每 2 个一组：优先级、请求
+BUCKET_PUT_SCRIPT = """
+for i = 2, #KEYS do
+    local level = ARGV[i * 2 - 3]
+    if redis.call('RPUSH', KEYS[i], ARGV[i * 2 - 2]) == 1 then
+        redis.call('ZADD', KEYS[1], level, level)
+    end
+end
+"""
+
+# 取出请求：从优先级最高（最小）的列表开始取，列表为空后从索引中删除
+# KEYS：优先级索引
+# ARGV：优先级列表的前缀（列表的 key 由前缀拼接，未在 KEYS 中声明）、最大数量
+BUCKET_POP_SCRIPT = """
+local result = {}
+local count = tonumber(ARGV[2])
+
+while #result < count do
+    local level = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+    if not level then
+        break
+    end
+
+    local key = ARGV[1] .. level
+    local items = redis.call('LRANGE', key, 0, count - #result - 1)
+    if #items > 0 then
+        redis.call('LTRIM', key, #items, -1)
+    end
+
+    for _, item in ipairs(items) do
+        result[#result + 1] = item
+    end
+
+    if redis.call('LLEN', key) == 0 then
+        redis.call('ZREM', KEYS[1], level)
+    end
+end
+
+return result
+"""
+
+
+class BucketPriorityRequestRedisSequence(ScriptRequestRedisSequence):
+    """
+        分桶的优先级队列：每个优先级一个列表（同一优先级先进先出，相同的请求不会合并），加上非空优先级的索引
+        优先级的种类很少，放入、取出都是 O(1)
+
+        相关的 key：
+            {请求队列}:levels：有请求的优先级（zset）
+            {请求队列}:level:优先级：该优先级的请求（list）
+
+        取出前不知道要取哪些优先级，取出脚本根据前缀拼接优先级列表的 key（未在 KEYS 中声明），
+        依赖所有的 key 使用同一个 hash tag（集群时在同一个 slot），不要修改 key 的格式
+    """
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（一次脚本调用）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        if not objs:
+            return
+
+        keys = [self.sub_key('levels')]
+        args = []
+        for obj in objs:
+            keys.append(self.sub_key(f'level:{obj.priority}'))
+            args.extend([obj.priority, obj.dumps()])
+
+        self.get_script(BUCKET_PUT_SCRIPT)(keys=keys, args=args)
+
+    def pop(self, count: int) -> list:
+        """
+        按优先级取出最多 count 个请求
+
+        :param count:
+        :return:
+        """
+        return self.get_script(BUCKET_POP_SCRIPT)(keys=[self.sub_key('levels')], args=[self.sub_key('level:'), count])
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        return redis_conn.zcard(self.sub_key('levels')) == 0
+
+    def qsize(self):
+        """
+        返回队列大小（所有优先级的请求数量）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        levels = redis_conn.zrange(self.sub_key('levels'), 0, -1)
+        if not levels:
+            return 0
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for level in levels:
+            pipe.llen(self.sub_key('level:') + level.decode())
+
+        return sum(pipe.execute())
+
+
+# 放入请求：每个域名一个有序集合，域名的队列由空变为非空时加入轮询列表（列表右侧为当前域名，新域名从左侧加入）
+# KEYS：轮询列表、权重（hash）、然后每个请求对应的域名队列
+# ARGV：每 4 个一组：域名、优先级、请求、权重
+FAIR_PUT_SCRIPT = """
+for i = 3, #KEYS do
+    local j = (i - 3) * 4
+    local domain = ARGV[j + 1]
+    local added = redis.call('ZADD', KEYS[i], ARGV[j + 2], ARGV[j + 3])
+
+    if added == 1 and redis.call('ZCARD', KEYS[i]) == 1 then
+        redis.call('LPUSH', KEYS[1], domain)
+    end
+
+    if ARGV[j + 4] ~= '1' then
+        redis.call('HSET', KEYS[2], domain, ARGV[j + 4])
+    end
+end
+"""
+
+# 轮询获取请求：从当前域名获取，达到权重或者域名的队列为空后轮到下一个域名
+# KEYS：轮询列表、权重（hash）、当前域名已获取的数量
+# ARGV：域名队列的前缀（域名队列的 key 由前缀拼接，未在 KEYS 中声明）、最大数量
+FAIR_POP_SCRIPT = """
+local result = {}
+local served = tonumber(redis.call('GET', KEYS[3]) or 0)
+
+while #result < tonumber(ARGV[2]) do
+    local domain = redis.call('LINDEX', KEYS[1], -1)
+    if not domain then
+        break
+    end
+
+    local key = ARGV[1] .. domain
+    local popped = redis.call('ZPOPMIN', key)
+    if popped[1] then
+        result[#result + 1] = popped[1]
+        served = served + 1
+    end
+
+    if redis.call('ZCARD', key) == 0 then
+        redis.call('RPOP', KEYS[1])
+        served = 0
+    elseif served >= tonumber(redis.call('HGET', KEYS[2], domain) or 1) then
+        redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+        served = 0
+    end
+end
+
+redis.call('SET', KEYS[3], served)
+
+return result
+"""
+
+
+class FairRequestRedisSequence(ScriptRequestRedisSequence):
+    """
+        按域名公平轮询的队列：每个域名一个优先级队列（有序集合），轮流从各个域名中获取
+        REQUEST_DOMAIN_SETTINGS 中的 weight 为域名每轮可以连续获取的数量（加权轮询），默认 1
+
+        相关的 key：
+            {请求队列}:ring：有请求的域名（轮询列表）
+            {请求队列}:weight：域名的权重（hash）
+            {请求队列}:served：当前域名本轮已获取的数量
+            {请求队列}:domain:域名：域名的请求队列（zset）
+
+        取出前不知道要取哪些域名，取出脚本根据前缀拼接域名队列的 key（未在 KEYS 中声明），
+        依赖所有的 key 使用同一个 hash tag（集群时在同一个 slot），不要修改 key 的格式
+    """
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（一次脚本调用）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        if not objs:
+            return
+
+        keys = [self.sub_key('ring'), self.sub_key('weight')]
+        args = []
+        for obj in objs:
+            keys.append(self.sub_key(f'domain:{obj.domain}'))
+            args.extend([obj.domain, obj.priority, obj.dumps(), FairMemorySequence.get_weight(obj.domain)])
+
+        self.get_script(FAIR_PUT_SCRIPT)(keys=keys, args=args)
+
+    def pop(self, count: int) -> list:
+        """
+        在多个域名之间轮询取出最多 count 个请求
+
+        :param count:
+        :return:
+        """
+        return self.get_script(FAIR_POP_SCRIPT)(
+            keys=[self.sub_key('ring'), self.sub_key('weight'), self.sub_key('served')],
+            args=[self.sub_key('domain:'), count]
+        )
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        return redis_conn.llen(self.sub_key('ring')) == 0
+
+    def qsize(self):
+        """
+        返回队列大小（所有域名的请求数量）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        domains = redis_conn.lrange(self.sub_key('ring'), 0, -1)
+        if not domains:
+            return 0
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for domain in domains:
+            pipe.zcard(self.sub_key('domain:') + domain.decode())
+
+        return sum(pipe.execute())
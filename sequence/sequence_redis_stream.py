@@ -0,0 +1,230 @@
+"""
+    redis stream request 队列（需要 redis 6.2+）
+
+    通过消费组分发请求：每台机器是组内的一个消费者，XREADGROUP 一次读取多个请求，处理完毕（release）后 XACK 并删除
+    读取但未确认的请求在 stream 的待处理列表（PEL）中，机器异常关闭后，空闲超过 REQUEST_QUEUE_LEASE 的请求会被其它机器 XAUTOCLAIM 认领
+    心跳时会重置本机处理中请求的空闲时间（XCLAIM JUSTID），避免处理较慢的请求被认领
+"""
+import time
+import uuid
+from palp import settings
+from palp.network.request import LoadRequest
+from palp.sequence.sequence import RedisSequence
+
+
+class FIFORequestStreamRedisSequence(RedisSequence):
+    """
+        先进先出队列
+    """
+    reliable = True  # 未确认的请求保留在消费组中，可以被其它机器认领
+    GROUP = 'palp'  # 消费组
+    FIELD = 'request'  # 请求所在的字段
+    RECLAIM_INTERVAL = 1  # 认领空闲请求的最小间隔
+
+    def __init__(self):
+        self.consumer = uuid.uuid1().hex  # 消费者（本机）
+        self.processing = {}  # 处理中的请求 {id(request): stream id}
+        self.group_created = False
+        self.reclaim_time = 0  # 下次认领的时间
+
+    @classmethod
+    def get_redis_key(cls):
+        """
+        获取 redis 的键
+
+        :return:
+        """
+        return settings.REDIS_KEY_QUEUE_REQUEST
+
+    def create_group(self) -> None:
+        """
+        创建消费组（已存在则忽略）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        try:
+            redis_conn.execute_command('XGROUP', 'CREATE', self.redis_key, self.GROUP, 0, 'MKSTREAM')
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+        self.group_created = True
+
+    def put(self, obj, timeout=None, **kwargs):
+        """
+        添加任务
+
+        :param obj:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        redis_conn.xadd(self.redis_key, {self.FIELD: obj.dumps()})
+
+    def put_many(self, objs, timeout=None, **kwargs):
+        """
+        批量添加任务（pipeline 一次发送）
+
+        :param objs:
+        :param timeout:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for obj in objs:
+            pipe.xadd(self.redis_key, {self.FIELD: obj.dumps()})
+        pipe.execute()
+
+    def get(self, block=True, timeout=None, **kwargs):
+        """
+        获取任务
+
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间，None 为一直等待
+        :return:
+        """
+        objs = self.get_many(1, block=block, timeout=timeout)
+        if objs:
+            return objs[0]
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：优先认领其它机器空闲超时的请求，其次读取新请求
+
+        :param count: 最大数量
+        :param block: 为 False 时不阻塞
+        :param timeout: 阻塞时间，None 为一直等待
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if count <= 0:
+            return []
+
+        if not self.group_created:
+            self.create_group()
+
+        entries = self.reclaim(count)
+        if not entries:
+            try:
+                result = redis_conn.xreadgroup(
+                    self.GROUP, self.consumer, {self.redis_key: '>'}, count=count,
+                    block=(max(int(timeout * 1000), 1) if timeout is not None else 0) if block else None
+                )
+            except Exception as e:
+                # stream 被删除后消费组也会被删除，重新创建
+                if 'NOGROUP' not in str(e):
+                    raise
+                self.group_created = False
+                return []
+
+            entries = result[0][1] if result else []
+
+        objs = []
+        for stream_id, fields in entries:
+            obj = LoadRequest.loads(fields[self.FIELD.encode()])
+            self.processing[id(obj)] = stream_id
+            objs.append(obj)
+
+        return objs
+
+    def reclaim(self, count: int) -> list:
+        """
+        认领空闲超过 REQUEST_QUEUE_LEASE 的请求（其它机器异常关闭后未确认的）
+
+        :param count: 最大数量
+        :return: [(stream id, 字段), ...]
+        """
+        from palp.conn import redis_conn
+
+        if time.time() < self.reclaim_time:
+            return []
+        self.reclaim_time = time.time() + self.RECLAIM_INTERVAL
+
+        result = redis_conn.execute_command(
+            'XAUTOCLAIM', self.redis_key, self.GROUP, self.consumer, int(settings.REQUEST_QUEUE_LEASE * 1000), '0-0',
+            'COUNT', count
+        )
+
+        entries = []
+        for entry in result[1]:
+            # 已被删除的请求（redis 7.0 以下会返回空）
+            if not entry or not entry[1]:
+                continue
+
+            stream_id, fields = entry
+            if not isinstance(fields, dict):
+                fields = dict(zip(fields[::2], fields[1::2]))
+            entries.append((stream_id, fields))
+
+        return entries
+
+    def release(self, obj):
+        """
+        请求处理完毕：确认并删除
+
+        :param obj:
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        stream_id = self.processing.pop(id(obj), None)
+        if stream_id is not None:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.xack(self.redis_key, self.GROUP, stream_id)
+            pipe.xdel(self.redis_key, stream_id)
+            pipe.execute()
+
+    def keep_alive(self):
+        """
+        续约：重置本机处理中请求的空闲时间
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        stream_ids = list(self.processing.values())
+        if stream_ids:
+            redis_conn.xclaim(self.redis_key, self.GROUP, self.consumer, 0, stream_ids, justid=True)
+
+    def unacked(self):
+        """
+        所有机器已读取但还未确认的请求数量
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        if not self.group_created:
+            return 0
+
+        try:
+            return redis_conn.xpending(self.redis_key, self.GROUP)['pending']
+        except Exception as e:
+            if 'NOGROUP' not in str(e):
+                raise
+            return 0
+
+    def empty(self):
+        """
+        判断队列是否为空（确认后会删除，所以包括未确认的请求）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        return redis_conn.xlen(self.redis_key) == 0
+
+    def qsize(self):
+        """
+        返回队列大小（包括未确认的请求）
+
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        return redis_conn.xlen(self.redis_key)
@@ -0,0 +1,475 @@
+"""
+    多进程共享的队列（本地爬虫开启 SPIDER_PROCESSES 时使用）
+
+    SharedSequence：运行在协调进程（palp.tool.process_coordinator.LocalManager）中，工作进程通过代理访问
+        包含请求队列、延迟队列，并记录已放入还未处理完毕（release）的任务数量，所有进程据此判断爬虫是否结束
+        同时记录每个域名下次允许发送请求的时间、正在执行的请求数，REQUEST_DELAY、REQUEST_DOMAIN_CONCURRENCY 对所有进程生效
+    SharedRequestSequence：工作进程中的请求队列，转发给 SharedSequence，处理完毕时只传递域名（不传递请求）
+    SharedDelaySequence：工作进程中的延迟队列，转发给 SharedSequence
+
+    注意：请求通过 pickle 在进程间传递
+"""
+import time
+import threading
+from palp.sequence.sequence import Sequence
+from palp.tool.short_module import import_module
+
+
+class SharedSequence(Sequence):
+    """
+        多进程共享的队列（运行在协调进程中）
+    """
+    CONCURRENCY_WAIT = 0.1  # 域名达到并发上限时，等待其它请求释放后重试的间隔
+
+    def __init__(self, queue_module: str, delay_module: str):
+        """
+
+        :param queue_module: 请求队列的模块
+        :param delay_module: 延迟队列的模块
+        """
+        self.queue = import_module(queue_module)[0]
+        self.queue_delay = import_module(delay_module)[0]
+
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)  # 有新的任务放入、有任务处理完毕
+        self.outstanding = 0  # 已放入还未处理完毕的任务数量
+        self.version = 0  # 放入、处理完毕的次数
+        self.distributing = True  # 起始请求是否还在分发
+        self.stopped = False  # 主进程已经停止
+        self.records = []  # 各个工作进程的 spider_record
+        self.next_time = {}  # 域名下次允许发送请求的时间 {domain: timestamp}
+        self.running = {}  # 域名正在执行的请求数 {domain: count}
+
+    def change(self, count: int) -> None:
+        """
+        修改未处理完毕的任务数量，并通知等待的进程
+
+        :param count:
+        :return:
+        """
+        with self.mutex:
+            self.outstanding += count
+            self.version += 1
+            self.not_empty.notify_all()
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        self.put_many([obj], block=block, timeout=timeout)
+
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务（先记录再放入）
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        if not objs:
+            return
+
+        with self.mutex:
+            self.outstanding += len(objs)
+
+        try:
+            self.queue.put_many(objs, block=block, timeout=timeout)
+        except Exception:
+            self.change(-len(objs))
+            raise
+
+        self.change(0)
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        objs = self.get_many(1, block=block, timeout=timeout)
+        if objs:
+            return objs[0]
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务：等待放入、处理完毕的通知，所有任务处理完毕时立即返回
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        end_time = time.time() + timeout if timeout is not None else None
+        while True:
+            version = self.version
+            objs = self.queue.get_many(count, block=False)
+            if objs or not block or self.all_task_done():
+                return objs
+
+            with self.mutex:
+                remain = None if end_time is None else end_time - time.time()
+                if remain is not None and remain <= 0:
+                    return []
+
+                self.not_empty.wait_for(lambda: self.version != version, remain)
+
+    def release(self, obj):
+        """
+        任务处理完毕
+
+        :param obj:
+        :return:
+        """
+        self.queue.release(obj)
+        self.change(-1)
+
+    def task_done(self, domain: str = None) -> None:
+        """
+        任务处理完毕（本地请求队列的 release 不需要请求，只传递域名），并释放域名的并发
+
+        :param domain: 已获取域名并发时传入
+        :return:
+        """
+        if domain is not None:
+            self.release_domain(domain)
+
+        self.change(-1)
+
+    def acquire(self, domain: str, delay: float, concurrency: int) -> float:
+        """
+        获取域名的请求许可：间隔、并发对所有进程生效
+
+        :param domain: 域名
+        :param delay: 请求间隔
+        :param concurrency: 最大并发，0 为不限制
+        :return: 获取成功为 0，否则为还需等待的时间
+        """
+        with self.mutex:
+            now = time.time()
+            if concurrency and self.running.get(domain, 0) >= concurrency:
+                return self.CONCURRENCY_WAIT
+
+            next_time = self.next_time.get(domain, 0)
+            if next_time > now:
+                return next_time - now
+
+            self.next_time[domain] = now + delay
+            self.running[domain] = self.running.get(domain, 0) + 1
+
+        return 0
+
+    def release_domain(self, domain: str) -> None:
+        """
+        释放域名的并发
+
+        :param domain:
+        :return:
+        """
+        with self.mutex:
+            self.running[domain] -= 1
+            if self.running[domain] <= 0:
+                del self.running[domain]
+
+    def put_delay(self, obj, delay: float = 0) -> None:
+        """
+        放入延迟队列
+
+        :param obj:
+        :param delay:
+        :return:
+        """
+        self.queue_delay.put(obj, delay=delay)
+
+    def move_delay(self, count: int) -> int:
+        """
+        将到期的任务放入请求队列
+
+        :param count:
+        :return:
+        """
+        return self.queue_delay.move(self, count)
+
+    def wait_delay(self, timeout) -> None:
+        """
+        等待下一个任务到期
+
+        :param timeout:
+        :return:
+        """
+        self.queue_delay.wait(timeout)
+
+    def delay_empty(self) -> bool:
+        """
+        延迟队列是否为空
+
+        :return:
+        """
+        return self.queue_delay.empty()
+
+    def delay_qsize(self) -> int:
+        """
+        延迟队列的大小
+
+        :return:
+        """
+        return self.queue_delay.qsize()
+
+    def distribute_done(self) -> None:
+        """
+        起始请求分发完毕
+
+        :return:
+        """
+        self.distributing = False
+        self.change(0)
+
+    def stop(self) -> None:
+        """
+        主进程已经停止，工作进程也随之停止
+
+        :return:
+        """
+        self.stopped = True
+        self.change(0)
+
+    def all_task_done(self) -> bool:
+        """
+        是否所有任务都已处理完毕：起始请求分发完毕、延迟队列为空、没有未处理完毕的任务
+
+        :return:
+        """
+        if self.stopped:
+            return True
+        if self.distributing:
+            return False
+
+        version = self.version
+        if self.outstanding > 0 or not self.queue_delay.empty():
+            return False
+
+        # 判断期间有任务放入延迟队列后处理完毕，需要重新判断
+        return self.version == version and self.outstanding <= 0
+
+    def add_record(self, record: dict) -> None:
+        """
+        记录工作进程的 spider_record
+
+        :param record:
+        :return:
+        """
+        self.records.append(record)
+
+    def get_records(self) -> list:
+        """
+        获取所有工作进程的 spider_record
+
+        :return:
+        """
+        return self.records
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.queue.empty()
+
+    def qsize(self):
+        """
+        返回队列大小
+
+        :return:
+        """
+        return self.queue.qsize()
+
+
+class SharedRequestSequence(Sequence):
+    """
+        工作进程中的请求队列（转发给 SharedSequence 的代理）
+    """
+
+    def __init__(self, q):
+        """
+
+        :param q: SharedSequence 的代理
+        """
+        self.queue = q
+        self.mutex = threading.Lock()
+        self.handed = {}  # 已获取域名并发的请求对应的域名 {id(request): domain}
+
+    def put(self, obj, block=True, timeout=None):
+        """
+        添加任务
+
+        :param obj:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        self.queue.put(obj, block=block, timeout=timeout)
+
+    def put_many(self, objs, block=True, timeout=None):
+        """
+        批量添加任务
+
+        :param objs:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        self.queue.put_many(objs, block=block, timeout=timeout)
+
+    def get(self, block=True, timeout=None):
+        """
+        获取任务
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+        return self.queue.get(block=block, timeout=timeout)
+
+    def get_many(self, count, block=True, timeout=None):
+        """
+        批量获取任务
+
+        :param count:
+        :param block:
+        :param timeout:
+        :return:
+        """
+        return self.queue.get_many(count, block=block, timeout=timeout)
+
+    def acquire(self, obj, domain: str, delay: float, concurrency: int) -> float:
+        """
+        获取域名的请求许可（所有进程共享），获取成功时记录，处理完毕时释放
+
+        :param obj: 请求
+        :param domain: 域名
+        :param delay: 请求间隔
+        :param concurrency: 最大并发，0 为不限制
+        :return: 获取成功为 0，否则为还需等待的时间
+        """
+        wait = self.queue.acquire(domain, delay, concurrency)
+        if wait <= 0:
+            with self.mutex:
+                self.handed[id(obj)] = domain
+
+        return wait
+
+    def release_slot(self, obj) -> None:
+        """
+        提前释放请求占用的域名并发
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            domain = self.handed.pop(id(obj), None)
+
+        if domain is not None:
+            self.queue.release_domain(domain)
+
+    def release(self, obj):
+        """
+        任务处理完毕：只传递域名（释放并发），不传递请求
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            domain = self.handed.pop(id(obj), None)
+
+        self.queue.task_done(domain)
+
+    def empty(self):
+        """
+        判断队列是否为空
+
+        :return:
+        """
+        return self.queue.empty()
+
+    def qsize(self):
+        """
+        返回队列大小
+
+        :return:
+        """
+        return self.queue.qsize()
+
+
+class SharedDelaySequence(Sequence):
+    """
+        工作进程中的延迟队列（转发给 SharedSequence 的代理）
+    """
+
+    def __init__(self, q):
+        """
+
+        :param q: SharedSequence 的代理
+        """
+        self.queue = q
+
+    def put(self, obj, delay: float = 0, **kwargs):
+        """
+        添加任务
+
+        :param obj:
+        :param delay: 延迟时间（秒）
+        :return:
+        """
+        self.queue.put_delay(obj, delay)
+
+    def get(self, block=False, timeout=None):
+        """
+        延迟队列的任务由 move 放入请求队列，不单独获取
+
+        :param block:
+        :param timeout:
+        :return:
+        """
+
+    def move(self, q, count) -> int:
+        """
+        将到期的任务放入请求队列（在协调进程中完成）
+
+        :param q: 请求队列（忽略，放入的是共享的请求队列）
+        :param count: 最大数量
+        :return: 放入的数量
+        """
+        return self.queue.move_delay(count)
+
+    def wait(self, timeout) -> None:
+        """
+        等待下一个任务到期
+
+        :param timeout:
+        :return:
+        """
+        self.queue.wait_delay(timeout)
+
+    def empty(self):
+        """
+        判断队列是否为空（包括未到期的）
+
+        :return:
+        """
+        return self.queue.delay_empty()
+
+    def qsize(self):
+        """
+        返回队列大小（包括未到期的）
+
+        :return:
+        """
+        return self.queue.delay_qsize()
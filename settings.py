@@ -8,6 +8,9 @@ from pathlib import Path
 BASE_PATH = Path(__file__).absolute().parent
 SPIDER_TYPE = 1  # 爬虫的类型（1 airspider 2 分布式 spider）（非用户设置）
 SPIDER_STOP_ON_ERROR = True  # spider 在报错时停止（spider、pipeline、middleware）
+SPIDER_CHECKPOINT_PATH = None  # 本地爬虫的检查点目录，设置后定期保存未处理完毕的请求、过滤器、爬取记录，可以 resume=True 恢复
+SPIDER_CHECKPOINT_INTERVAL = 60  # 检查点保存间隔（秒）
+SPIDER_PROCESSES = 1  # 本地爬虫的进程数量，大于 1 时由协调进程持有请求队列、过滤器，多个进程共同处理（不需要 redis）
 
 '''MYSQL'''
 MYSQL_HOST = None
@@ -53,6 +56,7 @@ REDIS_KEY_STOP = '{redis_key}:stop'  # 停止所有机器运行（分布式时
 REDIS_KEY_QUEUE_REQUEST = '{redis_key}:request'  # request 队列（list、zset）
 REDIS_KEY_QUEUE_REQUEST_BORROW = '{redis_key}:requestBorrow'  # list request 传递参数队列（开启 REQUEST_BORROW）
 REDIS_KEY_QUEUE_BAD_REQUEST = '{redis_key}:requestFailed'  # request 失败队列（set）
+REDIS_KEY_QUEUE_DELAY = '{redis_key}:delay'  # request 延迟队列（zset，分数为到期时间）
 REDIS_KEY_QUEUE_FILTER_REQUEST = '{redis_key}:filter:request'  # request 过滤队列（set、bloom）
 REDIS_KEY_QUEUE_ITEM = '{redis_key}:item'  # item 队列（list）
 REDIS_KEY_QUEUE_BAD_ITEM = '{redis_key}:itemFailed'  # item 失败队列（set）
@@ -60,16 +64,22 @@ REDIS_KEY_QUEUE_FILTER_ITEM = '{redis_key}:filter:item'  # item 过滤队列（s
 REDIS_KEY_HEARTBEAT = '{redis_key}:heartbeat'  # 机器的心跳（hash）
 REDIS_KEY_HEARTBEAT_FAILED = '{redis_key}:heartbeat_failed'  # 校验失败的机器（set）
 REDIS_KEY_RECORD = '{redis_key}:record'  # 记录请求 key (hash)
+REDIS_KEY_RATE_LIMIT = '{redis_key}:rateLimit'  # 域名限速令牌桶（hash，后接 :域名）
 
 '''请求相关'''
 REQUEST_BORROW = False  # 分发大量任务时，需要在请求中传递的参数（默认回收 cookie 复用）
 REQUEST_BORROW_DELETE_WHEN_START = True  # 启动时删除所有 BORROW（非分布式是在内存里，该选项忽略）
 REQUEST_THREADS = 16  # 线程数量
+REQUEST_ASYNC = False  # 启用 asyncio 引擎（单线程事件循环内并发请求，此时 REQUEST_THREADS 无效）
+REQUEST_ASYNC_CONCURRENCY = 1000  # asyncio 引擎的最大并发请求数
+CALLBACK_PROCESSES = 0  # 回调进程池的进程数量（只执行 ProcessCallbackDecorator 标记的回调），0 为 CPU 核数
 REQUEST_FAILED_SAVE = False  # 分布式时保存失败的请求（重试之后仍然失败的）
 REQUEST_RETRY_FAILED = False  # 分布式时启动重试失败请求
 PERSISTENCE_REQUEST_FILTER = False  # 是否持久化请求过滤（分布式时才有效，否则每次结束都会清除）
-REQUEST_DELAY = 0  # 请求间隔，可以是 [0, 3] 代表 0-3s
+REQUEST_DELAY = 0  # 同一域名的请求间隔，可以是 [0, 3] 代表 0-3s
 REQUEST_RETRY_TIMES = 3  # 请求失败重试次数
+REQUEST_RETRY_BACKOFF = 0  # 退避重试的基础等待时间（秒）：失败的请求放入延迟队列，第 n 次重试前等待 基础时间 * 2^(n-1)（带随机抖动），不占用线程；0 为在当前线程立即重试
+REQUEST_RETRY_BACKOFF_MAX = 60  # 退避重试的最大等待时间（秒）
 REQUEST_TIMEOUT = 10  # 请求超时时间，也可以是元组 (connect timeout, read timeout)
 RANDOM_USERAGENT = False  # 随机请求头（默认是 computer，指定则开启下面的选项）
 RANDOM_USERAGENT_TYPE = 'computer'  # UA 类型：电脑（computer 代表电脑内随便选，后面代表指定浏览器 chrome、opera、firefox、ie、safari）手机：mobile
@@ -79,14 +89,32 @@ RESPONSE_DOWNLOADER = 'palp.network.downloader_requests.ResponseDownloaderByRequ
 RESPONSE_DOWNLOADER_PARSER = 'palp.network.response_requests.RequestsResponse'  # 解析器，这里默认是 requests
 # RESPONSE_DOWNLOADER = 'palp.network.downloader_httpx.ResponseDownloaderByHttpx'  # 请求器，这里是 httpx
 # RESPONSE_DOWNLOADER_PARSER = 'palp.network.response_httpx.HttpxResponse'  # 解析器，这里是 httpx
+# RESPONSE_DOWNLOADER = 'palp.network.downloader_httpx_async.ResponseDownloaderByHttpxAsync'  # 异步请求器，启用 REQUEST_ASYNC 时使用
+# RESPONSE_DOWNLOADER_PARSER = 'palp.network.response_httpx.HttpxResponse'  # 解析器，这里是 httpx
+REQUEST_CODEC = 'palp.network.request_codec.JsonRequestCodec'  # 请求编码器（redis 队列、失败请求使用），解码时自动识别格式
+# REQUEST_CODEC = 'palp.network.request_codec.MsgpackRequestCodec'  # msgpack 二进制编码，体积更小、速度更快（需要安装 msgpack）
+
 
+'''调度器'''
+REQUEST_SCHEDULER = 'palp.scheduler.scheduler_domain.DomainScheduler'  # 请求调度器（位于队列与 controller 之间，按域名控制请求间隔、并发）
+REQUEST_DOMAIN_CONCURRENCY = 0  # 单个域名的最大并发请求数，0 为不限制
+REQUEST_DOMAIN_SETTINGS = {}  # 单独指定域名的请求间隔、并发、限速，如：{'www.baidu.com': {'delay': 1, 'concurrency': 2, 'rate': 5, 'burst': 5, 'weight': 2}}，weight 为公平轮询队列中每轮连续获取的数量
+REQUEST_SCHEDULER_PARKED = 1000  # 调度器本地暂存的未就绪请求的最大数量
+REQUEST_PREFETCH = 10  # 调度器每次从请求队列批量获取的请求数量（redis 队列一次网络往返），1 为不批量
+REQUEST_PREFETCH_UNRELIABLE = False  # 分布式且不是可靠队列时依然预取、暂存（机器异常关闭时丢失已取出的请求），否则预取 1 个、最多暂存 REQUEST_THREADS 个
+REQUEST_RATE_LIMIT = 0  # 分布式时所有机器共享的单个域名每秒请求数（redis 令牌桶），0 为不限制，单独指定：REQUEST_DOMAIN_SETTINGS 的 rate
+REQUEST_RATE_LIMIT_BURST = 1  # 令牌桶容量，即允许的突发请求数，单独指定：REQUEST_DOMAIN_SETTINGS 的 burst
 
 '''PIPELINE'''
 ITEM_THREADS = 5  # item 处理的线程数量，默认 5
 ITEM_FAILED_SAVE = False  # 分布式时保存失败的请求（重试之后仍然失败的）
 ITEM_RETRY_FAILED = False  # 分布式时启动重试失败请求
 PIPELINE_ITEM_BUFFER = 0  # 缓存数量，只有当 item 达到一定数量才会入库，0 为不进行缓存
+PIPELINE_ITEM_BUFFER_BYTES = 0  # 缓存的最大字节数（item 转为 json 后的长度），达到即入库，0 为不限制
+PIPELINE_ITEM_LINGER_MS = 0  # 缓存的最长存储时间（毫秒），第一个 item 进入缓存后超过该时间即入库，0 为不限制
 PIPELINE_RETRY_TIMES = 3  # 入库失败重试次数
+PIPELINE_WRITER_THREADS = 0  # 每个管道的入库线程数量，大于 0 时每个管道有独立的队列、线程、重试（一个管道慢或失败不影响其它管道），0 为在 item 线程中依次入库
+PIPELINE_WRITER_QUEUE = 100  # 每个管道入库队列的最大批次数量，队列满时 item 线程等待
 
 # 下载中间件：请求前的处理
 PIPELINE = {
@@ -136,12 +164,17 @@ PALP_SPIDER_MIDDLEWARE = {
 }
 
 '''过滤器'''
-BLOOMFILTER_BIT = 6
-BLOOMFILTER_HASH_NUMBER = 30
-STRICT_FILTER = False  # 严格去重（加锁，会严重影响抓取效率）
+BLOOMFILTER_CAPACITY = 10000000  # redis 布隆过滤器预计存放的数量（满了会自动增加一层，容量翻倍）
+BLOOMFILTER_ERROR_RATE = 0.0001  # redis 布隆过滤器的误判率
+BLOOMFILTER_SHARDS = 16  # redis 布隆过滤器拆分的 key 数量（集群时分散到不同节点，单个 key 最大 512M）
+BLOOMFILTER_BIT = None  # 已废弃：旧版 redis 布隆过滤器（单个 key）的位数，只用于读取持久化的旧版过滤器（默认 6）
+BLOOMFILTER_HASH_NUMBER = None  # 已废弃：旧版 redis 布隆过滤器的哈希数量，只用于读取持久化的旧版过滤器（默认 30）
+STRICT_FILTER = False  # 严格去重（加锁，会严重影响抓取效率；redis 布隆过滤器本身是原子的，不受影响）
 FILTER_ITEM = False  # item 去重
 FILTER_REQUEST = False  # 请求去重
-FILTERING_MODE = 2  # 去重方式：1 为 set 集合，2 为 bloom 过滤（默认）
+FILTER_REQUEST_ON_PUT = False  # 请求入队时去重（重复的请求不会进入队列），否则出队时去重
+FILTER_REQUEST_BATCH = 1000  # 入队时去重，start_requests 批量去重的数量
+FILTERING_MODE = 2  # 去重方式：1 为 set 集合，2 为 bloom 过滤（默认），3 为 redis 原生 bloom 过滤（需要 RedisBloom 模块，不支持时使用 2，本地同 2）
 PERSISTENCE_ITEM_FILTER = False  # 是否持久化 item 过滤（分布式时才有效，否则每次结束都会清除）
 
 # item 过滤中间件（1、本地，2、云端分布式）
@@ -149,10 +182,12 @@ ITEM_FILTER_PIPELINE = {
     1: {
         1: 'palp.pipeline.pipeline_filter.SetFilterPipeline',  # 本地：set 过滤
         2: 'palp.pipeline.pipeline_filter.BloomFilterPipeline',  # 本地：布隆过滤
+        3: 'palp.pipeline.pipeline_filter.BloomFilterPipeline',  # 本地：布隆过滤
     },
     2: {
         1: 'palp.pipeline.pipeline_filter.RedisSetFilterPipeline',  # redis：set 过滤
-        2: 'palp.pipeline.pipeline_filter.RedisBloomFilterPipeline'  # redis：布隆过滤
+        2: 'palp.pipeline.pipeline_filter.RedisBloomFilterPipeline',  # redis：布隆过滤
+        3: 'palp.pipeline.pipeline_filter.RedisNativeBloomFilterPipeline'  # redis：原生布隆过滤（RedisBloom 模块）
     }
 }
 
@@ -161,29 +196,57 @@ REQUEST_FILTER_MIDDLEWARE = {
     1: {
         1: 'palp.middleware.middleware_request_filter.SetFilterMiddleware',  # 本地：set 过滤
         2: 'palp.middleware.middleware_request_filter.BloomFilterMiddleware',  # 本地：布隆过滤
+        3: 'palp.middleware.middleware_request_filter.BloomFilterMiddleware',  # 本地：布隆过滤
     },
     2: {
         1: 'palp.middleware.middleware_request_filter.RedisSetFilterMiddleware',  # redis：set 过滤
-        2: 'palp.middleware.middleware_request_filter.RedisBloomFilterMiddleware'  # redis：布隆过滤
+        2: 'palp.middleware.middleware_request_filter.RedisBloomFilterMiddleware',  # redis：布隆过滤
+        3: 'palp.middleware.middleware_request_filter.RedisNativeBloomFilterMiddleware'  # redis：原生布隆过滤（RedisBloom 模块）
     }
 }
 
 '''队列'''
-REQUEST_QUEUE_MODE = 3  # 1 为先进先出队列，2 为后进先出队列，3 为优先级队列
+REQUEST_QUEUE_MODE = 3  # 1 为先进先出队列，2 为后进先出队列，3 为优先级队列，4 为 redis stream 队列（分布式时，本地同先进先出队列），5 为按域名公平轮询的队列（域名内按优先级），6 为分桶的优先级队列（同一优先级先进先出）
 ITEM_QUEUE_MODE = 1  # 1 为先进先出队列，2 为后进先出队列（未使用）
 DEFAULT_QUEUE_PRIORITY = 300  # 默认的优先级队列的优先级
+REQUEST_QUEUE_RELIABLE = False  # 分布式时使用可靠的请求队列：取出的请求处理完毕才确认，机器异常关闭后由其它机器放回队列（请求队列 5、6 不支持）
+REQUEST_QUEUE_LEASE = 20  # 可靠队列（stream 队列）的租约时间（秒），机器超过该时间没有心跳，其处理中的请求会被放回队列
+REQUEST_QUEUE_SPILL = False  # 本地时请求队列超过内存上限后溢出到磁盘（sqlite），避免大规模爬取时内存不断增长
+REQUEST_QUEUE_MEMORY_MAX = 100000  # 溢出时内存中最多保存的请求数量
+REQUEST_QUEUE_MEMORY_BYTES = 0  # 溢出时内存中最多保存的请求大小（字节，按编码后的大小计算），0 为不限制
+REQUEST_QUEUE_SPILL_PATH = None  # 溢出文件所在的目录，None 为系统临时目录
+REQUEST_QUEUE_HIGH_WATER = 0  # 请求队列的高水位：队列数量达到后暂停放入请求（start_requests、回调），0 为不限制
+REQUEST_QUEUE_LOW_WATER = 0  # 请求队列的低水位：暂停后队列数量降到该值以下再继续，0 为高水位的一半
 REQUEST_QUEUE = {
     1: {
         1: 'palp.sequence.sequence_memory.FIFOMemorySequence',  # 本地：先进先出队列
         2: 'palp.sequence.sequence_memory.LIFOMemorySequence',  # 本地：后进先出队列
-        3: 'palp.sequence.sequence_memory.PriorityMemorySequence',  # 本地：优先级队列（通过 request 的 level 指定 越小越高）
+        3: 'palp.sequence.sequence_memory.BucketPriorityMemorySequence',  # 本地：优先级队列（通过 request 的 level 指定 越小越高）
+        4: 'palp.sequence.sequence_memory.FIFOMemorySequence',  # 本地：先进先出队列（stream 只在分布式时有意义）
+        5: 'palp.sequence.sequence_memory.FairMemorySequence',  # 本地：按域名公平轮询的队列（REQUEST_DOMAIN_SETTINGS 的 weight 为权重）
+        6: 'palp.sequence.sequence_memory.BucketPriorityMemorySequence',  # 本地：分桶的优先级队列
     },
     2: {
         1: 'palp.sequence.sequence_redis_request.FIFORequestRedisSequence',  # redis：先进先出队列
         2: 'palp.sequence.sequence_redis_request.LIFORequestRedisSequence',  # redis：后进先出队列
         3: 'palp.sequence.sequence_redis_request.PriorityRequestRedisSequence',  # redis：优先级队列（通过 request 的 level 指定）
+        4: 'palp.sequence.sequence_redis_stream.FIFORequestStreamRedisSequence',  # redis：stream 队列（消费组、批量读取、自动认领超时请求，需要 redis 6.2+）
+        5: 'palp.sequence.sequence_redis_request.FairRequestRedisSequence',  # redis：按域名公平轮询的队列（不支持可靠队列）
+        6: 'palp.sequence.sequence_redis_request.BucketPriorityRequestRedisSequence',  # redis：分桶的优先级队列（每个优先级一个列表，相同的请求不会合并，不支持可靠队列）
     }
 }
+REQUEST_QUEUE_SPILL_MAPPING = {
+    1: 'palp.sequence.sequence_disk.FIFODiskSequence',  # 本地溢出到磁盘：先进先出队列
+    2: 'palp.sequence.sequence_disk.LIFODiskSequence',  # 本地溢出到磁盘：后进先出队列
+    3: 'palp.sequence.sequence_disk.PriorityDiskSequence',  # 本地溢出到磁盘：优先级队列
+    4: 'palp.sequence.sequence_disk.FIFODiskSequence',  # 本地溢出到磁盘：先进先出队列
+    5: 'palp.sequence.sequence_memory.FairMemorySequence',  # 按域名公平轮询的队列（不溢出到磁盘）
+    6: 'palp.sequence.sequence_disk.PriorityDiskSequence',  # 本地溢出到磁盘：优先级队列（本身就是分桶的）
+}
+REQUEST_DELAY_QUEUE = {
+    1: 'palp.sequence.sequence_delay.DelayMemorySequence',  # 本地：延迟队列（小顶堆）
+    2: 'palp.sequence.sequence_delay.DelayRedisSequence',  # redis：延迟队列（zset）
+}
 ITEM_QUEUE = {
     1: {
         1: 'palp.sequence.sequence_memory.FIFOMemorySequence',  # 本地：先进先出队列
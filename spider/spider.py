@@ -6,7 +6,6 @@
     修改操作：类本身赋值后，是基于类本身修改，类本身未赋值，那么就会向父类进行查找，修改的就是父类
 """
 import sys
-import time
 import uuid
 import types
 import inspect
@@ -21,8 +20,13 @@ from palp.network.request import Request
 from palp.network.response import Response
 from palp.controller.controller_item import ItemController
 from palp.sequence.sequence import Sequence
+from palp.sequence.sequence_memory import FIFOMemorySequence
+from palp.tool.delay_mover import DelayMover
+from palp.tool.backpressure import Backpressure
+from palp.tool.callback_pool import CallbackPool
 from palp.tool.short_module import sort_module, import_module
 from palp.controller.controller_spider import SpiderController
+from palp.controller.controller_spider_async import AsyncSpiderController
 from palp.decorator.decorator_run_func_by_thread import RunByThreadDecorator
 
 
@@ -114,6 +118,11 @@ class SpiderBase(threading.Thread):
         if settings.EMAIL_USER and settings.EMAIL_PWD:
             EmailSender(user=settings.EMAIL_USER, pwd=settings.EMAIL_PWD).check_availability()
 
+        # 已废弃的设置
+        for key in ['BLOOMFILTER_BIT', 'BLOOMFILTER_HASH_NUMBER']:
+            if getattr(settings, key, None) is not None:
+                logger.warning(f"{key} 已废弃，只用于读取旧版的 redis 布隆过滤器，请使用 BLOOMFILTER_CAPACITY、BLOOMFILTER_ERROR_RATE")
+
     def __init__(self, thread_count: int = None, request_filter: bool = False, item_filter: bool = False):
         super().__init__()
         # 加载快捷的设置
@@ -126,12 +135,16 @@ class SpiderBase(threading.Thread):
 
         self.queue: Sequence = None  # 请求队列
         self.queue_item: Sequence = None  # item 队列
+        self.queue_delay: Sequence = None  # 延迟队列（退避重试、定时重新抓取）
+        self.delay_mover = None  # 延迟队列的搬运线程
         self.spider_done = False  # 爬虫是否运行结束
         self.item_controller_list = []  # 存储所有的解析器
         self.spider_controller_list = []  # 存储所有的解析器
         self.distribute_thread_list = []  # 存储所有任务分发线程
 
         self.spider_record = {'all': 0, 'failed': 0, 'succeed': 0}  # 爬取情况记录
+        self.backpressure = Backpressure(spider=self)  # 请求队列的背压
+        self.callback_pool = CallbackPool(spider=self)  # 回调进程池
         self.spider_uuid = uuid.uuid1().hex  # uuid 用作线上区分
 
     def start_requests(self) -> None:
@@ -148,39 +161,52 @@ class SpiderBase(threading.Thread):
         @result:
         """
 
-    def wait_distribute_thread_done(self) -> None:
+    def notify_state(self) -> None:
         """
-        等待所有任务分发线程执行结束
+        状态发生变化（分发线程结束、spider_controller 开始等待或结束），通知等待中的 spider
 
         :return:
         """
-        while True:
-            for distribute_thread in self.distribute_thread_list.copy():
-                if not distribute_thread.is_alive():
-                    self.distribute_thread_list.remove(distribute_thread)
+        if self.queue is not None:
+            self.queue.notify()
 
-            # 任务分发完毕或者处理线程都死掉就退出
-            if len(self.distribute_thread_list) == 0 or self.all_spider_controller_is_done():
-                break
+    def wait_distribute_thread_done(self) -> None:
+        """
+        等待所有任务分发线程执行结束（由分发线程结束时通知）
 
-            time.sleep(0.1)
+        :return:
+        """
+        # 任务分发完毕或者处理线程都死掉就退出
+        while not self.queue.wait(
+                lambda: self.all_distribute_thread_is_done() or self.all_spider_controller_is_done(), timeout=1
+        ):
+            pass
 
     def wait_spider_controller_done(self) -> None:
         """
         等待线程执行结束
 
+        本地时没有未处理完毕的任务（任务处理完毕时通知）即结束，不需要等待 spider_controller 获取超时
+        分发时通过 spider_controller 的等待状态判断（开始等待时通知）
+
         :return:
         """
         while True:
             if self.all_spider_controller_is_done():
                 logger.warning("所有线程都已挂掉，即将停止")
                 break
-            elif self.all_spider_controller_is_waiting():
+            elif self.all_task_done():
                 logger.debug("所有线程都已挂起，即将停止")
                 self.stop_all_spider_controller()
                 break
 
-            time.sleep(0.1)  # 不加延迟将会导致性能问题
+            self.queue.wait(lambda: self.all_task_done() or self.all_spider_controller_is_done(), timeout=1)
+
+        self.callback_pool.close()
+
+        # 停止延迟队列的搬运线程
+        if self.delay_mover is not None:
+            self.delay_mover.close()
 
     def wait_item_controller_done(self) -> None:
         """
@@ -188,12 +214,16 @@ class SpiderBase(threading.Thread):
 
         :return:
         """
-        while True:
-            if self.all_item_controller_done():
-                logger.debug("所有 item 都已处理完毕，即将停止")
-                break
+        # 本地 item 队列：每个 item controller 放入一个 None，唤醒阻塞中的获取
+        if isinstance(self.queue_item, FIFOMemorySequence):
+            self.queue_item.put_many([None] * len(self.item_controller_list))
+
+        for item_controller in self.item_controller_list:
+            item_controller.join()
+
+        ItemController.close_pipeline_controller()
 
-            time.sleep(0.1)
+        logger.debug("所有 item 都已处理完毕，即将停止")
 
     def stop_all_spider_controller(self) -> None:
         """
@@ -204,11 +234,13 @@ class SpiderBase(threading.Thread):
         for p in self.spider_controller_list:
             p.stop = True
 
-        while True:
-            if self.all_spider_controller_is_done():
-                break
+        # 唤醒阻塞在获取任务的 spider_controller
+        self.queue.close()
+
+        for p in self.spider_controller_list:
+            p.join()
 
-            time.sleep(0.1)
+        self.all_spider_controller_is_done()
 
     def all_item_controller_done(self) -> bool:
         """
@@ -233,13 +265,37 @@ class SpiderBase(threading.Thread):
         """
         done_status = True
 
-        for p in self.distribute_thread_list:
+        for p in self.distribute_thread_list.copy():
             if p.is_alive():
                 done_status = False
                 break
 
         return done_status
 
+    def all_task_done(self) -> bool:
+        """
+        是否所有任务都已处理完毕
+
+        本地时所有的放入都经过调度器：起始请求分发完毕、延迟队列为空、调度器没有未处理完毕的任务
+        分发时其它机器也会放入任务，只能通过 spider_controller 的等待状态判断
+
+        :return:
+        """
+        if not self.queue.local:
+            return self.all_spider_controller_is_waiting()
+
+        if not self.all_distribute_thread_is_done():
+            return False
+
+        version = self.queue.version
+        if self.queue.outstanding > 0:
+            return False
+        if self.queue_delay is not None and not self.queue_delay.empty():
+            return False
+
+        # 判断期间有任务放入延迟队列后处理完毕，需要重新判断
+        return self.queue.version == version and self.queue.outstanding <= 0
+
     def all_spider_controller_is_waiting(self) -> bool:
         """
         是否所有 spider_controller 都没事干
@@ -288,6 +344,7 @@ class SpiderBase(threading.Thread):
         # 检查是否是 yield 函数，不是不报错，避免只是执行失败的
         if inspect.isgeneratorfunction(self.start_requests):
             # 检查起始函数发出请求
+            requests = []
             for request in self.start_requests():
                 if not isinstance(request, Request):
                     raise ValueError("start_requests 仅支持 yield Request")
@@ -296,23 +353,71 @@ class SpiderBase(threading.Thread):
                 if request.callback is None:
                     request.callback = self.parse
 
-                self.queue.put(request)
+                # 队列达到高水位时暂停生成器
+                self.backpressure.wait(self.queue)
+
+                # 入队时去重：攒够一批再批量去重
+                if settings.FILTER_REQUEST_ON_PUT:
+                    requests.append(request)
+                    if len(requests) >= settings.FILTER_REQUEST_BATCH:
+                        self.put_requests(requests)
+                        requests = []
+                else:
+                    self.queue.put(request)
+
+            self.put_requests(requests)
         else:
             logger.warning("start_requests 函数不是生成器函数，将不会执行该函数！")
 
+    def put_delay(self, request: Request, delay: float) -> None:
+        """
+        延迟放入队列：到期后由 DelayMover 放入请求队列（可用于定时重新抓取）
+
+        :param request:
+        :param delay: 延迟时间（秒）
+        :return:
+        """
+        self.queue_delay.put(request, delay=delay)
+
+    def put_requests(self, requests: List[Request]) -> None:
+        """
+        批量去重后放入队列
+
+        :param requests:
+        :return:
+        """
+        if not requests:
+            return
+
+        self.queue.put_many(SpiderController.filter_requests(self, requests))
+
     def start_controller(self) -> None:
         """
         启动 controller
 
         :return:
         """
-        # 启动相应数量的爬虫
-        for _ in range(settings.REQUEST_THREADS):
-            controller = SpiderController(q=self.queue, q_item=self.queue_item, spider=self)
+        # 启动回调进程池（需要在启动线程之前 fork）
+        self.callback_pool.start()
+
+        # 启动相应数量的爬虫（asyncio 引擎只需要一个事件循环线程）
+        if settings.REQUEST_ASYNC:
+            controller = AsyncSpiderController(q=self.queue, q_item=self.queue_item, spider=self)
             self.spider_controller_list.append(controller)
             controller.start()
-
-        # 启动相应数量的item
+        else:
+            for _ in range(settings.REQUEST_THREADS):
+                controller = SpiderController(q=self.queue, q_item=self.queue_item, spider=self)
+                self.spider_controller_list.append(controller)
+                controller.start()
+
+        # 启动延迟队列的搬运线程
+        if self.queue_delay is not None:
+            self.delay_mover = DelayMover(spider=self)
+            self.delay_mover.start()
+
+        # 启动相应数量的item（及每个管道的入库控制器）
+        ItemController.start_pipeline_controller(spider=self)
         for _ in range(settings.ITEM_THREADS):
             controller = ItemController(q=self.queue_item, spider=self)
             self.item_controller_list.append(controller)
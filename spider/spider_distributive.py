@@ -8,7 +8,9 @@ from palp import settings
 from quickdb import RedisLock
 from abc import abstractmethod
 from palp.spider.spider import Spider
+from palp.scheduler.scheduler import Scheduler
 from palp.tool.client_heart import ClientHeart
+from palp.filter.filter_redis_bloom import RedisBloomFilter
 from palp.tool.short_module import import_module
 from palp.network.request import LoadRequest, Request
 from palp.sequence.sequence_redis_item import FIFOItemRedisSequence
@@ -56,8 +58,9 @@ class DistributiveSpider(Spider):
         super().__init__(thread_count, request_filter, item_filter)
 
         queue_module = settings.REQUEST_QUEUE[settings.SPIDER_TYPE][settings.REQUEST_QUEUE_MODE]
-        self.queue = import_module(queue_module)[0]  # 请求队列
+        self.queue = Scheduler.from_settings(import_module(queue_module)[0])  # 请求队列（由调度器包装）
         self.queue_item = FIFOItemRedisSequence()  # item 队列
+        self.queue_delay = import_module(settings.REQUEST_DELAY_QUEUE[settings.SPIDER_TYPE])[0]  # 延迟队列
         self.queue_borrow = FIFORequestBorrowRedisSequence()  # 信息传递队列
 
     @abstractmethod
@@ -107,7 +110,7 @@ class DistributiveSpider(Spider):
                 if not request:
                     break
 
-                self.queue.put(LoadRequest.load_from_json(request[0].decode()))
+                self.queue.put(LoadRequest.loads(request[0]))
 
     @RunByThreadDecorator(daemon=True)
     def start_distribute_failed_item(self) -> None:
@@ -229,6 +232,22 @@ class DistributiveSpider(Spider):
             if recycle_data:
                 self.queue_borrow.put(recycle_data)
 
+    @staticmethod
+    def delete_filter(redis_key_filter: str) -> None:
+        """
+        删除过滤队列（包括布隆过滤器的所有分片）
+
+        :param redis_key_filter: 过滤 key
+        :return:
+        """
+        from palp.conn import redis_conn
+
+        redis_conn.delete(redis_key_filter)
+
+        # 分片在集群时不在同一个 slot，逐个删除
+        for key in redis_conn.keys(RedisBloomFilter.keys_pattern(redis_key_filter)):
+            redis_conn.delete(key)
+
     @SpiderMiddlewareDecorator()
     @SpiderOnceDecorator()
     @SpiderWaitDecorator()
@@ -253,6 +272,6 @@ class DistributiveSpider(Spider):
             redis_conn.delete(settings.REDIS_KEY_MASTER, settings.REDIS_KEY_HEARTBEAT_FAILED)
             # 判断是否移除 filter
             if not settings.PERSISTENCE_REQUEST_FILTER:
-                redis_conn.delete(settings.REDIS_KEY_QUEUE_FILTER_REQUEST)
+                self.delete_filter(settings.REDIS_KEY_QUEUE_FILTER_REQUEST)
             if not settings.PERSISTENCE_ITEM_FILTER:
-                redis_conn.delete(settings.REDIS_KEY_QUEUE_FILTER_ITEM)
+                self.delete_filter(settings.REDIS_KEY_QUEUE_FILTER_ITEM)
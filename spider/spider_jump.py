@@ -15,6 +15,7 @@ from abc import abstractmethod
 from typing import Union, List, Callable
 from palp.network.request import Request
 from palp.network.response import Response
+from palp.scheduler.scheduler import Scheduler
 from palp.tool.short_module import import_module
 from palp.exception import NotGeneratorFunctionError
 from palp.controller.controller_spider_jump import JumpController
@@ -39,7 +40,7 @@ class JumpSpider:
         self.request = request
         self.request_middleware = request_middleware
         self.spider_record = {'all': 0, 'failed': 0, 'succeed': 0}
-        self.queue = import_module(settings.REQUEST_QUEUE[1][settings.REQUEST_QUEUE_MODE])[0]  # 请求队列
+        self.queue = Scheduler.from_settings(import_module(settings.REQUEST_QUEUE[1][settings.REQUEST_QUEUE_MODE])[0], local=True)  # 请求队列
 
         # 导入一下自定义设置
         for key, value in kwargs.items():
@@ -2,10 +2,16 @@
     单机 spider（不支持分布式）
 """
 from palp import settings
+from loguru import logger
 from abc import abstractmethod
 from palp.spider.spider import Spider
 from palp.network.request import Request
+from palp.scheduler.scheduler import Scheduler
+from palp.tool.checkpoint import Checkpoint
 from palp.tool.short_module import import_module
+from palp.tool.process_coordinator import ProcessCoordinator
+from palp.sequence.sequence_shared import SharedDelaySequence, SharedRequestSequence
+from palp.sequence.sequence_checkpoint import CheckpointSequence
 from palp.decorator.decorator_spider_wait import SpiderWaitDecorator
 from palp.decorator.decorator_spider_once import SpiderOnceDecorator
 from palp.decorator.decorator_spider_middleware import SpiderMiddlewareDecorator
@@ -17,12 +23,54 @@ class LocalSpider(Spider):
         单机 spider（不支持分布式）
     """
 
-    def __init__(self, thread_count: int = None, request_filter: bool = False, item_filter: bool = False):
+    def __init__(self, thread_count: int = None, request_filter: bool = False, item_filter: bool = False,
+                 resume: bool = False, processes: int = None):
+        """
+
+        :param thread_count: 线程数量
+        :param request_filter: 开启请求过滤，不然 filter_repeat 无效
+        :param item_filter: 开启 item 过滤
+        :param resume: 从检查点恢复（需要设置 SPIDER_CHECKPOINT_PATH）
+        :param processes: 进程数量（SPIDER_PROCESSES）
+        """
         super().__init__(thread_count, request_filter, item_filter)
         setattr(settings, 'SPIDER_TYPE', 1)
+        if processes:
+            setattr(settings, 'SPIDER_PROCESSES', processes)
+
+        if settings.REQUEST_QUEUE_SPILL:
+            queue_module = settings.REQUEST_QUEUE_SPILL_MAPPING[settings.REQUEST_QUEUE_MODE]
+        else:
+            queue_module = settings.REQUEST_QUEUE[settings.SPIDER_TYPE][settings.REQUEST_QUEUE_MODE]
+        delay_module = settings.REQUEST_DELAY_QUEUE[settings.SPIDER_TYPE]
+
+        # 多进程：请求队列、延迟队列、过滤器由协调进程持有
+        self.coordinator = None
+        self.queue_shared = None
+        if settings.SPIDER_PROCESSES > 1:
+            if not ProcessCoordinator.available():
+                logger.warning("当前系统不支持 fork，使用单进程运行")
+            else:
+                if settings.SPIDER_CHECKPOINT_PATH:
+                    logger.warning("多进程时不支持检查点，忽略 SPIDER_CHECKPOINT_PATH")
+                self.coordinator = ProcessCoordinator(spider=self, queue_module=queue_module, delay_module=delay_module)
+                self.queue_shared = self.coordinator.queue
 
-        queue_module = settings.REQUEST_QUEUE[settings.SPIDER_TYPE][settings.REQUEST_QUEUE_MODE]
-        self.queue = import_module(queue_module)[0]  # 请求队列
+        # 检查点：记录放入队列的请求
+        self.resume = resume
+        self.checkpoint = None
+        self.queue_checkpoint = None
+        if self.queue_shared is not None:
+            self.queue = Scheduler.from_settings(SharedRequestSequence(self.queue_shared), local=False)  # 请求队列（共享队列的代理）
+            self.queue_delay = SharedDelaySequence(self.queue_shared)  # 延迟队列
+        else:
+            queue = import_module(queue_module)[0]
+            if settings.SPIDER_CHECKPOINT_PATH:
+                self.checkpoint = Checkpoint(spider=self)
+                self.queue_checkpoint = queue = CheckpointSequence(queue, self.checkpoint)
+
+            self.queue = Scheduler.from_settings(queue)  # 请求队列（由调度器包装）
+            self.queue_delay = import_module(delay_module)[0]  # 延迟队列
         self.queue_item = FIFOMemorySequence()  # item 队列
         self.queue_borrow = FIFOMemorySequence()  # 信息传递队列
 
@@ -71,6 +119,75 @@ class LocalSpider(Spider):
     @SpiderOnceDecorator()
     @SpiderWaitDecorator()
     def run(self) -> None:
+        # 多进程：在启动线程之前 fork 工作进程
+        if self.coordinator:
+            self.coordinator.start()
+
         self.start_controller()  # 任务处理
-        self.start_distribute()  # 分发任务
-        self.wait_distribute_thread_done()  # 等待任务分发完毕
+
+        if self.checkpoint:
+            # 恢复检查点，起始请求已经分发完毕则不再分发
+            if self.resume and self.checkpoint.restore(self.queue):
+                self.checkpoint.start()
+                return
+
+            if not self.resume:
+                self.checkpoint.clear()
+            self.checkpoint.start()
+
+        try:
+            self.start_distribute()  # 分发任务
+            self.wait_distribute_thread_done()  # 等待任务分发完毕
+        finally:
+            if self.queue_shared is not None:
+                self.queue_shared.distribute_done()
+
+        if self.checkpoint:
+            self.checkpoint.distribute_done = True
+
+    def run_worker(self) -> None:
+        """
+        多进程时工作进程的入口：处理共享队列中的请求，结束后上报 spider_record
+
+        :return:
+        """
+        self.coordinator = None
+
+        self.start_controller()
+        self.wait_spider_controller_done()
+        self.wait_item_controller_done()
+
+        self.queue_shared.add_record(self.spider_record)
+
+    def all_task_done(self) -> bool:
+        """
+        是否所有任务都已处理完毕（多进程时由共享队列判断）
+
+        :return:
+        """
+        if self.queue_shared is not None:
+            return self.queue_shared.all_task_done()
+
+        return super().all_task_done()
+
+    def wait_spider_controller_done(self) -> None:
+        """
+        等待线程执行结束（多进程时主进程还要等待工作进程结束）
+
+        :return:
+        """
+        super().wait_spider_controller_done()
+
+        if self.coordinator:
+            self.coordinator.join()
+
+    def wait_item_controller_done(self) -> None:
+        """
+        等待 item buffer 结束（多进程时主进程最后关闭协调进程）
+
+        :return:
+        """
+        super().wait_item_controller_done()
+
+        if self.coordinator:
+            self.coordinator.close()
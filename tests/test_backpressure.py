@@ -0,0 +1,63 @@
+"""
+    背压与域名并发同时开启时，回调中暂停的 controller 不能占用域名并发，否则爬虫无法结束
+"""
+import threading
+import http.server
+import socketserver
+import pytest
+import palp
+from palp import settings
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def port():
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    saved = dict(vars(settings))
+    yield
+    vars(settings).update(saved)
+
+
+def test_backpressure_with_domain_concurrency(port):
+    pages = []
+
+    class Spider(palp.LocalSpider):
+        spider_settings = dict(REQUEST_THREADS=4, REQUEST_QUEUE_HIGH_WATER=4, REQUEST_DOMAIN_CONCURRENCY=1)
+
+        def start_requests(self):
+            yield palp.RequestGet(f'http://127.0.0.1:{port}/0')
+
+        def parse(self, request, response):
+            pages.append(request.url)
+            if request.url.endswith('/0'):
+                for i in range(1, 200):
+                    yield palp.RequestGet(f'/{i}', callback=self.parse)
+
+    spider = Spider()
+    spider.start()
+    spider.join(timeout=60)
+
+    assert not spider.is_alive(), '爬虫没有结束'
+    assert len(pages) == 200
@@ -0,0 +1,100 @@
+"""
+    redis 原生布隆过滤器（FILTERING_MODE 3）
+
+    需要本地的 redis-server（PALP_TEST_REDIS，默认 redis://127.0.0.1:6379/15），连接不上时跳过
+    加载了 RedisBloom 模块时测试 BF.* 的去重，否则测试回退到 lua 实现的去重
+"""
+import os
+import pytest
+import redis
+import palp
+from palp import conn
+from palp import settings
+from palp.filter.filter_redis_bloom_native import RedisNativeBloomFilter
+
+REDIS_URL = os.environ.get('PALP_TEST_REDIS', 'redis://127.0.0.1:6379/15')
+PREFIX = 'palp_test_bloom'
+
+
+class FakeConn:
+    def __init__(self, error):
+        self.error = error
+
+    def execute_command(self, *args):
+        raise self.error
+
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    client = redis.Redis.from_url(REDIS_URL)
+    try:
+        client.ping()
+    except redis.exceptions.RedisError as e:
+        pytest.skip(f'没有可用的 redis-server：{e}')
+
+    monkeypatch.setattr(conn, 'redis_conn', client)
+    monkeypatch.setattr(settings, 'REDIS_KEY_LOCK', f'{PREFIX}:lock')
+    monkeypatch.setattr(settings, 'REDIS_KEY_QUEUE_FILTER_REQUEST', f'{PREFIX}:filter:request')
+    monkeypatch.setattr(settings, 'REDIS_KEY_QUEUE_FILTER_ITEM', f'{PREFIX}:filter:item')
+    monkeypatch.setattr(settings, 'BLOOMFILTER_CAPACITY', 10000)
+
+    yield client
+
+    keys = list(client.scan_iter(f'*{PREFIX}*'))
+    if keys:
+        client.delete(*keys)
+
+
+def supports_bloom(client) -> bool:
+    try:
+        client.execute_command('BF.EXISTS', f'{PREFIX}:check', 'palp')
+    except redis.exceptions.ResponseError:
+        return False
+
+    return True
+
+
+def assert_dedupe(request_filter):
+    urls = [f'https://www.example.com/{i}' for i in range(100)]
+
+    assert not any(request_filter.is_repeat(palp.RequestGet(url)) for url in urls[:50])
+    assert all(request_filter.is_repeat(palp.RequestGet(url)) for url in urls[:50])
+
+    result = request_filter.is_repeat_many([palp.RequestGet(url) for url in urls[25:] + urls[-1:]])
+    assert result == [True] * 25 + [False] * 50 + [True]
+
+
+def test_native(redis_conn):
+    if not supports_bloom(redis_conn):
+        pytest.skip('redis 没有加载 RedisBloom 模块')
+
+    request_filter = RedisNativeBloomFilter()
+    assert request_filter.native
+
+    assert_dedupe(request_filter)
+    assert list(redis_conn.scan_iter(f'*{PREFIX}:filter:request*:bf'))
+
+
+def test_fallback(redis_conn):
+    if supports_bloom(redis_conn):
+        pytest.skip('redis 加载了 RedisBloom 模块')
+
+    request_filter = RedisNativeBloomFilter()
+    assert not request_filter.native
+
+    assert_dedupe(request_filter)
+    assert not list(redis_conn.scan_iter(f'*{PREFIX}:filter:request*:bf'))
+
+
+def test_fallback_only_on_unknown_command(monkeypatch):
+    monkeypatch.setattr(conn, 'redis_conn', FakeConn(redis.exceptions.ResponseError("unknown command 'BF.EXISTS'")))
+    assert RedisNativeBloomFilter.check_native() is False
+
+    for error in [
+        redis.exceptions.ConnectionError('Connection refused'),
+        redis.exceptions.AuthenticationError('invalid password'),
+        redis.exceptions.ResponseError('NOAUTH Authentication required.'),
+    ]:
+        monkeypatch.setattr(conn, 'redis_conn', FakeConn(error))
+        with pytest.raises(type(error)):
+            RedisNativeBloomFilter.check_native()
@@ -0,0 +1,91 @@
+"""
+    请求队列的背压（设置 REQUEST_QUEUE_HIGH_WATER 开启）
+
+    请求队列的数量达到高水位后暂停放入新请求（暂停 start_requests、回调的生成器），降到低水位以下再继续
+    内存、redis 的占用由队列大小决定，而不是起始请求的数量（分布式时为 redis 队列的长度）
+
+    注意：
+        回调中暂停时至少保留一个 spider controller 继续执行，避免所有线程都在等待导致队列无法消费
+        回调中暂停前先释放当前请求占用的域名并发，否则继续执行的 controller 无法分发该域名的请求，队列无法降到低水位
+        asyncio 引擎只有一个事件循环线程，回调不会暂停（起始请求依然会暂停）
+"""
+import time
+import threading
+from loguru import logger
+from palp import settings
+
+
+class Backpressure:
+    CHECK_INTERVAL = 0.1  # 检查队列大小的最小间隔（redis 队列每次检查都是一次请求）
+
+    def __init__(self, spider):
+        """
+
+        :param spider:
+        """
+        self.spider = spider
+        self.high = settings.REQUEST_QUEUE_HIGH_WATER
+        self.low = min(settings.REQUEST_QUEUE_LOW_WATER or self.high // 2, self.high)
+
+        self.mutex = threading.Lock()
+        self.paused = 0  # 回调中暂停的 spider controller 数量
+        self.check_time = 0  # 下次检查队列大小的时间
+        self.estimate = 0  # 估计的队列大小：上次检查的大小 + 之后放入的数量（只会偏大）
+
+    def stopped(self) -> bool:
+        """
+        爬虫已结束或者 spider controller 都已经停止（继续等待队列也不会减少）
+
+        :return:
+        """
+        if self.spider.spider_done:
+            return True
+
+        controllers = self.spider.spider_controller_list
+        return bool(controllers) and not any(controller.is_alive() for controller in controllers)
+
+    def wait(self, q, controller=None, request=None) -> None:
+        """
+        队列达到高水位时等待，直到降到低水位以下
+
+        :param q: 请求队列
+        :param controller: 回调中调用时传入当前的 spider controller
+        :param request: 回调中调用时传入当前处理的请求（暂停前释放其占用的域名并发）
+        :return:
+        """
+        if not self.high:
+            return
+
+        # 估计的大小没有达到高水位时，间隔 CHECK_INTERVAL 才检查一次
+        self.estimate += 1
+        if self.estimate < self.high and time.time() < self.check_time:
+            return
+
+        self.check_time = time.time() + self.CHECK_INTERVAL
+        self.estimate = q.qsize()
+        if self.estimate < self.high:
+            return
+
+        if controller is not None:
+            with self.mutex:
+                # 至少保留一个 spider controller 继续消费队列
+                if self.paused >= len(self.spider.spider_controller_list) - 1:
+                    return
+                self.paused += 1
+
+            if request is not None:
+                q.release_slot(request)
+
+        logger.debug(f"请求队列达到高水位 {self.high}，暂停放入请求")
+        try:
+            while q.qsize() > self.low and not self.stopped():
+                if controller is not None and controller.stop:
+                    break
+                time.sleep(self.CHECK_INTERVAL)
+        finally:
+            self.estimate = q.qsize()
+            if controller is not None:
+                with self.mutex:
+                    self.paused -= 1
+
+        logger.debug(f"请求队列降到低水位 {self.low}，继续放入请求")
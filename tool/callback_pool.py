@@ -0,0 +1,130 @@
+"""
+    回调进程池：在子进程中执行 ProcessCallbackDecorator 标记的回调，解析不再受 GIL 限制
+
+    子进程通过 fork 创建（启动 spider controller 之前），继承已导入的模块及 spider 的副本
+    主进程只负责下载：响应内容传递给子进程，子进程 yield 的 Request、Item 返回后再由 spider controller 放入队列
+"""
+import inspect
+import multiprocessing
+from loguru import logger
+from palp import settings
+from concurrent.futures import Future, ProcessPoolExecutor
+from palp.network.request import Request, LoadRequest
+from palp.network.response import Response
+from palp.network.response_process import ProcessResponse
+
+SPIDER = None  # 子进程中的 spider
+
+
+def init_worker(spider) -> None:
+    """
+    子进程初始化：保存 spider（fork 时直接继承，不需要 pickle）
+
+    :param spider:
+    :return:
+    """
+    global SPIDER
+    SPIDER = spider
+
+
+def run_callback(callback: str, data: bytes, response: ProcessResponse) -> list:
+    """
+    子进程中执行回调
+
+    :param callback: 回调函数名
+    :param data: 编码后的请求
+    :param response:
+    :return: yield 的任务（Request 编码后返回）
+    """
+    request = LoadRequest.loads(data)
+    func = getattr(SPIDER, callback)
+
+    tasks = []
+    if inspect.isgeneratorfunction(func):
+        for task in func(request, response):
+            tasks.append(task.dumps() if isinstance(task, Request) else task)
+    else:
+        func(request, response)
+
+    return tasks
+
+
+class CallbackPool:
+    def __init__(self, spider):
+        """
+
+        :param spider:
+        """
+        self.spider = spider
+        self.executor = None
+
+    def start(self) -> None:
+        """
+        有标记的回调时创建进程池，并立即创建所有子进程（在启动 spider controller 之前 fork）
+
+        :return:
+        """
+        callbacks = [
+            name for name, func in inspect.getmembers(self.spider.__class__, inspect.isfunction)
+            if getattr(func, 'run_by_process', False)
+        ]
+        if not callbacks:
+            return
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning(f"当前系统不支持 fork，回调依旧在线程中执行：{callbacks}")
+            return
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=settings.CALLBACK_PROCESSES or None,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=init_worker,
+            initargs=(self.spider,)
+        )
+        self.executor.submit(int).result()
+
+        logger.debug(f"回调进程池已启动：{callbacks}")
+
+    def offload(self, request: Request) -> bool:
+        """
+        请求的回调是否在进程池中执行
+
+        :param request:
+        :return:
+        """
+        if self.executor is None or not isinstance(request.callback, str):
+            return False
+
+        return getattr(getattr(self.spider, request.callback, None), 'run_by_process', False)
+
+    def submit(self, request: Request, response: Response) -> Future:
+        """
+        提交回调
+
+        :param request:
+        :param response:
+        :return: 结果为 yield 的任务（Request 编码后的），使用 loads 解码
+        """
+        return self.executor.submit(
+            run_callback, request.callback, request.dumps(), ProcessResponse.from_response(response)
+        )
+
+    @staticmethod
+    def loads(tasks: list) -> list:
+        """
+        解码子进程返回的任务
+
+        :param tasks:
+        :return:
+        """
+        return [LoadRequest.loads(task) if isinstance(task, bytes) else task for task in tasks]
+
+    def close(self) -> None:
+        """
+        关闭进程池
+
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,194 @@
+"""
+    本地爬虫的检查点（开启 SPIDER_CHECKPOINT_PATH）
+
+    每隔 SPIDER_CHECKPOINT_INTERVAL 秒保存一次，目录为 SPIDER_CHECKPOINT_PATH/爬虫名：
+        requests.sqlite3：未处理完毕的请求（增量保存：只写入新增的、删除已处理的，期间放入又处理完毕的不会写入）
+        filter.*：本地过滤器（SetFilter、BloomFilter）的状态，布隆过滤器直接保存位数组
+        record.json：spider_record 及起始请求是否分发完毕
+
+    先保存过滤器再保存请求：过滤器中没有的请求恢复后最多重复执行，不会丢失
+    恢复的请求标记 checkpoint_restored，出队去重时不会被丢弃（已经取出还未处理完毕的请求已经记录在过滤器中）
+    爬虫正常结束（没有未处理完毕的请求）时删除检查点；使用 LocalSpider(resume=True) 从检查点恢复
+
+    注意：请求使用 settings.REQUEST_CODEC 编码，item 不会保存
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from loguru import logger
+from palp import settings
+from palp.filter.filter import FilterBase
+from palp.network.request import LoadRequest
+from palp.controller.controller_item import ItemController
+from palp.controller.controller_spider import SpiderController
+
+
+class Checkpoint(threading.Thread):
+    def __init__(self, spider):
+        """
+
+        :param spider:
+        """
+        super().__init__()
+        self.spider = spider
+        self.path = Path(settings.SPIDER_CHECKPOINT_PATH).joinpath(spider.name)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.mutex = threading.Lock()
+        self.added = {}  # 上次保存后放入的请求 {checkpoint_id: 请求}
+        self.finished = set()  # 上次保存后处理完毕的请求 checkpoint_id
+        self.distribute_done = False  # 起始请求是否分发完毕
+
+        self.conn = sqlite3.connect(str(self.path.joinpath('requests.sqlite3')), check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS requests (id INTEGER PRIMARY KEY, data BLOB)')
+        self.conn.commit()
+
+    def next_id(self) -> int:
+        """
+        下一个可用的 checkpoint_id
+
+        :return:
+        """
+        return (self.conn.execute('SELECT MAX(id) FROM requests').fetchone()[0] or 0) + 1
+
+    def add(self, obj) -> None:
+        """
+        记录放入队列的请求（保存时才编码，期间处理完毕的不会编码）
+
+        :param obj:
+        :return:
+        """
+        with self.mutex:
+            self.added[obj.checkpoint_id] = obj
+            self.finished.discard(obj.checkpoint_id)  # 处理完毕后又重新放入（如延迟重试）
+
+    def done(self, checkpoint_id: int) -> None:
+        """
+        记录处理完毕的请求
+
+        :param checkpoint_id:
+        :return:
+        """
+        with self.mutex:
+            if self.added.pop(checkpoint_id, None) is None:
+                self.finished.add(checkpoint_id)
+
+    def filters(self) -> dict:
+        """
+        获取所有本地过滤器（请求中间件、item 管道中的）
+
+        :return: {名称: 过滤器}
+        """
+        filters = {}
+        for module in SpiderController.REQUEST_MIDDLEWARE + ItemController.PIPELINE:
+            for attr, value in getattr(module, '__dict__', {}).items():
+                if isinstance(value, FilterBase):
+                    filters[f'{module.__class__.__name__}.{attr}'] = value
+
+        return filters
+
+    def save(self) -> None:
+        """
+        保存检查点
+
+        :return:
+        """
+        for name, f in self.filters().items():
+            f.dump(str(self.path.joinpath(f'filter.{name}')))
+
+        with self.mutex:
+            added, self.added = self.added, {}
+            finished, self.finished = self.finished, set()
+
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO requests (id, data) VALUES (?, ?)',
+            [(checkpoint_id, obj.dumps()) for checkpoint_id, obj in added.items()]
+        )
+        self.conn.executemany('DELETE FROM requests WHERE id = ?', [(checkpoint_id,) for checkpoint_id in finished])
+        self.conn.commit()
+
+        record = {'spider_record': self.spider.spider_record, 'distribute_done': self.distribute_done}
+        with open(self.path.joinpath('record.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(self.path.joinpath('record.json.tmp'), self.path.joinpath('record.json'))
+
+    def restore(self, q) -> bool:
+        """
+        从检查点恢复：加载过滤器、spider_record，并将未处理完毕的请求放回队列
+
+        :param q: 请求队列（调度器，恢复的请求计入未处理完毕的任务）
+        :return: 起始请求是否已经分发完毕
+        """
+        record_path = self.path.joinpath('record.json')
+        if not record_path.exists():
+            logger.warning(f"没有可恢复的检查点：{self.path}")
+            return False
+
+        with open(record_path, encoding='utf-8') as f:
+            record = json.load(f)
+
+        for name, f in self.filters().items():
+            f.load(str(self.path.joinpath(f'filter.{name}')))
+
+        self.spider.spider_record.update(record['spider_record'])
+        self.distribute_done = record['distribute_done']
+
+        count = 0
+        for checkpoint_id, data in self.conn.execute('SELECT id, data FROM requests ORDER BY id'):
+            request = LoadRequest.loads(data)
+            request.checkpoint_id = checkpoint_id
+            request.checkpoint_restored = True
+            q.restore(request)
+            count += 1
+
+        logger.info(f"从检查点恢复 {count} 个请求：{self.path}")
+
+        return self.distribute_done
+
+    def clear(self) -> None:
+        """
+        清空检查点
+
+        :return:
+        """
+        with self.mutex:
+            self.added.clear()
+            self.finished.clear()
+
+        self.conn.execute('DELETE FROM requests')
+        self.conn.commit()
+
+        for path in self.path.iterdir():
+            if path.name != 'requests.sqlite3':
+                path.unlink() if path.is_file() else shutil.rmtree(path)
+
+    def run(self) -> None:
+        """
+        定期保存，爬虫结束后最后保存一次，没有未处理完毕的请求则删除检查点
+
+        :return:
+        """
+        last_time = time.time()
+        while not self.spider.spider_done:
+            time.sleep(0.5)
+
+            if time.time() - last_time >= settings.SPIDER_CHECKPOINT_INTERVAL:
+                last_time = time.time()
+                try:
+                    self.save()
+                except Exception as e:
+                    logger.exception(e)
+
+        self.save()
+
+        if not self.conn.execute('SELECT 1 FROM requests LIMIT 1').fetchone():
+            self.clear()
+            logger.debug(f"爬虫正常结束，删除检查点：{self.path}")
+        else:
+            logger.warning(f"还有未处理完毕的请求，可以使用 resume=True 恢复：{self.path}")
+
+        self.conn.close()
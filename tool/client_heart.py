@@ -3,6 +3,7 @@
 
     master 异常会把自己设置为 slave
     slave 检测到 master 死机会把自己设置为 master
+    可靠队列时心跳会续约本机处理中的请求，心跳检查会放回租约过期的机器处理中的请求
 """
 import json
 import time
@@ -94,8 +95,11 @@ class ClientHeart:
                             all_controller_is_done += 1
                         logger.debug(f"心跳正常：{client_name}")
 
-                # 在有心跳且 item 消耗完毕的情况下，如果所有客户端的处理线程都死完 或者 任务分发、处理都结束，则停止
-                if heartbeat and self.spider.queue_item.empty():
+                # 可靠队列：放回租约过期的机器处理中的请求
+                self.spider.queue.recover()
+
+                # 在有心跳、item 消耗完毕且没有未确认的请求的情况下，如果所有客户端的处理线程都死完 或者 任务分发、处理都结束，则停止
+                if heartbeat and self.spider.queue_item.empty() and not self.spider.queue.unacked():
                     if len(heartbeat) == all_controller_is_done or (all_client_is_waiting and all_distribute_done):
                         logger.debug("所有客户端都已挂起，即将停止")
                         self.stop_all_client()
@@ -128,6 +132,9 @@ class ClientHeart:
                 self.spider.spider_uuid,
                 json.dumps(heart, ensure_ascii=False)
             )
+
+            # 可靠队列：续约处理中的请求
+            self.spider.queue.keep_alive()
             time.sleep(self.beating_time)
 
     @staticmethod
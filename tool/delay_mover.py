@@ -0,0 +1,42 @@
+"""
+    延迟队列的搬运线程：将到期的请求批量放入请求队列（本地等到下一个请求到期，分布式每隔 INTERVAL 检查一次）
+"""
+import threading
+from loguru import logger
+
+
+class DelayMover(threading.Thread):
+    INTERVAL = 0.2  # 最长等待时间
+    BATCH = 100  # 每次搬运的最大数量
+
+    def __init__(self, spider):
+        """
+
+        :param spider:
+        """
+        super().__init__(daemon=True)
+        self.spider = spider
+        self.stop = False  # 是否停止搬运
+
+    def run(self) -> None:
+        """
+        爬虫结束（或停止）前不断搬运
+
+        :return:
+        """
+        while not self.stop and not self.spider.spider_done:
+            try:
+                if not self.spider.queue_delay.move(self.spider.queue, self.BATCH):
+                    self.spider.queue_delay.wait(self.INTERVAL)
+            except Exception as e:
+                logger.exception(e)
+                self.spider.queue_delay.wait(self.INTERVAL)
+
+    def close(self) -> None:
+        """
+        停止搬运并等待线程结束（多进程时需在关闭协调进程之前，否则会继续调用已关闭的共享队列）
+
+        :return:
+        """
+        self.stop = True
+        self.join()
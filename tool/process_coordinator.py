@@ -0,0 +1,114 @@
+"""
+    本地爬虫的多进程模式（设置 SPIDER_PROCESSES 大于 1 开启，不需要 redis）
+
+    协调进程（LocalManager）持有请求队列、延迟队列、本地过滤器（SetFilter、BloomFilter），各进程通过代理访问
+    主进程分发起始请求，并和 fork 出的 SPIDER_PROCESSES - 1 个工作进程一起处理请求，每个进程都有自己的线程、item 管道
+    所有进程根据共享队列中未处理完毕的任务数量判断是否结束，结束后主进程合并各个工作进程的 spider_record
+    域名的请求间隔、并发（REQUEST_DELAY、REQUEST_DOMAIN_CONCURRENCY、REQUEST_DOMAIN_SETTINGS）由协调进程统一控制，不会随进程数量倍增
+
+    注意：
+        需要支持 fork 的系统
+        不支持检查点（SPIDER_CHECKPOINT_PATH）
+        spider 的属性在各个进程中是独立的副本
+"""
+import multiprocessing
+from loguru import logger
+from palp import settings
+from multiprocessing.managers import BaseManager
+from palp.filter.filter_set import SetFilter
+from palp.filter.filter_bloom import BloomFilter
+from palp.filter.filter_shared import FilterServer, SharedFilter
+from palp.sequence.sequence_shared import SharedSequence
+from palp.controller.controller_item import ItemController
+from palp.controller.controller_spider import SpiderController
+
+
+class LocalManager(BaseManager):
+    """
+        协调进程：持有共享的队列、过滤器
+    """
+
+
+LocalManager.register('SharedSequence', SharedSequence)
+LocalManager.register('FilterServer', FilterServer)
+
+
+class ProcessCoordinator:
+    def __init__(self, spider, queue_module: str, delay_module: str):
+        """
+        启动协调进程，创建共享的队列，并将本地过滤器替换为共享的过滤器
+
+        :param spider:
+        :param queue_module: 请求队列的模块
+        :param delay_module: 延迟队列的模块
+        """
+        self.spider = spider
+        self.context = multiprocessing.get_context('fork')
+        self.manager = LocalManager(ctx=self.context)
+        self.manager.start()
+
+        self.queue = self.manager.SharedSequence(queue_module, delay_module)
+        self.workers = []
+
+        self.share_filters()
+
+    @staticmethod
+    def available() -> bool:
+        """
+        当前系统是否支持多进程模式
+
+        :return:
+        """
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def share_filters(self) -> None:
+        """
+        将请求中间件、item 管道中的本地过滤器替换为共享的过滤器
+
+        :return:
+        """
+        if not SpiderController.REQUEST_MIDDLEWARE:
+            SpiderController.from_settings()
+        if not ItemController.PIPELINE:
+            ItemController.from_settings()
+
+        for module in SpiderController.REQUEST_MIDDLEWARE + ItemController.PIPELINE:
+            for attr, value in list(getattr(module, '__dict__', {}).items()):
+                if isinstance(value, (SetFilter, BloomFilter)):
+                    setattr(module, attr, SharedFilter(self.manager.FilterServer(value.__class__)))
+
+    def start(self) -> None:
+        """
+        fork 工作进程（需要在启动线程之前调用）
+
+        :return:
+        """
+        for _ in range(settings.SPIDER_PROCESSES - 1):
+            worker = self.context.Process(target=self.spider.run_worker)
+            worker.start()
+            self.workers.append(worker)
+
+        logger.debug(f"已启动 {len(self.workers)} 个工作进程")
+
+    def join(self) -> None:
+        """
+        通知工作进程停止并等待结束，合并 spider_record
+
+        :return:
+        """
+        self.queue.stop()
+
+        for worker in self.workers:
+            worker.join()
+
+        for record in self.queue.get_records():
+            for key, value in record.items():
+                self.spider.spider_record[key] = self.spider.spider_record.get(key, 0) + value
+
+    def close(self) -> None:
+        """
+        关闭协调进程
+
+        :return:
+        """
+        self.manager.shutdown()